@@ -1,10 +1,18 @@
 from datetime import datetime, timezone
 import os
+import threading
 from flask import Flask, jsonify
 from flask_jwt_extended import JWTManager
 from app.database.db_manager import DBManager
+from app.database.config import Config
+from app.database.overdue_sweeper import overdue_sweeper
+from app.database.dashboard_feed import dashboard_feed
+from app.database.idempotency_purger import idempotency_purger
+from app.database.job_pool import job_pool
+from app.database.outbox_dispatcher import outbox_dispatcher
 from app.database.models.user import User
 from app.utils.error_messages import ERROR_MESSAGES
+from app.utils.password_hasher import password_hasher
 from app.utils.response import error_response
 
 # Import the token blocklist
@@ -18,10 +26,37 @@ from .routes.invoices import invoices_blueprint
 from .routes.products import products_blueprint
 from .routes.payments import payments_blueprint
 from .routes.dashboard import dashboard_bp
+from .routes.maintenance import maintenance_blueprint
+from .routes.sync import sync_blueprint
+from .routes.events import events_blueprint
+from .routes.batch import batch_blueprint
+from .routes.jobs import jobs_blueprint
+from .routes.reports import reports_blueprint
+from .commands import register_commands
+
+def start_background_jobs(app):
+    """Starts the enabled background jobs of a server process (each start is idempotent)."""
+    # Read paths trust the stored invoice status, so the sweeper must be running.
+    if Config.OVERDUE_SWEEPER["enabled"]:
+        overdue_sweeper.start()
+    # Pushes refreshed dashboard counters to /api/events subscribers.
+    if Config.EVENTS["enabled"]:
+        dashboard_feed.start()
+    if Config.IDEMPOTENCY["purge_enabled"]:
+        idempotency_purger.start()
+    # Runs queued jobs in this process; `flask jobs-worker` runs them in dedicated ones.
+    if Config.JOBS["enabled"]:
+        job_pool.start(app)
+    # Delivers outbox events to the configured sinks; one process at a time does the work.
+    if Config.OUTBOX["enabled"] and Config.OUTBOX["dispatch_enabled"]:
+        outbox_dispatcher.start()
 
 def create_app():
     app = Flask(__name__)
 
+    # Fork the password hashing workers while this process is still single-threaded.
+    password_hasher.start()
+
     # --- Configuration ---
     app.config["JWT_SECRET_KEY"] = os.environ.get('JWT_SECRET_KEY', '773a46049339ef55babc522b64fcc25e3524fb737aa0c2da8a7ee105202a7486')
     app.config["SECRET_KEY"] = os.environ.get('SECRET_KEY', '13c8e9205aa641f5e83b3ad1738047a839ee5df3416c60d502bd4bfa0a657796')
@@ -73,13 +108,38 @@ def create_app():
     app.register_blueprint(products_blueprint, url_prefix='/api')
     app.register_blueprint(payments_blueprint, url_prefix='/api')
     app.register_blueprint(dashboard_bp, url_prefix='/api')
+    app.register_blueprint(maintenance_blueprint, url_prefix='/api')
+    app.register_blueprint(sync_blueprint, url_prefix='/api')
+    app.register_blueprint(events_blueprint, url_prefix='/api')
+    app.register_blueprint(batch_blueprint, url_prefix='/api')
+    app.register_blueprint(jobs_blueprint, url_prefix='/api')
+    app.register_blueprint(reports_blueprint, url_prefix='/api')
+
+    # --- CLI Commands ---
+    register_commands(app)
+
+    # --- Background Jobs ---
+    # Started by the first request this process serves, so they only run in server
+    # processes (gunicorn workers, `flask run`). CLI commands never serve requests:
+    # imports start nothing, and `flask jobs-worker` starts only the job pool.
+    started = []
+    start_lock = threading.Lock()
+
+    @app.before_request
+    def start_background_jobs_once():
+        if started:
+            return
+        with start_lock:
+            if not started:
+                start_background_jobs(app)
+                started.append(True)
 
     # A simple health check route
     @app.route("/api/health")
     def health_check(): # type: ignore
         try:
             # Test DB connectivity
-            result = DBManager.execute_query("SELECT 1", fetch="one")
+            result = DBManager.execute_query("SELECT 1", fetch="one", cache=False)
             if result is None:
                 raise Exception("DB returned no result")
             db_status = "connected"
@@ -92,7 +152,8 @@ def create_app():
             "status": "running" if http_status == 200 else "error",
             "message": "Project is up and running!" if http_status == 200 else "Database connection failed",
             "timestamp": datetime.now(timezone.utc).isoformat(),
-            "database": db_status
+            "database": db_status,
+            "query_cache": DBManager.cache_stats()
         }), http_status
     
     return app
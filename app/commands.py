@@ -0,0 +1,87 @@
+import os
+import click
+from app.database.job_pool import job_pool
+from app.database.models.customer import Customer
+from app.utils.bulk_import import ImportBatchError, ImportFailed, IMPORT_FORMATS
+from app.utils.customer_import import CustomerImporter, EXISTING_POLICIES, DELETED_POLICIES
+from app.utils.invoice_import import InvoiceImporter
+
+
+def _run_import(importer_class, path, import_format, user_id, batch_id, options):
+    """Starts (or resumes) an import of the file at `path` and reports the outcome."""
+    try:
+        if batch_id:
+            importer = importer_class.resume(batch_id)
+        else:
+            if user_id is None:
+                raise click.UsageError("--user-id is required for a new import.")
+            extension = os.path.splitext(path)[1].lower().lstrip('.')
+            import_format = import_format or {'jsonl': 'ndjson'}.get(extension, extension)
+            importer = importer_class.start(import_format, user_id, source=os.path.basename(path), options=options)
+    except ImportBatchError as err:
+        raise click.ClickException(str(err))
+
+    batch_id = importer.batch.id
+    click.echo(f"Import batch {batch_id}: starting after record {importer.batch.processed_records or 0}.")
+    with open(path, encoding='utf-8-sig', newline='') as lines:
+        try:
+            batch = importer.run(lines)
+        except ImportFailed as err:
+            raise click.ClickException(
+                f"{err} (batch {batch_id} stopped after record {err.batch.processed_records}, "
+                f"resume with --resume {batch_id})"
+            )
+    counts = ", ".join(f"{count} {outcome}" for outcome, count in sorted(batch.counts.items())) or "no records"
+    click.echo(f"Import batch {batch.id} completed: {counts}.")
+
+
+def register_commands(app):
+    """Registers the app's `flask` CLI commands (run with `flask --app "app:create_app" <command>`)."""
+
+    def import_options(command):
+        command = click.argument('path', type=click.Path(exists=True, dir_okay=False))(command)
+        command = click.option('--format', 'import_format', type=click.Choice(IMPORT_FORMATS),
+                               help="Input format. Defaults to the file extension (.csv, .ndjson or .jsonl).")(command)
+        command = click.option('--user-id', type=int, help="User recorded as the importer. Required for a new import.")(command)
+        command = click.option('--resume', 'batch_id', type=int, help="Continue a failed import batch with the same file.")(command)
+        return command
+
+    @app.cli.command('import-invoices')
+    @import_options
+    @click.option('--skip-stock', is_flag=True, help="Leave product stock untouched (historical data).")
+    def import_invoices(path, import_format, user_id, batch_id, skip_stock):
+        """Bulk-imports invoices from a CSV or NDJSON file."""
+        _run_import(InvoiceImporter, path, import_format, user_id, batch_id, {'skip_stock': skip_stock})
+
+    @app.cli.command('import-customers')
+    @import_options
+    @click.option('--on-existing', type=click.Choice(EXISTING_POLICIES), default='skip',
+                  help="What to do when the email belongs to an existing customer.")
+    @click.option('--on-deleted', type=click.Choice(DELETED_POLICIES), default='skip',
+                  help="What to do when the email belongs to a soft-deleted customer.")
+    def import_customers(path, import_format, user_id, batch_id, on_existing, on_deleted):
+        """Bulk-imports customers from a CSV or NDJSON file, de-duplicated by email."""
+        _run_import(CustomerImporter, path, import_format, user_id, batch_id,
+                    {'on_existing': on_existing, 'on_deleted': on_deleted})
+
+    @app.cli.command('jobs-worker')
+    @click.option('--workers', type=int, help="Worker threads. Defaults to JOBS_WORKERS.")
+    def jobs_worker(workers):
+        """Runs queued background jobs in the foreground until interrupted."""
+        # CLI processes start no background jobs of their own, so this pool is the only one.
+        if workers:
+            job_pool.workers = workers
+        job_pool.start(app)
+        click.echo(f"Job worker {job_pool.worker_id} running {job_pool.workers} threads. Press Ctrl+C to stop.")
+        try:
+            job_pool.join()
+        except KeyboardInterrupt:
+            click.echo("Stopping; waiting for running jobs to finish.")
+            job_pool.stop()
+
+    @app.cli.command('reindex-customer-names')
+    @click.option('--batch-size', type=int, default=1000, show_default=True, help="Customers per transaction.")
+    def reindex_customer_names(batch_size):
+        """Rebuilds the customer name search index (run once after upgrading, and after manual edits)."""
+        indexed = Customer.reindex_name_tokens(batch_size=batch_size)
+        click.echo(f"Indexed the names of {indexed} customers.")
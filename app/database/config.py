@@ -1,11 +1,17 @@
 
 import os
 import pymysql.cursors
+from pymysql.constants import CLIENT
 from dotenv import load_dotenv
 
 # Load environment variables from a .env file if it exists
 load_dotenv()
 
+# Private, app-owned directory for local state (query cache, spooled uploads, outbox
+# file), created with mode 0700 on first use. Defaults to instance/ in the project
+# root rather than shared /tmp, where other local users could read or plant files.
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "instance"))
+
 class Config:
     """
     Database configuration class.
@@ -21,7 +27,130 @@ class Config:
         "user": os.getenv("DB_USER", "root"),
         "password": os.getenv("DB_PASSWORD", "root"),
         "database": os.getenv("DB_NAME", "vyaper_billing_db"),
-        "cursorclass": pymysql.cursors.DictCursor
+        "cursorclass": pymysql.cursors.DictCursor,
+        # Report matched rather than changed rows, so an UPDATE that leaves a row
+        # as it was still counts and rowcount can be used as an existence check.
+        "client_flag": CLIENT.FOUND_ROWS,
+    }
+
+    # Settings for the DBManager query-result cache (see app/database/query_cache.py).
+    # Disabled unless QUERY_CACHE_ENABLED is set; "sqlite" shares entries across
+    # worker processes on the same host through a local file.
+    QUERY_CACHE = {
+        "enabled": os.getenv("QUERY_CACHE_ENABLED", "false").lower() == "true",
+        "backend": os.getenv("QUERY_CACHE_BACKEND", "memory"),
+        "path": os.getenv("QUERY_CACHE_PATH", os.path.join(DATA_DIR, "query_cache.sqlite3")),
+        "max_entries": int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 1024)),
+        "ttl": float(os.getenv("QUERY_CACHE_TTL", 30)),
+    }
+
+    # Background job that flips past-due pending invoices to 'Overdue'
+    # (see app/database/overdue_sweeper.py). Interval is in seconds.
+    OVERDUE_SWEEPER = {
+        "enabled": os.getenv("OVERDUE_SWEEPER_ENABLED", "true").lower() == "true",
+        "interval": float(os.getenv("OVERDUE_SWEEPER_INTERVAL", 300)),
+        "batch_size": int(os.getenv("OVERDUE_SWEEPER_BATCH_SIZE", 500)),
+    }
+
+    # Bulk imports (see app/utils/bulk_import.py): input records validated and
+    # written per transaction. Customer records are small, so their chunks are larger.
+    IMPORT = {
+        "chunk_size": int(os.getenv("IMPORT_CHUNK_SIZE", 500)),
+        "customer_chunk_size": int(os.getenv("IMPORT_CUSTOMER_CHUNK_SIZE", 2000)),
+    }
+
+    # Streamed exports (see app/utils/export.py): rows read per keyset batch, and
+    # the gzip level used when the client accepts compressed responses.
+    EXPORT = {
+        "batch_size": int(os.getenv("EXPORT_BATCH_SIZE", 1000)),
+        "gzip_level": int(os.getenv("EXPORT_GZIP_LEVEL", 6)),
+    }
+
+    # Server-sent change events (see app/utils/events.py and /api/events): queued
+    # events per subscriber before it is told to resync, events kept for
+    # Last-Event-ID catch-up, seconds between keep-alive comments, and how long the
+    # dashboard feed waits to absorb a burst of changes before recomputing.
+    EVENTS = {
+        "enabled": os.getenv("EVENTS_ENABLED", "true").lower() == "true",
+        "max_pending": int(os.getenv("EVENTS_MAX_PENDING", 100)),
+        "history": int(os.getenv("EVENTS_HISTORY", 256)),
+        "keepalive": float(os.getenv("EVENTS_KEEPALIVE", 15)),
+        "dashboard_debounce": float(os.getenv("EVENTS_DASHBOARD_DEBOUNCE", 1.0)),
+    }
+
+    # POST /api/batch (see app/utils/batch.py): sub-requests per batch, and threads
+    # used when independent GETs run in parallel.
+    BATCH = {
+        "max_requests": int(os.getenv("BATCH_MAX_REQUESTS", 20)),
+        "max_workers": int(os.getenv("BATCH_MAX_WORKERS", 4)),
+    }
+
+    # Idempotency-Key support on POST /invoices and /payments (see
+    # app/utils/idempotency.py): how long keys are replayed, how long a retry waits
+    # for a concurrent request with the same key before getting 409, and the
+    # background purge of expired keys. Times are in seconds.
+    IDEMPOTENCY = {
+        "ttl": int(os.getenv("IDEMPOTENCY_TTL", 86400)),
+        "lock_wait": int(os.getenv("IDEMPOTENCY_LOCK_WAIT", 10)),
+        "purge_enabled": os.getenv("IDEMPOTENCY_PURGE_ENABLED", "true").lower() == "true",
+        "purge_interval": float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", 3600)),
+        "purge_batch_size": int(os.getenv("IDEMPOTENCY_PURGE_BATCH_SIZE", 1000)),
+    }
+
+    # Durable background jobs (see app/utils/jobs.py and app/database/job_pool.py):
+    # whether web workers run a pool too (set false when `flask jobs-worker`
+    # processes do the work), worker threads per pool, seconds between polls for
+    # due jobs, seconds without a heartbeat before a running job counts as
+    # abandoned, attempts per job, retry backoff (doubling from `backoff` up to
+    # `backoff_max` seconds), and where queued import inputs are kept until their
+    # job runs (must be shared by every worker process).
+    JOBS = {
+        "enabled": os.getenv("JOBS_ENABLED", "true").lower() == "true",
+        "workers": int(os.getenv("JOBS_WORKERS", 2)),
+        "poll_interval": float(os.getenv("JOBS_POLL_INTERVAL", 2)),
+        "lease": int(os.getenv("JOBS_LEASE", 60)),
+        "max_attempts": int(os.getenv("JOBS_MAX_ATTEMPTS", 3)),
+        "backoff": float(os.getenv("JOBS_BACKOFF", 10)),
+        "backoff_max": float(os.getenv("JOBS_BACKOFF_MAX", 600)),
+        "spool_dir": os.getenv("JOBS_SPOOL_DIR", os.path.join(DATA_DIR, "jobs")),
+    }
+
+    # Transactional outbox of domain events (see app/utils/outbox.py and
+    # app/database/outbox_dispatcher.py): whether write paths record events and
+    # whether this process runs a dispatcher, the comma-separated sinks to deliver
+    # to (file, http, local), their settings, events per delivery batch, seconds
+    # between polls and the cap of the retry backoff, how many failed attempts an
+    # event gets before it is dead-lettered (0 retries forever), and how long
+    # delivered events are kept. Times are in seconds.
+    OUTBOX = {
+        "enabled": os.getenv("OUTBOX_ENABLED", "true").lower() == "true",
+        "dispatch_enabled": os.getenv("OUTBOX_DISPATCH_ENABLED", "true").lower() == "true",
+        "sinks": os.getenv("OUTBOX_SINKS", "local"),
+        "file_path": os.getenv("OUTBOX_FILE_PATH", os.path.join(DATA_DIR, "outbox.ndjson")),
+        "http_url": os.getenv("OUTBOX_HTTP_URL"),
+        "http_timeout": float(os.getenv("OUTBOX_HTTP_TIMEOUT", 10)),
+        "batch_size": int(os.getenv("OUTBOX_BATCH_SIZE", 100)),
+        "interval": float(os.getenv("OUTBOX_INTERVAL", 1)),
+        "backoff_max": float(os.getenv("OUTBOX_BACKOFF_MAX", 60)),
+        "max_attempts": int(os.getenv("OUTBOX_MAX_ATTEMPTS", 20)),
+        "retention": int(os.getenv("OUTBOX_RETENTION", 604800)),
+        "purge_interval": float(os.getenv("OUTBOX_PURGE_INTERVAL", 3600)),
+    }
+
+    # Reports (see app/utils/reports.py): aging results kept per process, keyed by
+    # the versions of the tables they read.
+    REPORTS = {
+        "aging_cache_entries": int(os.getenv("REPORTS_AGING_CACHE_ENTRIES", 8)),
+    }
+
+    # Delta sync (see app/utils/sync.py): rows per entity per page, and how many
+    # seconds before the current one a row must be written to be returned. Pages
+    # also stop before the oldest open write transaction, read from
+    # information_schema.INNODB_TRX, so the DB user needs the PROCESS privilege.
+    SYNC = {
+        "page_size": int(os.getenv("SYNC_PAGE_SIZE", 500)),
+        "max_page_size": int(os.getenv("SYNC_MAX_PAGE_SIZE", 2000)),
+        "settle_seconds": int(os.getenv("SYNC_SETTLE_SECONDS", 1)),
     }
 
     @staticmethod
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+
+from .config import Config
+from .models.dashboard_model import get_dashboard_stats
+from app.utils.events import event_bus
+
+logger = logging.getLogger(__name__)
+
+FEED_NAME = "dashboard_feed"
+
+
+class DashboardFeed:
+    """
+    Background job that keeps the dashboard counters current for event-stream
+    subscribers, so their browsers don't poll /dashboard/stats.
+
+    Every change event marks the counters dirty. The job waits `debounce` seconds
+    so a burst of writes (an import chunk, a sweep) is absorbed, then runs the
+    aggregate queries once and publishes the result as a 'dashboard' event to all
+    subscribers. With no subscribers nothing is computed until the next
+    snapshot() call.
+    """
+
+    def __init__(self, bus, debounce=1.0):
+        self.bus = bus
+        self.debounce = debounce
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = None
+        # Change events seen, and how many of them the current _stats reflect.
+        self._changes = 0
+        self._stats_changes = 0
+        bus.add_listener(self._on_event)
+
+    @classmethod
+    def from_config(cls, bus, config):
+        return cls(bus, debounce=config["dashboard_debounce"])
+
+    def _on_event(self, event):
+        if event['type'] != 'dashboard':
+            # Not under _lock, so publishers never wait for a running computation.
+            self._changes += 1
+            self._dirty.set()
+
+    def snapshot(self):
+        """The latest counters, recomputed first if a change arrived since."""
+        with self._lock:
+            changes = self._changes
+            if self._stats is None or self._stats_changes != changes:
+                self._stats = get_dashboard_stats()
+                # A change arriving during the queries leaves the snapshot stale.
+                self._stats_changes = changes
+            return self._stats
+
+    def refresh(self):
+        """Publishes fresh counters to the subscribers, if there are any."""
+        if self.bus.subscriber_count():
+            self.bus.publish('dashboard', self.snapshot())
+
+    def start(self):
+        """Starts the feed in a daemon thread (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=FEED_NAME, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._dirty.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._dirty.wait()
+            if self._stop.wait(self.debounce):
+                break
+            self._dirty.clear()
+            started = time.monotonic()
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Dashboard feed refresh failed")
+                continue
+            logger.debug("Dashboard feed refreshed in %.1f ms", (time.monotonic() - started) * 1000)
+
+
+dashboard_feed = DashboardFeed.from_config(event_bus, Config.EVENTS)
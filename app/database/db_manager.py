@@ -1,74 +1,271 @@
 
+import logging
+import threading
+import pymysql.cursors
+from collections import namedtuple
+from contextlib import contextmanager
 from .base import get_db_connection
-from decimal import Decimal
-from datetime import datetime, date
+from .config import Config
+from .query_cache import QueryCache, written_table
+from . import identity_map
+logger = logging.getLogger(__name__)
 
-# --- Centralized Normalization Functions ---
+# --- Query Result Cache ---
 
-def normalize_value(value):
-    """Recursively normalize values for JSON serialization."""
-    if isinstance(value, Decimal):
-        # Return string to preserve formatting (e.g., "33333.00")
-        return "{:.2f}".format(value)
-    if isinstance(value, (datetime, date)):
-        return value.isoformat()
-    return value
+query_cache = QueryCache.from_config(Config.QUERY_CACHE)
 
-def normalize_row(row):
-    """Normalize all values in a DB row dictionary."""
-    # Assumes row is a dictionary, as provided by DictCursor
-    return {k: normalize_value(v) for k, v in row.items()}
+# --- Write Results ---
 
-def normalize_rows(rows):
-    """Normalize a list of DB row dictionaries."""
-    return [normalize_row(r) for r in rows]
+# lastrowid: AUTO_INCREMENT id of an INSERT. rowcount: rows matched by the
+# statement. row: the `returning` row read back after the write, if requested.
+WriteResult = namedtuple('WriteResult', ['lastrowid', 'rowcount', 'row'])
+
+# --- Transactions ---
+
+# The transaction open in this thread (or greenlet, when monkey-patched), if any.
+_local = threading.local()
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+        # Written tables, invalidated in the query cache once the commit succeeds.
+        self.tables = set()
+        # after_commit() callbacks, run once the commit succeeds.
+        self.callbacks = []
+
+
+def _current_transaction():
+    return getattr(_local, 'transaction', None)
 
 # --- DBManager Class ---
 
 class DBManager:
     """
     A centralized manager for handling all database interactions.
-    This class abstracts away connection/cursor handling and normalizes output data.
+    This class abstracts away connection/cursor handling.
+
+    Rows keep the native types pymysql decodes for each column type (Decimal for
+    DECIMAL, date/datetime for DATE/TIMESTAMP, int for INT). Models convert
+    computed columns through their declared converters, and values are turned
+    into JSON exactly once, by app.utils.serializer at the response boundary.
     """
 
     @staticmethod
-    def execute_query(query, params=None, fetch=None):
+    def execute_query(query, params=None, fetch=None, cache=None):
         """
-        Executes a read-only query and returns normalized data.
+        Executes a read-only query and returns its rows as dictionaries.
         This method relies on pymysql.cursors.DictCursor being set for the
         connection, which returns each row as a dictionary.
+
+        Results may be served from the query cache. `cache=None` follows the
+        QUERY_CACHE_ENABLED setting, `cache=True` opts this call in, and
+        `cache=False` always goes to the database (use it for probes and anything
+        that must see other workers' writes immediately).
+
+        Inside DBManager.transaction() the cache is bypassed, so reads see the
+        transaction's own uncommitted writes.
         """
-        conn = get_db_connection()
-        try:
+        if fetch and _current_transaction() is None and query_cache.should_cache(query, cache):
+            hit, result, key = query_cache.get(query, params, fetch)
+            if hit:
+                return result
+            result = DBManager._run_query(query, params, fetch)
+            query_cache.set(key, result)
+            return result
+        return DBManager._run_query(query, params, fetch)
+
+    @staticmethod
+    def _run_query(query, params, fetch):
+        with DBManager._connection() as (conn, _):
             with conn.cursor() as cursor:
                 cursor.execute(query, params or ())
 
                 if fetch == 'one':
                     # fetchone() with DictCursor returns a single dictionary or None
-                    row = cursor.fetchone()
-                    return normalize_row(row) if row else None
+                    return cursor.fetchone()
 
                 if fetch == 'all':
                     # fetchall() with DictCursor returns a list of dictionaries
                     rows = cursor.fetchall()
-                    return normalize_rows(rows) if rows else []
+                    return list(rows) if rows else []
 
             return None
+
+    @staticmethod
+    @contextmanager
+    def _connection():
+        """
+        Yields (connection, transaction): the open transaction's, the shared_connection()
+        of the block, or a fresh one closed afterwards.
+        """
+        transaction = _current_transaction()
+        if transaction is not None:
+            yield transaction.conn, transaction
+            return
+        shared = getattr(_local, 'connection', None)
+        if shared is not None:
+            yield shared, None
+            return
+        conn = get_db_connection()
+        try:
+            yield conn, None
         finally:
             conn.close()
 
     @staticmethod
-    def execute_write_query(query, params=None):
+    @contextmanager
+    def shared_connection():
         """
-        Executes a write query (INSERT, UPDATE, DELETE) and commits the transaction.
-        Returns the ID of the last inserted row.
+        Runs every DBManager call in the block on one connection instead of
+        connecting per query, e.g. for the sub-requests of one /batch call. Unlike
+        transaction() nothing else changes: the connection is in autocommit mode,
+        so each statement commits (and sees other workers' commits) on its own, and
+        the query cache works as usual. Nested blocks share the outer connection;
+        transaction() and iter_query() still use their own.
         """
+        if getattr(_local, 'connection', None) is not None:
+            yield
+            return
         conn = get_db_connection()
+        conn.autocommit(True)
+        _local.connection = conn
         try:
-            with conn.cursor() as cursor:
+            yield
+        finally:
+            _local.connection = None
+            conn.close()
+
+    @staticmethod
+    @contextmanager
+    def transaction():
+        """
+        Runs every DBManager call in the block on one connection, as one transaction:
+        committed when the block exits, rolled back if it raises. Nested blocks join
+        the outermost transaction. Query cache invalidation for the written tables is
+        deferred until after the commit, so no other reader can cache a row version
+        that might still be rolled back.
+
+        iter_query() always uses its own connection and does not see uncommitted writes.
+        """
+        if _current_transaction() is not None:
+            yield
+            return
+        transaction = _Transaction(get_db_connection())
+        _local.transaction = transaction
+        try:
+            yield
+            transaction.conn.commit()
+        except BaseException:
+            transaction.conn.rollback()
+            # Lookups mapped during the transaction may hold rolled-back rows.
+            identity_map.clear()
+            raise
+        finally:
+            _local.transaction = None
+            transaction.conn.close()
+        if transaction.tables:
+            query_cache.invalidate(*transaction.tables)
+        for callback in transaction.callbacks:
+            DBManager._run_callback(callback)
+
+    @staticmethod
+    def after_commit(callback):
+        """
+        Runs `callback()` once the current DBManager.transaction() commits (and not
+        at all if it rolls back), or right away outside a transaction, where every
+        write has already committed. Exceptions are logged, never raised.
+        """
+        transaction = _current_transaction()
+        if transaction is not None:
+            transaction.callbacks.append(callback)
+        else:
+            DBManager._run_callback(callback)
+
+    @staticmethod
+    def _run_callback(callback):
+        try:
+            callback()
+        except Exception:
+            logger.exception("after_commit callback failed")
+
+    @staticmethod
+    def cache_stats():
+        """Hit/miss/eviction counters for the query cache."""
+        return query_cache.stats()
+
+    @staticmethod
+    def iter_query(query, params=None, batch_size=500):
+        """
+        Executes a read-only query and yields rows one at a time.
+
+        Uses an unbuffered server-side cursor so the full result set is never
+        held in memory; rows are pulled from MySQL in batches of `batch_size`.
+        The connection stays open until the generator is exhausted or closed,
+        so callers must consume it (or call close()) promptly.
+        """
+        conn = get_db_connection()
+        try:
+            with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
                 cursor.execute(query, params or ())
-                last_id = cursor.lastrowid
-            conn.commit()
-            return last_id
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield from rows
         finally:
             conn.close()
+
+    @staticmethod
+    def iter_keyset(build_query, key='id', batch_size=1000):
+        """
+        Yields every row of a query in ascending `key` order, `batch_size` rows per
+        statement. `build_query(after, limit)` returns (query, params) for the rows
+        with key > after, ordered by key and LIMITed to `limit`.
+
+        Each batch is a short indexed range read through iter_query's server-side
+        cursor, so neither memory nor a long-running statement grows with the size
+        of the table, and no OFFSET rows are ever skipped over.
+        """
+        after = 0
+        while True:
+            query, params = build_query(after, batch_size)
+            count = 0
+            for row in DBManager.iter_query(query, params, batch_size=batch_size):
+                count += 1
+                after = row[key]
+                yield row
+            if count < batch_size:
+                return
+
+    @staticmethod
+    def execute_write_query(query, params=None, returning=None):
+        """
+        Executes a write query (INSERT, UPDATE, DELETE) and commits the transaction
+        (unless it runs inside DBManager.transaction(), which commits at the end).
+        Returns a WriteResult. Connections use CLIENT.FOUND_ROWS, so rowcount counts
+        matched rows (even if unchanged) and doubles as an existence check.
+
+        `returning` is an optional (select_query, select_params) pair executed on the
+        same connection right after a write that matched a row, to read back columns
+        the DB computed (defaults, timestamps) without another round trip to connect.
+        select_params=None means (lastrowid,). The fetched row is WriteResult.row.
+        """
+        with DBManager._connection() as (conn, transaction):
+            with conn.cursor() as cursor:
+                cursor.execute(query, params or ())
+                lastrowid, rowcount, row = cursor.lastrowid, cursor.rowcount, None
+                if returning and rowcount > 0:
+                    select_query, select_params = returning
+                    cursor.execute(select_query, select_params if select_params is not None else (lastrowid,))
+                    row = cursor.fetchone()
+            table = written_table(query)
+            if transaction is not None:
+                if table:
+                    transaction.tables.add(table)
+            else:
+                conn.commit()
+                query_cache.invalidate_for_write(query)
+            if table:
+                identity_map.evict(table)
+            return WriteResult(lastrowid, rowcount, row)
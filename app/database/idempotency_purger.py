@@ -0,0 +1,59 @@
+import logging
+import threading
+
+from .config import Config
+from .models.idempotency_key import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+PURGER_NAME = "idempotency_purger"
+
+
+class IdempotencyPurger:
+    """
+    Background job that deletes idempotency keys older than `ttl` seconds, in
+    LIMIT-ed batches so the purge never holds many row locks at once. Retries
+    arriving after that get a fresh request instead of a replay.
+    """
+
+    def __init__(self, ttl=86400, interval=3600, batch_size=1000):
+        self.ttl = ttl
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(ttl=config["ttl"], interval=config["purge_interval"], batch_size=config["purge_batch_size"])
+
+    def run_once(self):
+        """Runs one purge and returns the number of keys deleted."""
+        deleted = IdempotencyKey.purge_expired(self.ttl, self.batch_size)
+        if deleted:
+            logger.info("Purged %s expired idempotency keys", deleted)
+        return deleted
+
+    def start(self):
+        """Starts the periodic purge in a daemon thread (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=PURGER_NAME, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Idempotency key purge failed")
+            self._stop.wait(self.interval)
+
+
+idempotency_purger = IdempotencyPurger.from_config(Config.IDEMPOTENCY)
@@ -0,0 +1,53 @@
+from flask import g, has_app_context
+
+# Returned by lookup() when nothing is mapped, since None is a valid (not found) result.
+MISSING = object()
+
+
+def _entries():
+    """The current request's map, or None outside an application context."""
+    if not has_app_context():
+        return None
+    entries = g.get('_identity_map')
+    if entries is None:
+        entries = g._identity_map = {}
+    return entries
+
+
+def make_key(table, id, *variant):
+    # Route args arrive as ints while JWT identities are strings; map both to one entry.
+    return (table, str(id)) + variant
+
+
+def lookup(key):
+    """Returns the instance loaded earlier in this request under `key`, or MISSING."""
+    entries = _entries()
+    if entries is None or key not in entries:
+        return MISSING
+    return entries[key][0]
+
+
+def store(key, instance, tables):
+    """
+    Remembers a lookup result (an instance or None) for the rest of the request.
+    `tables` lists every table the lookup read, so a write to any of them evicts it.
+    """
+    entries = _entries()
+    if entries is not None:
+        entries[key] = (instance, frozenset(tables))
+    return instance
+
+
+def evict(table):
+    """Drops every mapped lookup that read `table`. Called for each write statement."""
+    entries = _entries()
+    if not entries:
+        return
+    for key in [key for key, (_, tables) in entries.items() if table in tables]:
+        del entries[key]
+
+
+def clear():
+    entries = _entries()
+    if entries:
+        entries.clear()
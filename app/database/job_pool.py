@@ -0,0 +1,168 @@
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import Config
+from .models.job import Job
+from app.utils.jobs import JOB_HANDLERS, JobContext, FatalJobError, add_enqueue_listener, retry_delay
+
+logger = logging.getLogger(__name__)
+
+POOL_NAME = "job_pool"
+
+
+class JobPool:
+    """
+    Runs queued jobs (see app/utils/jobs.py) on `workers` threads of this process.
+
+    A dispatcher thread claims as many due jobs as there are idle workers, hands
+    them to the thread pool and otherwise sleeps `poll_interval` seconds, or
+    until a job is enqueued in this process or a worker frees up. Every process
+    running a pool (web workers with JOBS_ENABLED, or `flask jobs-worker`)
+    claims from the same table, so work scales out by starting more of them.
+
+    Running jobs get a heartbeat every lease/3 seconds. Jobs whose heartbeat is
+    older than `lease` belong to a process that died; any pool requeues them.
+    """
+
+    def __init__(self, workers=2, poll_interval=2.0, lease=60, backoff=10, backoff_max=600):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.worker_id = None
+        self._app = None
+        self._executor = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        # job id -> attempt number, for the jobs running in this process.
+        self._running = {}
+        self._stats = {"claimed": 0, "succeeded": 0, "retried": 0, "failed": 0, "requeued_stale": 0, "last_error": None}
+        add_enqueue_listener(self._wakeup.set)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(workers=config["workers"], poll_interval=config["poll_interval"], lease=config["lease"],
+                   backoff=config["backoff"], backoff_max=config["backoff_max"])
+
+    def start(self, app=None):
+        """Starts the dispatcher and worker threads (idempotent). Jobs run inside `app`'s context."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._app = app
+        # Set here rather than in __init__: a preloading server forks after import.
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=POOL_NAME)
+        self._thread = threading.Thread(target=self._loop, name=POOL_NAME, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stops claiming jobs and waits for the running ones to finish."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+    def join(self):
+        """Blocks until the pool is stopped (used by `flask jobs-worker`)."""
+        while self._thread and self._thread.is_alive():
+            self._thread.join(1)
+
+    def _loop(self):
+        last_heartbeat = 0.0
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                if time.monotonic() - last_heartbeat >= self.lease / 3:
+                    self._heartbeat()
+                    last_heartbeat = time.monotonic()
+                self._dispatch()
+            except Exception as e:
+                with self._lock:
+                    self._stats["last_error"] = str(e)
+                logger.exception("Job dispatch failed")
+            self._wakeup.wait(self.poll_interval)
+
+    def _heartbeat(self):
+        with self._lock:
+            running = list(self._running.items())
+        Job.heartbeat(running)
+        requeued = Job.requeue_stale(self.lease)
+        if requeued:
+            logger.warning("Requeued %s jobs of workers that stopped responding", requeued)
+            with self._lock:
+                self._stats["requeued_stale"] += requeued
+
+    def _dispatch(self):
+        with self._lock:
+            idle = self.workers - len(self._running)
+        if idle <= 0:
+            return
+        for job in Job.claim(self.worker_id, idle):
+            with self._lock:
+                self._running[job.id] = job.attempts
+                self._stats["claimed"] += 1
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            if self._app is not None:
+                with self._app.app_context():
+                    self._execute(job)
+            else:
+                self._execute(job)
+        finally:
+            with self._lock:
+                self._running.pop(job.id, None)
+            # A worker is free again.
+            self._wakeup.set()
+
+    def _execute(self, job):
+        handler = JOB_HANDLERS.get(job.kind)
+        try:
+            if handler is None:
+                raise FatalJobError(f"No handler registered for job kind '{job.kind}'.")
+            result = handler(JobContext(job))
+        except Exception as e:
+            retry = not isinstance(e, FatalJobError) and job.attempts < job.max_attempts
+            logger.exception("Job %s (%s) attempt %s failed", job.id, job.kind, job.attempts)
+            delay = retry_delay(job.attempts, self.backoff, self.backoff_max) if retry else None
+            self._record(Job.fail, job.id, job.attempts, str(e), delay)
+            self._count("retried" if retry else "failed")
+            return
+        self._record(Job.succeed, job.id, job.attempts, result)
+        self._count("succeeded")
+
+    def _record(self, outcome, *args):
+        # If the outcome can't be written, the job goes stale and is retried.
+        try:
+            if not outcome(*args):
+                logger.warning("Job %s was taken over before its outcome was recorded", args[0])
+        except Exception:
+            logger.exception("Recording the outcome of job %s failed", args[0])
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """Counters of this process's pool."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["running_jobs"] = sorted(self._running)
+        stats["running"] = bool(self._thread and self._thread.is_alive())
+        stats["worker_id"] = self.worker_id
+        stats["workers"] = self.workers
+        return stats
+
+
+job_pool = JobPool.from_config(Config.JOBS)
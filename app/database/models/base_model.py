@@ -1,50 +1,146 @@
-
 from app.database.db_manager import DBManager
-from datetime import datetime
+from app.database import identity_map
+from datetime import date, datetime
 from decimal import Decimal
 
-class BaseModel:
+
+# Column converters. Each receives a non-NULL value straight from the cursor and
+# returns it as the model's Python type; values that already have that type pass
+# through untouched, so there is no string -> object -> string round trip.
+def to_int(value):
+    return value if type(value) is int else int(value)
+
+
+def to_decimal(value):
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value)) if isinstance(value, float) else Decimal(value)
+
+
+def to_datetime(value):
+    if isinstance(value, datetime) or not isinstance(value, str):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return value
+
+
+def to_date(value):
+    if isinstance(value, date) or not isinstance(value, str):
+        return value
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return value
+
+
+class ModelMeta(type):
+    """
+    Builds compact model classes from their declared `_columns`.
+
+    `_columns` is a tuple of (name, converter) pairs, where converter is one of
+    the to_* functions above or None for values stored as-is. The metaclass turns
+    it into `__slots__`, so instances carry no per-row __dict__, and compiles a
+    name -> converter map once per class that from_row() uses for every row.
+    """
+
+    def __new__(mcls, name, bases, namespace):
+        columns = tuple(namespace.get('_columns', ()))
+        inherited = set()
+        for base in bases:
+            for klass in base.__mro__:
+                inherited.update(getattr(klass, '__slots__', ()))
+        namespace['__slots__'] = tuple(column for column, _ in columns if column not in inherited)
+        cls = super().__new__(mcls, name, bases, namespace)
+
+        converters = {}
+        for base in reversed(cls.__mro__[1:]):
+            converters.update(getattr(base, '_converters', {}))
+        converters.update(columns)
+        cls._converters = converters
+        return cls
+
+
+class VersionConflict(Exception):
+    """Raised by an update given an expected_version the row no longer has."""
+
+
+class BaseModel(metaclass=ModelMeta):
     _table_name = None
+    # Whether the table has a `version` column, bumped by every update and
+    # checked against `expected_version` (optimistic concurrency control).
+    _versioned = False
+    # Columns clients may select through ?fields=. Subclasses list their public columns.
+    _public_fields = ()
+    # (name, converter) for every table column and every computed column the
+    # model's queries select. Row keys not listed here are ignored.
+    _columns = ()
+    # (name, factory) for attributes that should exist even when not selected.
+    _defaults = ()
 
     def __init__(self, **kwargs):
-        """
-        Initializes the model instance by dynamically setting attributes. It
-        handles the conversion of date/time strings and decimal strings to
-        their appropriate Python types.
-        """
-        for key, value in kwargs.items():
-            if key in ('created_at', 'updated_at', 'deleted_at') and isinstance(value, str):
-                try:
-                    value = datetime.fromisoformat(value)
-                except (ValueError, TypeError):
-                    # In case of a parsing error, leave the original value
-                    pass
-            elif key == 'price' and value is not None:
-                # Ensure price is always a Decimal for precision
-                try:
-                    value = Decimal(value)
-                except (ValueError, TypeError):
-                    # In case of a conversion error, leave the original value
-                    pass
-            setattr(self, key, value)
+        self._load(kwargs)
+
+    def _load(self, row):
+        converters = self._converters
+        for key, value in row.items():
+            if key in converters:
+                convert = converters[key]
+                if convert is not None and value is not None:
+                    value = convert(value)
+                setattr(self, key, value)
+        for key, factory in self._defaults:
+            if not hasattr(self, key):
+                setattr(self, key, factory())
+
+    @classmethod
+    def from_row(cls, row):
+        """Creates an instance from a database row, or None for an empty row."""
+        if not row:
+            return None
+        instance = cls.__new__(cls)
+        instance._load(row)
+        return instance
 
     @classmethod
-    def _get_base_query(cls, include_deleted=False):
+    def _select_list(cls, fields=None):
+        """Returns the SELECT list for a sparse fieldset, or '*' when no fields were requested."""
+        if not fields:
+            return '*'
+        return ", ".join(field for field in fields if field in cls._public_fields)
+
+    @classmethod
+    def _get_base_query(cls, include_deleted=False, fields=None):
+        select_list = cls._select_list(fields)
         if include_deleted:
-            return f'SELECT * FROM {cls._table_name}'
-        return f'SELECT * FROM {cls._table_name} WHERE deleted_at IS NULL'
+            return f'SELECT {select_list} FROM {cls._table_name}'
+        return f'SELECT {select_list} FROM {cls._table_name} WHERE deleted_at IS NULL'
+
+    @classmethod
+    def _insert(cls, data):
+        """
+        Inserts `data` and returns the new instance, built from the written values
+        plus the public columns the INSERT left to the DB (id, timestamps, defaults),
+        which are read back on the same connection.
+        """
+        columns = ", ".join(data.keys())
+        placeholders = ", ".join(["%s"] * len(data))
+        query = f'INSERT INTO {cls._table_name} ({columns}) VALUES ({placeholders})'
+
+        computed = [column for column in cls._public_fields if column != 'id' and column not in data]
+        returning = None
+        if computed:
+            returning = (f'SELECT {", ".join(computed)} FROM {cls._table_name} WHERE id = %s', None)
+        result = DBManager.execute_write_query(query, tuple(data.values()), returning=returning)
+        return cls.from_row({**data, **(result.row or {}), 'id': result.lastrowid})
 
     @classmethod
     def create(cls, data):
         # The DB schema handles created_at and updated_at on creation
         data.pop('created_at', None)
         data.pop('updated_at', None)
-
-        columns = ", ".join(data.keys())
-        placeholders = ", ".join(["%s"] * len(data))
-
-        query = f'INSERT INTO {cls._table_name} ({columns}) VALUES ({placeholders})'
-        return DBManager.execute_write_query(query, tuple(data.values()))
+        return cls._insert(data)
 
     @classmethod
     def find_all(cls, include_deleted=False):
@@ -53,52 +149,97 @@ class BaseModel:
         return [cls.from_row(row) for row in results]
 
     @classmethod
-    def find_by_id(cls, id, include_deleted=False):
-        base_query = cls._get_base_query(include_deleted)
+    def find_by_id(cls, id, include_deleted=False, fields=None):
+        """
+        Primary-key lookup through the request's identity map: repeated lookups of
+        the same row within one request return the same instance without a query.
+        """
+        key = identity_map.make_key(cls._table_name, id, include_deleted, tuple(fields or ()))
+        instance = identity_map.lookup(key)
+        if instance is not identity_map.MISSING:
+            return instance
+
+        base_query = cls._get_base_query(include_deleted, fields)
         clause = "AND" if "WHERE" in base_query else "WHERE"
         query = f'{base_query} {clause} id = %s'
         result = DBManager.execute_query(query, (id,), fetch='one')
-        if result:
-            return cls.from_row(result)
-        return None
+        return identity_map.store(key, cls.from_row(result), (cls._table_name,))
 
     @classmethod
-    def update(cls, id, data):
-        if not cls.find_by_id(id):
-            return False
-        
+    def version_probe(cls, id, include_deleted=False):
+        """
+        Cheap primary-key lookup of the columns that change on every write, used to
+        answer conditional GETs without loading the full entity. Returns None if
+        the row doesn't exist.
+        """
+        columns = 'id, created_at, updated_at, version' if cls._versioned else 'id, created_at, updated_at'
+        query = f'SELECT {columns} FROM {cls._table_name} WHERE id = %s'
+        if not include_deleted:
+            query += ' AND deleted_at IS NULL'
+        return DBManager.execute_query(query, (id,), fetch='one', cache=False)
+
+    @classmethod
+    def _version_sql(cls):
+        """SET fragment bumping the row version, for versioned tables."""
+        return ", version = version + 1" if cls._versioned else ""
+
+    @classmethod
+    def update(cls, id, data, returning=False, expected_version=None):
+        """
+        Updates a live row. The UPDATE's matched-row count doubles as the existence
+        check, so there is no lookup beforehand. Returns whether the row exists, or
+        with returning=True the updated instance (None if missing), re-read on the
+        same connection since ON UPDATE columns are computed by the DB.
+
+        With `expected_version` the row is only updated if its version still
+        matches, checked in the UPDATE itself; otherwise VersionConflict is raised.
+        """
         # The DB schema handles updated_at on update
         data.pop('created_at', None)
         data.pop('updated_at', None)
 
         if not data:
-            return True # Nothing to update
+            # Nothing to update
+            instance = cls.find_by_id(id)
+            return instance if returning else instance is not None
 
         set_clause = ", ".join([f"{key} = %s" for key in data.keys()])
         
-        query = f'UPDATE {cls._table_name} SET {set_clause} WHERE id = %s'
+        query = f'UPDATE {cls._table_name} SET {set_clause}{cls._version_sql()} WHERE id = %s AND deleted_at IS NULL'
         
         params = list(data.values()) + [id]
+        if expected_version is not None:
+            query += ' AND version = %s'
+            params.append(expected_version)
         
-        DBManager.execute_write_query(query, tuple(params))
-        return True
+        select = (f'SELECT * FROM {cls._table_name} WHERE id = %s', (id,)) if returning else None
+        result = DBManager.execute_write_query(query, tuple(params), returning=select)
+        if expected_version is not None and result.rowcount == 0:
+            raise VersionConflict(id)
+        if returning:
+            return cls.from_row(result.row)
+        return result.rowcount > 0
 
     @classmethod
     def soft_delete(cls, id):
-        if not cls.find_by_id(id):
-            return False
-        query = f'UPDATE {cls._table_name} SET deleted_at = NOW() WHERE id = %s'
-        DBManager.execute_write_query(query, (id,))
-        return True
+        query = f'UPDATE {cls._table_name} SET deleted_at = NOW(){cls._version_sql()} WHERE id = %s AND deleted_at IS NULL'
+        return DBManager.execute_write_query(query, (id,)).rowcount > 0
 
     @classmethod
-    def find_with_pagination_and_count(cls, page=1, per_page=10, include_deleted=False):
+    def find_with_pagination_and_count(cls, page=1, per_page=10, include_deleted=False, stream=False, fields=None):
+        """
+        Returns (items, total). With stream=True, items is a lazy generator backed
+        by a server-side cursor instead of a list. `fields` narrows the SELECT list.
+        """
         offset = (page - 1) * per_page
-        base_query = cls._get_base_query(include_deleted)
+        base_query = cls._get_base_query(include_deleted, fields)
         
         query_data = f'{base_query} LIMIT %s OFFSET %s'
-        results = DBManager.execute_query(query_data, (per_page, offset), fetch='all')
-        items = [cls.from_row(row) for row in results]
+        if stream:
+            items = (cls.from_row(row) for row in DBManager.iter_query(query_data, (per_page, offset)))
+        else:
+            results = DBManager.execute_query(query_data, (per_page, offset), fetch='all')
+            items = [cls.from_row(row) for row in results]
         
         query_count = f'SELECT COUNT(*) as count FROM {cls._table_name}'
         if not include_deleted:
@@ -108,6 +249,62 @@ class BaseModel:
         
         return items, total
 
+    @classmethod
+    def export_rows(cls, include_deleted=False, updated_since=None, batch_size=1000):
+        """
+        Yields every row as an instance, in id order, via DBManager.iter_keyset.
+        `updated_since` keeps rows created or updated at or after it.
+        """
+        where, params = [], []
+        if not include_deleted:
+            where.append("deleted_at IS NULL")
+        if updated_since:
+            where.append("(updated_at >= %s OR created_at >= %s)")
+            params.extend([updated_since, updated_since])
+
+        def build_query(after, limit):
+            conditions = " AND ".join(["id > %s"] + where)
+            query = f'SELECT * FROM {cls._table_name} WHERE {conditions} ORDER BY id LIMIT %s'
+            return query, (after, *params, limit)
+
+        for row in DBManager.iter_keyset(build_query, batch_size=batch_size):
+            yield cls.from_row(row)
+
+    @classmethod
+    def sync_page(cls, after=None, limit=500, settle_seconds=1):
+        """
+        One page of rows written after the (updated_at, id) cursor `after` (all rows
+        when None), oldest first, as plain dicts of `sync_fields` plus deleted_at.
+
+        updated_at is stamped when a statement runs, not when its transaction
+        commits, so a row can become visible long after later rows were synced.
+        The page therefore stops before the start of the oldest open transaction
+        that writes or waits for a row lock (from information_schema.INNODB_TRX,
+        which needs the PROCESS privilege): everything stamped earlier is either
+        committed or rolled back. Plain reads don't hold it back. Rows of the last
+        `settle_seconds` are held back too, covering a statement that has read
+        NOW() but not yet registered its first lock.
+        """
+        columns = ", ".join(dict.fromkeys(cls.sync_fields + ('updated_at', 'deleted_at')))
+        where = ["""updated_at < LEAST(
+            NOW() - INTERVAL %s SECOND,
+            COALESCE((SELECT MIN(trx_started) FROM information_schema.INNODB_TRX
+                      WHERE trx_mysql_thread_id <> CONNECTION_ID()
+                        AND (trx_lock_structs > 0 OR trx_state = 'LOCK WAIT')), NOW())
+        )"""]
+        params = [settle_seconds]
+        if after is not None:
+            # Expanded form of (updated_at, id) > (%s, %s) that stays an index range scan.
+            where.append("updated_at >= %s AND (updated_at > %s OR id > %s)")
+            params.extend([after[0], after[0], after[1]])
+        query = f"""
+            SELECT {columns} FROM {cls._table_name}
+            WHERE {" AND ".join(where)}
+            ORDER BY updated_at, id
+            LIMIT %s
+        """
+        return DBManager.execute_query(query, (*params, limit), fetch='all', cache=False)
+
     @classmethod
     def search(cls, search_term, search_fields, include_deleted=False):
         base_query = cls._get_base_query(include_deleted)
@@ -1,28 +1,53 @@
-from .base_model import BaseModel
+from .base_model import BaseModel, VersionConflict, to_datetime, to_decimal
 from app.database.db_manager import DBManager
 from decimal import Decimal
-from datetime import datetime, date
+from app.utils.search import tokenize_name, escape_like
+from app.utils.events import publish, record_event, record_events
 
 class Customer(BaseModel):
     _table_name = 'customers'
+    _versioned = True
+    _public_fields = ('id', 'name', 'email', 'phone', 'address', 'gst_number', 'created_at', 'updated_at')
 
-    def __init__(self, **kwargs):
-        for key, value in kwargs.items():
-            if key in ('created_at', 'updated_at') and value and isinstance(value, str):
-                try:
-                    setattr(self, key, datetime.fromisoformat(value.replace(' ', 'T')))
-                except (ValueError, TypeError):
-                    setattr(self, key, value)
-            else:
-                setattr(self, key, value)
-        
-        self.invoices = getattr(self, 'invoices', [])
-        self.aggregates = getattr(self, 'aggregates', {})
+    # 'status' is aggregated from invoices; 'aggregates' is only available on the detail view.
+    list_fields = _public_fields + ('status',)
+    detail_fields = list_fields + ('aggregates',)
 
-    def to_dict(self):
-        created_at_iso = self.created_at.isoformat() if isinstance(self.created_at, (datetime, date)) else None
-        updated_at_iso = self.updated_at.isoformat() if isinstance(self.updated_at, (datetime, date)) else None
+    _columns = (
+        ('id', None),
+        ('name', None),
+        ('email', None),
+        ('phone', None),
+        ('address', None),
+        ('gst_number', None),
+        ('created_at', to_datetime),
+        ('updated_at', to_datetime),
+        ('deleted_at', to_datetime),
+        # Computed by the list and detail queries.
+        ('status', None),
+        ('total_billed', to_decimal),
+        ('aggregates', None),
+    )
+    _defaults = (('aggregates', dict),)
+
+    # Columns of CSV/NDJSON exports, in order.
+    export_fields = list_fields
+    # Stored columns returned by /sync.
+    sync_fields = _public_fields
+    # Columns written by the bulk import.
+    _bulk_fields = ('name', 'email', 'phone', 'address', 'gst_number')
 
+    # Customer status in list views, aggregated over the joined invoices `i`.
+    _LIST_STATUS_SQL = """CASE
+                        WHEN SUM(CASE WHEN i.status = 'Overdue' THEN 1 ELSE 0 END) > 0 THEN 'Overdue'
+                        WHEN SUM(CASE WHEN i.status = 'Pending' THEN 1 ELSE 0 END) > 0 THEN 'Pending'
+                        WHEN SUM(CASE WHEN i.status = 'Partially Paid' THEN 1 ELSE 0 END) > 0 THEN 'Partially Paid'
+                        WHEN COUNT(i.id) > 0 AND SUM(CASE WHEN i.status = 'Paid' THEN 1 ELSE 0 END) = COUNT(i.id) THEN 'Paid'
+                        ELSE 'New'
+                    END"""
+
+    def to_dict(self):
+        # Dates are left as datetime objects; the response serializer formats them.
         return {
             'id': self.id,
             'name': self.name,
@@ -30,47 +55,56 @@ class Customer(BaseModel):
             'phone': self.phone,
             'address': self.address,
             'gst_number': self.gst_number,
-            'created_at': created_at_iso,
-            'updated_at': updated_at_iso,
+            'created_at': getattr(self, 'created_at', None),
+            'updated_at': getattr(self, 'updated_at', None),
             'status': getattr(self, 'status', None),
             'aggregates': self.aggregates
         }
 
-    @classmethod
-    def from_row(cls, row):
-        if not row:
-            return None
-        return cls(**row)
-
     @classmethod
     def create(cls, data):
         allowed_fields = {'name', 'email', 'phone', 'address', 'gst_number'}
         filtered_data = {key: value for key, value in data.items() if key in allowed_fields}
         if not filtered_data:
             return None
-        columns = ", ".join(filtered_data.keys())
-        placeholders = ", ".join(["%s"] * len(filtered_data))
-        query = f'INSERT INTO {cls._table_name} ({columns}) VALUES ({placeholders})'
-        return DBManager.execute_write_query(query, tuple(filtered_data.values()))
+        with DBManager.transaction():
+            customer = cls._insert(filtered_data)
+            cls.index_name_tokens(customer.id, customer.name)
+            record_event('customer', customer.id, 'customer.created', name=customer.name, email=customer.email)
+        # A customer without invoices is always 'New'; no need to aggregate.
+        customer.status = 'New'
+        return customer
 
     @classmethod
-    def update(cls, id, data):
-        if not data:
-            return 0
-        
+    def update(cls, id, data, expected_version=None):
+        """
+        Returns whether a live customer with this id exists (and was updated). With
+        `expected_version`, raises VersionConflict if the row's version moved on.
+        """
         allowed_fields = {'name', 'email', 'phone', 'address', 'gst_number'}
-        update_data = {key: value for key, value in data.items() if key in allowed_fields}
+        update_data = {key: value for key, value in (data or {}).items() if key in allowed_fields}
 
         if not update_data:
-            return 0
+            return cls.find_by_id(id) is not None
 
         set_clause = ", ".join([f"{key} = %s" for key in update_data.keys()])
-        query = f"UPDATE {cls._table_name} SET {set_clause}, updated_at = NOW() WHERE id = %s"
+        query = f"UPDATE {cls._table_name} SET {set_clause}, updated_at = NOW(), version = version + 1 WHERE id = %s AND deleted_at IS NULL"
         
         params = list(update_data.values())
         params.append(id)
+        if expected_version is not None:
+            query += " AND version = %s"
+            params.append(expected_version)
         
-        return DBManager.execute_write_query(query, tuple(params))
+        with DBManager.transaction():
+            if DBManager.execute_write_query(query, tuple(params)).rowcount == 0:
+                if expected_version is not None:
+                    raise VersionConflict(id)
+                return False
+            if 'name' in update_data:
+                cls.index_name_tokens(id, update_data['name'])
+            record_event('customer', id, 'customer.updated', changes=update_data)
+        return True
 
     @classmethod
     def find_by_email(cls, email, include_deleted=False):
@@ -81,22 +115,200 @@ class Customer(BaseModel):
         return cls.from_row(row)
     
     @classmethod
-    def find_by_id(cls, id, include_deleted=False):
-        query = f"SELECT * FROM {cls._table_name} WHERE id = %s"
+    def index_name_tokens(cls, customer_id, name):
+        """Replaces the customer's entries in the customer_name_tokens search index."""
+        cls.index_name_tokens_bulk({customer_id: name})
+
+    @classmethod
+    def index_name_tokens_bulk(cls, names):
+        """Batched index_name_tokens for {customer_id: name}: one DELETE and one multi-row INSERT."""
+        if not names:
+            return
+        placeholders = ", ".join(["%s"] * len(names))
+        DBManager.execute_write_query(f"DELETE FROM customer_name_tokens WHERE customer_id IN ({placeholders})", tuple(names))
+        params = [value for customer_id, name in names.items() for token in tokenize_name(name) for value in (token, customer_id)]
+        if params:
+            values = ", ".join(["(%s, %s)"] * (len(params) // 2))
+            DBManager.execute_write_query(f"INSERT INTO customer_name_tokens (token, customer_id) VALUES {values}", tuple(params))
+
+    @classmethod
+    def reindex_name_tokens(cls, batch_size=1000):
+        """
+        Rebuilds customer_name_tokens for every customer (soft-deleted ones too),
+        `batch_size` customers per keyset batch and transaction, e.g. to backfill
+        customers created before the index existed. Returns how many were indexed.
+        """
+        def build_query(after, limit):
+            return f"SELECT id, name FROM {cls._table_name} WHERE id > %s ORDER BY id LIMIT %s", (after, limit)
+
+        indexed, names = 0, {}
+        for row in DBManager.iter_keyset(build_query, batch_size=batch_size):
+            names[row['id']] = row['name']
+            if len(names) >= batch_size:
+                with DBManager.transaction():
+                    cls.index_name_tokens_bulk(names)
+                indexed += len(names)
+                names = {}
+        if names:
+            with DBManager.transaction():
+                cls.index_name_tokens_bulk(names)
+            indexed += len(names)
+        return indexed
+
+    @classmethod
+    def bulk_create(cls, rows):
+        """
+        Inserts many customers with one multi-row INSERT and returns {lower-cased email: id},
+        read back through the email index. Meant to run inside DBManager.transaction().
+        """
+        if not rows:
+            return {}
+        values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows))
+        params = [row.get(field) for row in rows for field in cls._bulk_fields]
+        DBManager.execute_write_query(
+            f"INSERT INTO {cls._table_name} ({', '.join(cls._bulk_fields)}) VALUES {values}", tuple(params)
+        )
+        ids = {email: customer.id for email, customer in cls.find_by_emails([row['email'] for row in rows]).items()}
+        record_events('customer', 'customer.created', [
+            (ids[row['email'].lower()], {'name': row.get('name'), 'email': row['email']})
+            for row in rows if row['email'].lower() in ids
+        ], publish_each=False)
+        return ids
+
+    @classmethod
+    def bulk_update(cls, rows, restore=False):
+        """
+        Updates many customers, given with their 'id', in one statement
+        (INSERT ... ON DUPLICATE KEY UPDATE on the primary key). Fields a row
+        leaves out keep their current value. restore=True also clears deleted_at.
+        """
+        if not rows:
+            return 0
+        fields = ('id',) + cls._bulk_fields
+        values = ", ".join(["(" + ", ".join(["%s"] * len(fields)) + ")"] * len(rows))
+        params = [row.get(field) for row in rows for field in fields]
+        assignments = ", ".join(f"{field} = COALESCE(VALUES({field}), {field})" for field in cls._bulk_fields if field != 'email')
+        if restore:
+            assignments += ", deleted_at = NULL"
+        query = f"""
+            INSERT INTO {cls._table_name} ({', '.join(fields)}) VALUES {values}
+            ON DUPLICATE KEY UPDATE {assignments}, updated_at = NOW(), version = version + 1
+        """
+        updated = DBManager.execute_write_query(query, tuple(params)).rowcount
+        record_events('customer', 'customer.restored' if restore else 'customer.updated', [
+            (row['id'], {'changes': {field: row[field] for field in cls._bulk_fields if row.get(field) is not None}})
+            for row in rows
+        ], publish_each=False)
+        return updated
+
+    @classmethod
+    def name_tokens_subquery(cls, words):
+        """
+        Subquery selecting the ids of customers whose name has a token starting
+        with each of `words`, for use as `customer_id IN (...)`. Returns
+        (sql, params). Every word is a range scan on the token index; the
+        per-word matches are intersected by the GROUP BY in MySQL, so a short
+        prefix matching many customers never truncates the result.
+        """
+        patterns = [escape_like(word) + "%" for word in words]
+        matches = " OR ".join(["token LIKE %s"] * len(patterns))
+        having = " AND ".join(["SUM(token LIKE %s) > 0"] * len(patterns))
+        sql = f"""
+            SELECT customer_id FROM customer_name_tokens
+            WHERE {matches}
+            GROUP BY customer_id
+            HAVING {having}
+        """
+        return sql, patterns + patterns
+
+    @classmethod
+    def find_by_ids(cls, ids):
+        """Loads many customers in one query, keyed by id. Soft-deleted customers are skipped."""
+        if not ids:
+            return {}
+        placeholders = ", ".join(["%s"] * len(ids))
+        query = f"SELECT * FROM {cls._table_name} WHERE id IN ({placeholders}) AND deleted_at IS NULL"
+        rows = DBManager.execute_query(query, tuple(ids), fetch='all')
+        return {row['id']: cls.from_row(row) for row in rows}
+
+    @classmethod
+    def find_by_emails(cls, emails, include_deleted=False):
+        """Loads many customers by email in one query, keyed by lower-cased email."""
+        if not emails:
+            return {}
+        placeholders = ", ".join(["%s"] * len(emails))
+        query = f"SELECT * FROM {cls._table_name} WHERE email IN ({placeholders})"
         if not include_deleted:
             query += " AND deleted_at IS NULL"
-        row = DBManager.execute_query(query, (id,), fetch='one')
-        return cls.from_row(row)
+        rows = DBManager.execute_query(query, tuple(emails), fetch='all')
+        return {row['email'].lower(): cls.from_row(row) for row in rows}
 
     @classmethod
-    def find_by_id_with_aggregates(cls, customer_id, include_deleted=False):
+    def version_probe(cls, customer_id, include_deleted=False):
+        """
+        Version probe for the customer detail view, covering the customer row and the
+        invoices and payments its status and aggregates are computed from. The
+        invoices' and payments' latest updated_at feed Last-Modified.
+        """
+        query = f"""
+            SELECT
+                c.id, c.created_at, c.updated_at, c.version,
+                (SELECT CONCAT(COUNT(*), ':', COALESCE(MAX(i.id), 0), ':', COALESCE(MAX(i.updated_at), ''))
+                   FROM invoices i WHERE i.customer_id = c.id) AS invoices_version,
+                (SELECT CONCAT(COUNT(*), ':', COALESCE(MAX(p.id), 0), ':', COALESCE(MAX(p.updated_at), ''))
+                   FROM payments p JOIN invoices i ON i.id = p.invoice_id
+                   WHERE i.customer_id = c.id) AS payments_version,
+                (SELECT MAX(i.updated_at) FROM invoices i WHERE i.customer_id = c.id) AS invoices_updated_at,
+                (SELECT MAX(p.updated_at) FROM payments p JOIN invoices i ON i.id = p.invoice_id
+                   WHERE i.customer_id = c.id) AS payments_updated_at
+            FROM {cls._table_name} c
+            WHERE c.id = %s
+        """
+        if not include_deleted:
+            query += " AND c.deleted_at IS NULL"
+        return DBManager.execute_query(query, (customer_id,), fetch='one', cache=False)
+
+    @classmethod
+    def opening_balance(cls, customer_id, before):
+        """
+        What the customer owed before the date `before`: their live invoices created
+        earlier less the live payments on them dated earlier. One statement, read
+        from the covering idx_invoices_aging and idx_payments_invoice.
+        """
+        query = """
+            SELECT
+                (SELECT COALESCE(SUM(i.total_amount), 0) FROM invoices i
+                  WHERE i.deleted_at IS NULL AND i.customer_id = %s AND i.created_at < %s)
+              - (SELECT COALESCE(SUM(p.amount), 0) FROM payments p
+                  JOIN invoices i ON i.id = p.invoice_id
+                  WHERE i.deleted_at IS NULL AND i.customer_id = %s
+                    AND p.deleted_at IS NULL AND p.payment_date < %s) AS balance
+        """
+        row = DBManager.execute_query(query, (customer_id, before, customer_id, before), fetch='one')
+        return to_decimal(row['balance']) if row else Decimal('0.00')
+
+    @classmethod
+    def find_by_id_with_aggregates(cls, customer_id, include_deleted=False, fields=None):
+        """
+        Loads a customer with its status and billing aggregates. With a sparse
+        `fields` list, the invoices join is skipped unless 'status' or 'aggregates'
+        were requested, and the per-invoice aggregate queries only run for 'aggregates'.
+        """
+        select_sql = f"c.{', c.'.join(f for f in fields if f in cls._public_fields)}" if fields else "c.*"
+        want_aggregates = not fields or 'aggregates' in fields
+        if fields and 'status' not in fields and not want_aggregates:
+            query = f"SELECT {select_sql} FROM {cls._table_name} c WHERE c.id = %s"
+            if not include_deleted:
+                query += " AND c.deleted_at IS NULL"
+            return cls.from_row(DBManager.execute_query(query, (customer_id,), fetch='one'))
+
         customer_query = f"""
             SELECT
-                c.*,
+                {select_sql},
                 COALESCE(SUM(i.total_amount), 0) AS total_billed,
                 CASE
                     WHEN COUNT(i.id) = 0 THEN 'New'
-                    WHEN SUM(CASE WHEN i.status = 'Overdue' OR (i.status = 'Pending' AND i.due_date < NOW()) THEN 1 ELSE 0 END) > 0 THEN 'Overdue'
+                    WHEN SUM(CASE WHEN i.status = 'Overdue' THEN 1 ELSE 0 END) > 0 THEN 'Overdue'
                     WHEN SUM(CASE WHEN i.status = 'Pending' THEN 1 ELSE 0 END) > 0 THEN 'Pending'
                     WHEN SUM(CASE WHEN i.status = 'Paid' THEN 1 ELSE 0 END) = COUNT(i.id) THEN 'Paid'
                     ELSE 'New'
@@ -111,6 +323,9 @@ class Customer(BaseModel):
         customer_row = DBManager.execute_query(customer_query, (customer_id,), fetch='one')
         if not customer_row:
             return None
+        if not want_aggregates:
+            customer_row.pop('total_billed', None)
+            return cls.from_row(customer_row)
 
         invoices_query = """
             SELECT 
@@ -126,8 +341,8 @@ class Customer(BaseModel):
         total_paid_query = "SELECT COALESCE(SUM(p.amount), 0) as total_paid FROM payments p JOIN invoices i ON p.invoice_id = i.id WHERE i.customer_id = %s"
         total_paid_row = DBManager.execute_query(total_paid_query, (customer_id,), fetch='one')
 
-        total_paid = float(total_paid_row['total_paid']) if total_paid_row and total_paid_row['total_paid'] is not None else 0.0
-        total_billed = float(customer_row['total_billed']) if customer_row and customer_row['total_billed'] is not None else 0.0
+        total_paid = total_paid_row['total_paid'] if total_paid_row and total_paid_row['total_paid'] is not None else Decimal('0.00')
+        total_billed = customer_row['total_billed'] if customer_row['total_billed'] is not None else Decimal('0.00')
         
         customer = cls.from_row(customer_row)
         total_due = total_billed - total_paid
@@ -135,16 +350,14 @@ class Customer(BaseModel):
         invoices_list = []
         if invoices_rows:
             for row in invoices_rows:
-                due_date = row.get('due_date')
-                created_at = row.get('created_at')
                 invoices_list.append({
                     'id': row['id'],
                     'invoice_number': row['invoice_number'],
-                    'due_date': due_date.isoformat() if isinstance(due_date, (datetime, date)) else str(due_date),
-                    'total_amount': float(row.get('total_amount') or 0.0),
-                    'created_at': created_at.isoformat() if isinstance(created_at, (datetime, date)) else str(created_at),
+                    'due_date': row.get('due_date'),
+                    'total_amount': row.get('total_amount') or Decimal('0.00'),
+                    'created_at': row.get('created_at'),
                     'status': row['status'],
-                    'due_amount': float(row.get('due_amount') or 0.0)
+                    'due_amount': row.get('due_amount') or Decimal('0.00')
                 })
 
         customer.aggregates = {
@@ -157,7 +370,12 @@ class Customer(BaseModel):
         return customer
 
     @classmethod
-    def list_all(cls, q=None, status=None, offset=0, limit=20, customer_id=None, include_deleted=False):
+    def list_all(cls, q=None, status=None, offset=0, limit=20, customer_id=None, include_deleted=False, stream=False, fields=None):
+        """
+        Returns (customers, total). With stream=True, customers is a lazy generator
+        backed by a server-side cursor instead of a list. `fields` narrows the
+        SELECT list; the invoices join is only made when status is requested or filtered.
+        """
         where = []
         params = []
 
@@ -173,29 +391,26 @@ class Customer(BaseModel):
 
         where_sql = " WHERE " + " AND ".join(where) if where else ""
 
+        column_sql = ", ".join(f"c.{f}" for f in (fields or cls._public_fields) if f in cls._public_fields)
+        need_status = not fields or 'status' in fields or bool(status)
+
         # base query without filters on alias
-        base_query = f"""
-            SELECT 
-                c.id, 
-                c.name, 
-                c.email, 
-                c.phone, 
-                c.address, 
-                c.gst_number, 
-                c.created_at, 
-                c.updated_at,
-                CASE
-                    WHEN SUM(CASE WHEN i.status = 'Overdue' THEN 1 ELSE 0 END) > 0 THEN 'Overdue'
-                    WHEN SUM(CASE WHEN i.status = 'Pending' THEN 1 ELSE 0 END) > 0 THEN 'Pending'
-                    WHEN SUM(CASE WHEN i.status = 'Partially Paid' THEN 1 ELSE 0 END) > 0 THEN 'Partially Paid'
-                    WHEN COUNT(i.id) > 0 AND SUM(CASE WHEN i.status = 'Paid' THEN 1 ELSE 0 END) = COUNT(i.id) THEN 'Paid'
-                    ELSE 'New'
-                END AS status
-            FROM {cls._table_name} c
-            LEFT JOIN invoices i ON c.id = i.customer_id AND i.deleted_at IS NULL
-            {where_sql}
-            GROUP BY c.id
-        """
+        if not need_status:
+            base_query = f"""
+                SELECT {column_sql}
+                FROM {cls._table_name} c
+                {where_sql}
+            """
+        else:
+            base_query = f"""
+                SELECT 
+                    {column_sql},
+                    {cls._LIST_STATUS_SQL} AS status
+                FROM {cls._table_name} c
+                LEFT JOIN invoices i ON c.id = i.customer_id AND i.deleted_at IS NULL
+                {where_sql}
+                GROUP BY c.id
+            """
 
         # wrap base_query so we can filter using alias "status"
         outer_where = ""
@@ -213,8 +428,11 @@ class Customer(BaseModel):
 
         pagination_params = params + ([status] if status else []) + [limit, offset]
 
-        rows = DBManager.execute_query(final_query, tuple(pagination_params), fetch='all')
-        customers = [cls.from_row(row) for row in rows] if rows else []
+        if stream:
+            customers = (cls.from_row(row) for row in DBManager.iter_query(final_query, tuple(pagination_params)))
+        else:
+            rows = DBManager.execute_query(final_query, tuple(pagination_params), fetch='all')
+            customers = [cls.from_row(row) for row in rows] if rows else []
 
         # count query
         count_query = f"""
@@ -230,16 +448,69 @@ class Customer(BaseModel):
 
         return customers, total
 
+    @classmethod
+    def export_rows(cls, q=None, status=None, include_deleted=False, updated_since=None, batch_size=1000):
+        """
+        Yields every customer matching the list filters, with status, in id order.
+        Status is aggregated per keyset batch (DBManager.iter_keyset) and filtered
+        with HAVING, which the LIMIT applies after, so batches stay full.
+        """
+        where, params = [], []
+        if not include_deleted:
+            where.append("c.deleted_at IS NULL")
+        if q:
+            where.append("(c.name LIKE %s OR c.email LIKE %s OR c.phone LIKE %s)")
+            like = f"%{q}%"
+            params.extend([like, like, like])
+        if updated_since:
+            where.append("(c.updated_at >= %s OR c.created_at >= %s)")
+            params.extend([updated_since, updated_since])
+        having_sql = "HAVING status = %s" if status else ""
+        having_params = [status] if status else []
+        column_sql = ", ".join(f"c.{field}" for field in cls._public_fields)
+
+        def build_query(after, limit):
+            query = f"""
+                SELECT {column_sql}, {cls._LIST_STATUS_SQL} AS status
+                FROM {cls._table_name} c
+                LEFT JOIN invoices i ON c.id = i.customer_id AND i.deleted_at IS NULL
+                WHERE {" AND ".join(["c.id > %s"] + where)}
+                GROUP BY c.id
+                {having_sql}
+                ORDER BY c.id
+                LIMIT %s
+            """
+            return query, (after, *params, *having_params, limit)
+
+        for row in DBManager.iter_keyset(build_query, batch_size=batch_size):
+            yield cls.from_row(row)
+
     @classmethod
     def bulk_soft_delete(cls, ids):
         if not ids:
             return 0
         placeholders = ', '.join(['%s'] * len(ids))
-        query = f"UPDATE {cls._table_name} SET deleted_at = NOW() WHERE id IN ({placeholders}) AND deleted_at IS NULL"
-        DBManager.execute_write_query(query, tuple(ids))
-        return len(ids)
+        with DBManager.transaction():
+            # Locks the live rows first, so only customers this call deletes get an event.
+            rows = DBManager.execute_query(
+                f"SELECT id FROM {cls._table_name} WHERE id IN ({placeholders}) AND deleted_at IS NULL FOR UPDATE",
+                tuple(ids), fetch='all'
+            )
+            live = [row['id'] for row in rows]
+            if not live:
+                return 0
+            placeholders = ', '.join(['%s'] * len(live))
+            query = f"UPDATE {cls._table_name} SET deleted_at = NOW(), version = version + 1 WHERE id IN ({placeholders})"
+            deleted = DBManager.execute_write_query(query, tuple(live)).rowcount
+            record_events('customer', 'customer.deleted', [(customer_id, {}) for customer_id in live], publish_each=False)
+            publish('customers.deleted', ids=live)
+        return deleted
 
     @classmethod
     def restore(cls, id):
-        query = f"UPDATE {cls._table_name} SET deleted_at = NULL, updated_at = NOW() WHERE id = %s AND deleted_at IS NOT NULL"
-        return DBManager.execute_write_query(query, (id,))
+        query = f"UPDATE {cls._table_name} SET deleted_at = NULL, updated_at = NOW(), version = version + 1 WHERE id = %s AND deleted_at IS NOT NULL"
+        with DBManager.transaction():
+            restored = DBManager.execute_write_query(query, (id,)).rowcount
+            if restored:
+                record_event('customer', id, 'customer.restored')
+        return restored
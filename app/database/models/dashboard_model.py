@@ -211,7 +211,7 @@ def get_latest_invoices() -> List[Dict[str, Any]]:
                     "total_amount": total_amount,
                     "due_amount": due_amount,
                     "status": inv["status"],
-                    "created_at": inv["created_at"].isoformat() if inv["created_at"] else None,
+                    "created_at": inv["created_at"],
                     "customer": {
                         "id": inv["customer_id"],
                         "name": inv["customer_name"],
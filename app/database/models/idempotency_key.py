@@ -0,0 +1,86 @@
+import pymysql
+from .base_model import BaseModel, to_datetime
+from app.database.db_manager import DBManager
+
+# MySQL error numbers.
+ER_DUP_ENTRY = 1062
+ER_LOCK_WAIT_TIMEOUT = 1205
+
+
+class IdempotencyKeyBusy(Exception):
+    """Raised when another request holding the same key didn't finish within the lock wait."""
+
+
+class IdempotencyKey(BaseModel):
+    """
+    A client's Idempotency-Key and the response its request produced. The row is
+    inserted at the start of the request's DBManager.transaction() and completed
+    at its end, so it only ever becomes visible together with the request's
+    writes. A concurrent request with the same key blocks on the unique index
+    until the first one commits (and then replays it) or rolls back (and then
+    runs itself).
+    """
+    _table_name = 'idempotency_keys'
+    _public_fields = ('id', 'user_id', 'idempotency_key', 'request_method', 'request_path', 'fingerprint',
+                      'response_status', 'response_body', 'response_mimetype', 'created_at')
+
+    _columns = (
+        ('id', None),
+        ('user_id', None),
+        ('idempotency_key', None),
+        ('request_method', None),
+        ('request_path', None),
+        ('fingerprint', None),
+        ('response_status', None),
+        ('response_body', None),
+        ('response_mimetype', None),
+        ('created_at', to_datetime),
+    )
+
+    @classmethod
+    def claim(cls, user_id, key, method, path, fingerprint, lock_wait_seconds=10):
+        """
+        Inserts the key inside the current transaction. Returns the new row's id, or
+        None when a committed request already holds the key. Raises
+        IdempotencyKeyBusy if a request still running with it outlasts the lock wait.
+        """
+        DBManager.execute_query("SET SESSION innodb_lock_wait_timeout = %s", (int(lock_wait_seconds),))
+        query = f"""
+            INSERT INTO {cls._table_name} (user_id, idempotency_key, request_method, request_path, fingerprint)
+            VALUES (%s, %s, %s, %s, %s)
+        """
+        try:
+            return DBManager.execute_write_query(query, (user_id, key, method, path, fingerprint)).lastrowid
+        except pymysql.err.IntegrityError as e:
+            if e.args[0] == ER_DUP_ENTRY:
+                return None
+            raise
+        except pymysql.err.OperationalError as e:
+            if e.args[0] == ER_LOCK_WAIT_TIMEOUT:
+                raise IdempotencyKeyBusy(key) from e
+            raise
+
+    @classmethod
+    def complete(cls, key_id, status, body, mimetype):
+        """Stores the response to replay. Run it in the same transaction as claim()."""
+        query = f"""
+            UPDATE {cls._table_name} SET response_status = %s, response_body = %s, response_mimetype = %s
+            WHERE id = %s
+        """
+        DBManager.execute_write_query(query, (status, body, mimetype, key_id))
+
+    @classmethod
+    def find(cls, user_id, key):
+        query = f"SELECT * FROM {cls._table_name} WHERE user_id = %s AND idempotency_key = %s"
+        return cls.from_row(DBManager.execute_query(query, (user_id, key), fetch='one', cache=False))
+
+    @classmethod
+    def purge_expired(cls, ttl_seconds, batch_size=1000):
+        """Deletes keys older than `ttl_seconds`, `batch_size` rows per statement. Returns the count."""
+        query = f"DELETE FROM {cls._table_name} WHERE created_at < NOW() - INTERVAL %s SECOND LIMIT %s"
+        deleted = 0
+        while True:
+            rowcount = DBManager.execute_write_query(query, (int(ttl_seconds), batch_size)).rowcount
+            deleted += rowcount
+            if rowcount < batch_size:
+                return deleted
@@ -0,0 +1,102 @@
+import json
+from .base_model import BaseModel, to_datetime, to_int
+from app.database.db_manager import DBManager
+
+def to_json_object(value):
+    return json.loads(value) if isinstance(value, (str, bytes)) else value
+
+class ImportBatch(BaseModel):
+    """
+    Progress record of one bulk import. Records are read in input order, and each
+    chunk is committed together with its checkpoint, so `processed_records` is
+    always exactly the number of input records whose outcome (written or
+    rejected) is durable. Re-running the same input against the batch resumes
+    after them.
+    """
+    _table_name = 'import_batches'
+    _public_fields = ('id', 'kind', 'format', 'source', 'options', 'status', 'processed_records',
+                      'imported_records', 'failed_records', 'counts', 'last_error', 'user_id', 'created_at', 'updated_at')
+
+    _columns = (
+        ('id', None),
+        ('kind', None),
+        ('format', None),
+        ('source', None),
+        ('options', to_json_object),
+        ('status', None),
+        ('processed_records', to_int),
+        ('imported_records', to_int),
+        ('failed_records', to_int),
+        ('counts', to_json_object),
+        ('last_error', None),
+        ('user_id', None),
+        ('created_at', to_datetime),
+        ('updated_at', to_datetime),
+    )
+    _defaults = (('options', dict), ('counts', dict))
+
+    def to_dict(self):
+        return {field: getattr(self, field, None) for field in self._public_fields}
+
+    @classmethod
+    def create(cls, kind, import_format, user_id, source=None, options=None):
+        return cls._insert({
+            'kind': kind,
+            'format': import_format,
+            'source': source,
+            'options': json.dumps(options or {}),
+            'user_id': user_id,
+        })
+
+    @classmethod
+    def find_by_id(cls, batch_id):
+        # Progress is written by whichever worker runs the import, so never cached.
+        query = f"SELECT * FROM {cls._table_name} WHERE id = %s"
+        return cls.from_row(DBManager.execute_query(query, (batch_id,), fetch='one', cache=False))
+
+    @classmethod
+    def checkpoint(cls, batch_id, processed_records, imported, errors, counts=None):
+        """
+        Records a chunk: its rejected records (a list of (record_number, reference,
+        errors) tuples), the new resume position and the running per-outcome
+        `counts`. Run it inside the chunk's DBManager.transaction() so the
+        checkpoint commits with the chunk's rows.
+        """
+        if errors:
+            values = ", ".join(["(%s, %s, %s, %s)"] * len(errors))
+            params = []
+            for record_number, reference, messages in errors:
+                params.extend((batch_id, record_number, reference, json.dumps(messages, default=str)))
+            DBManager.execute_write_query(
+                f"INSERT INTO import_errors (batch_id, record_number, reference, errors) VALUES {values}",
+                tuple(params)
+            )
+        query = f"""
+            UPDATE {cls._table_name}
+            SET processed_records = %s, imported_records = imported_records + %s,
+                failed_records = failed_records + %s, counts = %s, status = 'running', last_error = NULL
+            WHERE id = %s
+        """
+        params = (processed_records, imported, len(errors), json.dumps(counts or {}), batch_id)
+        DBManager.execute_write_query(query, params)
+
+    @classmethod
+    def finish(cls, batch_id, status, last_error=None):
+        query = f"UPDATE {cls._table_name} SET status = %s, last_error = %s WHERE id = %s"
+        DBManager.execute_write_query(query, (status, last_error, batch_id))
+
+    @classmethod
+    def find_errors(cls, batch_id, offset=0, limit=100):
+        """One page of a batch's per-record error report, in input order, and the total."""
+        rows = DBManager.execute_query(
+            """
+            SELECT record_number, reference, errors FROM import_errors
+            WHERE batch_id = %s ORDER BY record_number LIMIT %s OFFSET %s
+            """,
+            (batch_id, limit, offset), fetch='all', cache=False
+        )
+        total = DBManager.execute_query(
+            "SELECT COUNT(*) AS total FROM import_errors WHERE batch_id = %s",
+            (batch_id,), fetch='one', cache=False
+        )['total']
+        return [{**row, 'errors': json.loads(row['errors'])} for row in rows], total
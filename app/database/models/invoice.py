@@ -1,52 +1,116 @@
-from .base_model import BaseModel
+from .base_model import BaseModel, VersionConflict, to_date, to_datetime, to_decimal
 from app.database.db_manager import DBManager
-from datetime import datetime, date
+from app.database import identity_map
+from app.database.models.customer import Customer
+from app.utils.search import InvoiceSearch, escape_like
+from app.utils.events import publish, record_event, record_events
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 
 class Invoice(BaseModel):
     _table_name = 'invoices'
+    _versioned = True
 
-    def __init__(self, **kwargs):
-        super().__init__()
-        for key, value in kwargs.items():
-            # Convert date/datetime strings from DB to objects upon instantiation
-            if key in ('created_at', 'updated_at') and value and isinstance(value, str):
-                try:
-                    value = datetime.fromisoformat(value.replace(' ', 'T'))
-                except ValueError:
-                    pass
-            elif key == 'due_date' and value and isinstance(value, str):
-                try:
-                    value = date.fromisoformat(value)
-                except ValueError:
-                    pass
-            setattr(self, key, value)
-
-    def to_dict(self):
-        return {
+    # SELECT expressions needed for each field clients can request via ?fields=.
+    _field_columns = {
+        'id': ('i.id',),
+        'invoice_number': ('i.invoice_number',),
+        'created_at': ('i.created_at',),
+        'due_date': ('i.due_date',),
+        'subtotal_amount': ('i.subtotal_amount',),
+        'discount_amount': ('i.discount_amount',),
+        'tax_percent': ('i.tax_percent',),
+        'tax_amount': ('i.tax_amount',),
+        'total_amount': ('i.total_amount',),
+        'due_amount': ('(i.total_amount - COALESCE(SUM(p.amount), 0)) AS due_amount',),
+        'amount_paid': ('COALESCE(SUM(p.amount), 0) AS amount_paid',),
+        'status': ('i.status',),
+        'updated_at': ('i.updated_at',),
+        'customer': ('i.customer_id', 'c.name AS customer_name', 'c.phone AS customer_phone'),
+    }
+    # Fields that can only be produced by joining another table.
+    _payment_fields = {'due_amount', 'amount_paid'}
+    _customer_fields = {'customer'}
+
+    list_fields = tuple(_field_columns)
+    detail_fields = list_fields + ('items', 'payment')
+    # Columns of CSV/NDJSON exports, in order.
+    export_fields = ('id', 'invoice_number', 'customer_id', 'customer_name', 'user_id', 'due_date',
+                     'subtotal_amount', 'discount_amount', 'tax_percent', 'tax_amount', 'total_amount',
+                     'amount_paid', 'due_amount', 'status', 'created_at', 'updated_at')
+    # Stored columns returned by /sync; clients join customers and sum payments locally.
+    sync_fields = ('id', 'invoice_number', 'customer_id', 'user_id', 'due_date', 'subtotal_amount',
+                   'discount_amount', 'tax_percent', 'tax_amount', 'total_amount', 'status',
+                   'created_at', 'updated_at')
+
+    _columns = (
+        ('id', None),
+        ('invoice_number', None),
+        ('customer_id', None),
+        ('user_id', None),
+        ('due_date', to_date),
+        ('subtotal_amount', to_decimal),
+        ('discount_amount', to_decimal),
+        ('tax_percent', to_decimal),
+        ('tax_amount', to_decimal),
+        ('total_amount', to_decimal),
+        ('status', None),
+        ('created_at', to_datetime),
+        ('updated_at', to_datetime),
+        ('deleted_at', to_datetime),
+        # Joined from payments and customers.
+        ('amount_paid', to_decimal),
+        ('due_amount', to_decimal),
+        ('customer_name', None),
+        ('customer_phone', None),
+    )
+
+    def to_dict(self, fields=None):
+        """
+        Serializes the invoice. When `fields` is given, only those keys are returned
+        (and only those columns need to have been selected). Money and date values
+        stay Decimal/date; the response serializer encodes them.
+        """
+        data = {
             "id": self.id,
-            "invoice_number": self.invoice_number,
-            "created_at": self.created_at.isoformat() if getattr(self, 'created_at', None) else None,
-            "due_date": self.due_date.isoformat() if getattr(self, 'due_date', None) else None,
-            "subtotal_amount": float(self.subtotal_amount),
-            "discount_amount": float(self.discount_amount),
-            "tax_percent": float(self.tax_percent),
-            "tax_amount": float(self.tax_amount),
-            "total_amount": float(self.total_amount),
-            "due_amount": float(getattr(self, 'due_amount', 0.0)),
-            "amount_paid": float(getattr(self, 'amount_paid', 0.0)),
-            "status": self.status,
-            "updated_at": self.updated_at.isoformat() if getattr(self, 'updated_at', None) else None,
+            "invoice_number": getattr(self, 'invoice_number', None),
+            "created_at": getattr(self, 'created_at', None),
+            "due_date": getattr(self, 'due_date', None),
+            "subtotal_amount": getattr(self, 'subtotal_amount', None),
+            "discount_amount": getattr(self, 'discount_amount', None),
+            "tax_percent": getattr(self, 'tax_percent', None),
+            "tax_amount": getattr(self, 'tax_amount', None),
+            "total_amount": getattr(self, 'total_amount', None),
+            "due_amount": getattr(self, 'due_amount', 0),
+            "amount_paid": getattr(self, 'amount_paid', 0),
+            "status": getattr(self, 'status', None),
+            "updated_at": getattr(self, 'updated_at', None),
             "customer": {
                 "id": getattr(self, "customer_id", None),
                 "name": getattr(self, "customer_name", None),
                 "phone": getattr(self, "customer_phone", None),
             }
         }
+        if fields:
+            return {key: data[key] for key in fields if key in data}
+        return data
 
     @classmethod
-    def from_row(cls, row):
-        return cls(**row) if row else None
+    def _build_select(cls, fields, join_customer=True):
+        """
+        Returns (select_sql, join_payments, join_customer) for a sparse fieldset.
+        Joins are only requested when one of the selected fields needs them.
+        """
+        join_payments = any(field in cls._payment_fields for field in fields)
+        join_customer = join_customer and any(field in cls._customer_fields for field in fields)
+
+        expressions = []
+        for field in fields:
+            columns = cls._field_columns.get(field, ())
+            if field == 'customer' and not join_customer:
+                columns = ('i.customer_id',)
+            expressions.extend(columns)
+        return ", ".join(dict.fromkeys(expressions)), join_payments, join_customer
 
     @classmethod
     def create(cls, data):
@@ -57,11 +121,67 @@ class Invoice(BaseModel):
         query = "INSERT INTO invoices (customer_id, user_id, invoice_number, due_date, subtotal_amount, discount_amount, tax_percent, tax_amount, total_amount, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
         params = (data['customer_id'], data['user_id'], data['invoice_number'], data['due_date'], data['subtotal_amount'], data['discount_amount'], data['tax_percent'], data['tax_amount'], data['total_amount'], data.get('status', 'Pending'))
         
-        invoice_id = DBManager.execute_write_query(query, params)
+        # The outbox event commits with the row, or not at all.
+        with DBManager.transaction():
+            invoice_id = DBManager.execute_write_query(query, params).lastrowid
+            record_event('invoice', invoice_id, 'invoice.created', invoice_number=data['invoice_number'],
+                         customer_id=data['customer_id'], total_amount=data['total_amount'], status=data.get('status', 'Pending'))
         return invoice_id
 
     @classmethod
-    def update(cls, invoice_id, data):
+    def bulk_create(cls, rows):
+        """
+        Inserts many invoices with one multi-row INSERT and returns {invoice_number: id}.
+        Rows take the create() keys plus an optional 'created_at' (for historical
+        invoices). Ids are read back by invoice_number rather than derived from
+        lastrowid, which the server only guarantees to be consecutive in some
+        auto-increment lock modes. Meant to run inside DBManager.transaction().
+        """
+        if not rows:
+            return {}
+        values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP))"] * len(rows))
+        query = f"""
+            INSERT INTO {cls._table_name} (customer_id, user_id, invoice_number, due_date, subtotal_amount,
+                discount_amount, tax_percent, tax_amount, total_amount, status, created_at)
+            VALUES {values}
+        """
+        params = []
+        for row in rows:
+            params.extend((
+                row['customer_id'], row['user_id'], row['invoice_number'], row.get('due_date'),
+                Decimal(row['subtotal_amount']).quantize(Decimal('0.00')),
+                Decimal(row['discount_amount']).quantize(Decimal('0.00')),
+                row['tax_percent'],
+                Decimal(row['tax_amount']).quantize(Decimal('0.00')),
+                Decimal(row['total_amount']).quantize(Decimal('0.00')),
+                row.get('status', 'Pending'),
+                row.get('created_at'),
+            ))
+        DBManager.execute_write_query(query, tuple(params))
+        publish('invoices.imported', count=len(rows))
+
+        numbers = [row['invoice_number'] for row in rows]
+        placeholders = ", ".join(["%s"] * len(numbers))
+        found = DBManager.execute_query(
+            f"SELECT id, invoice_number FROM {cls._table_name} WHERE invoice_number IN ({placeholders})",
+            tuple(numbers), fetch='all'
+        )
+        ids = {row['invoice_number']: row['id'] for row in found}
+        record_events('invoice', 'invoice.created', [
+            (ids[row['invoice_number']], {
+                'invoice_number': row['invoice_number'], 'customer_id': row['customer_id'],
+                'total_amount': row['total_amount'], 'status': row.get('status', 'Pending'),
+            })
+            for row in rows
+        ], publish_each=False)
+        return ids
+
+    @classmethod
+    def update(cls, invoice_id, data, expected_version=None):
+        """
+        Writes the given columns. With `expected_version` the UPDATE only applies
+        while the row still has that version, else VersionConflict is raised.
+        """
         if not data:
             return
 
@@ -77,23 +197,132 @@ class Invoice(BaseModel):
             set_clauses.append(f"{key} = %s")
             params.append(value)
 
-        query = f"UPDATE {cls._table_name} SET {', '.join(set_clauses)} WHERE id = %s"
+        query = f"UPDATE {cls._table_name} SET {', '.join(set_clauses)}, version = version + 1 WHERE id = %s"
         params.append(invoice_id)
-        DBManager.execute_write_query(query, tuple(params))
+        if expected_version is not None:
+            query += " AND version = %s"
+            params.append(expected_version)
+        with DBManager.transaction():
+            if DBManager.execute_write_query(query, tuple(params)).rowcount == 0:
+                if expected_version is not None:
+                    raise VersionConflict(invoice_id)
+                return
+            changes = {key: value for key, value in data.items() if key != 'updated_at'}
+            record_event('invoice', invoice_id, 'invoice.updated', status=data.get('status'),
+                         total_amount=data.get('total_amount'), changes=changes)
 
     @classmethod
-    def find_by_id(cls, invoice_id, include_deleted=False):
+    def find_by_id(cls, invoice_id, include_deleted=False, fields=None):
+        key = identity_map.make_key(cls._table_name, invoice_id, include_deleted, tuple(fields or ()))
+        invoice = identity_map.lookup(key)
+        if invoice is not identity_map.MISSING:
+            return invoice
+
+        if fields:
+            select_sql, join_payments, _ = cls._build_select(fields, join_customer=False)
+        else:
+            select_sql = "i.*, COALESCE(SUM(p.amount), 0) as amount_paid, (i.total_amount - COALESCE(SUM(p.amount), 0)) as due_amount"
+            join_payments = True
+
         query = f"""
-            SELECT i.*, COALESCE(SUM(p.amount), 0) as amount_paid, (i.total_amount - COALESCE(SUM(p.amount), 0)) as due_amount
+            SELECT {select_sql}
             FROM {cls._table_name} i
-            LEFT JOIN payments p ON i.id = p.invoice_id
-            WHERE i.id = %s
         """
+        if join_payments:
+            query += " LEFT JOIN payments p ON i.id = p.invoice_id"
+        query += " WHERE i.id = %s"
         if not include_deleted:
             query += " AND i.deleted_at IS NULL"
-        query += " GROUP BY i.id"
+        if join_payments:
+            query += " GROUP BY i.id"
         row = DBManager.execute_query(query, (invoice_id,), fetch='one')
-        return cls.from_row(row)
+        # Paid/due amounts are aggregated from payments, so a new payment evicts the invoice too;
+        # tagged with customers as well, so a customer write never leaves a stale embedded name.
+        return identity_map.store(key, cls.from_row(row), ('invoices', 'payments', 'customers'))
+
+    @classmethod
+    def version_probe(cls, invoice_id, include_deleted=False):
+        """
+        Version probe for the invoice detail view. Besides the invoice row it covers
+        everything the detail response embeds: the customer, the line items and
+        their products, and the payments. Only indexed lookups are involved.
+        """
+        query = """
+            SELECT
+                i.id, i.created_at, i.updated_at, i.version,
+                c.updated_at AS customer_updated_at,
+                (SELECT CONCAT(COUNT(*), ':', COALESCE(MAX(p.id), 0), ':', COALESCE(MAX(p.updated_at), ''))
+                   FROM payments p WHERE p.invoice_id = i.id) AS payments_version,
+                (SELECT MAX(p.created_at) FROM payments p WHERE p.invoice_id = i.id) AS payments_created_at,
+                (SELECT CONCAT(COUNT(*), ':', COALESCE(MAX(ii.id), 0), ':', COALESCE(MAX(pr.updated_at), ''))
+                   FROM invoice_items ii JOIN products pr ON pr.id = ii.product_id
+                   WHERE ii.invoice_id = i.id) AS items_version
+            FROM invoices i
+            JOIN customers c ON c.id = i.customer_id
+            WHERE i.id = %s
+        """
+        if not include_deleted:
+            query += " AND i.deleted_at IS NULL"
+        return DBManager.execute_query(query, (invoice_id,), fetch='one', cache=False)
+
+    @classmethod
+    def _find_where_in(cls, column, values):
+        placeholders = ", ".join(["%s"] * len(values))
+        query = f"""
+            SELECT i.*, COALESCE(SUM(p.amount), 0) AS amount_paid,
+                   (i.total_amount - COALESCE(SUM(p.amount), 0)) AS due_amount
+            FROM {cls._table_name} i
+            LEFT JOIN payments p ON i.id = p.invoice_id
+            WHERE i.{column} IN ({placeholders}) AND i.deleted_at IS NULL
+            GROUP BY i.id
+            ORDER BY i.id DESC
+        """
+        rows = DBManager.execute_query(query, tuple(values), fetch='all')
+        return [cls.from_row(row) for row in rows]
+
+    @classmethod
+    def find_by_ids(cls, ids):
+        """Loads many invoices (with paid/due amounts) in one query, keyed by id."""
+        if not ids:
+            return {}
+        return {invoice.id: invoice for invoice in cls._find_where_in('id', ids)}
+
+    @classmethod
+    def find_by_customer_ids(cls, customer_ids, per_customer=None):
+        """
+        Loads the invoices of many customers in one query, grouped by customer id,
+        newest first. `per_customer` keeps only that many of each customer's newest
+        invoices, picked with ROW_NUMBER() over the customer_id index before the
+        payments are joined.
+        """
+        if not customer_ids:
+            return {}
+        if per_customer is None:
+            rows = cls._find_where_in('customer_id', customer_ids)
+        else:
+            placeholders = ", ".join(["%s"] * len(customer_ids))
+            query = f"""
+                SELECT i.*, COALESCE(SUM(p.amount), 0) AS amount_paid,
+                       (i.total_amount - COALESCE(SUM(p.amount), 0)) AS due_amount
+                FROM (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (PARTITION BY customer_id ORDER BY id DESC) AS position
+                        FROM {cls._table_name}
+                        WHERE customer_id IN ({placeholders}) AND deleted_at IS NULL
+                    ) ranked
+                    WHERE position <= %s
+                ) newest
+                JOIN {cls._table_name} i ON i.id = newest.id
+                LEFT JOIN payments p ON i.id = p.invoice_id
+                GROUP BY i.id
+                ORDER BY i.id DESC
+            """
+            results = DBManager.execute_query(query, (*customer_ids, per_customer), fetch='all')
+            rows = [cls.from_row(row) for row in results]
+        invoices = {}
+        for invoice in rows:
+            invoices.setdefault(invoice.customer_id, []).append(invoice)
+        return invoices
 
     @classmethod
     def find_by_invoice_number(cls, invoice_number):
@@ -102,60 +331,268 @@ class Invoice(BaseModel):
         return cls.from_row(row)
 
     @classmethod
-    def list_all(cls, customer_id=None, status=None, offset=0, limit=10, q=None, include_deleted=False):
+    def list_all(cls, customer_id=None, status=None, offset=0, limit=10, q=None, include_deleted=False, stream=False, fields=None,
+                 due_from=None, due_to=None, min_total=None, max_total=None):
+        """
+        Returns (invoices, total). With stream=True, invoices is a lazy generator
+        backed by a server-side cursor instead of a list. `fields` narrows the
+        SELECT list and drops the customer/payments joins when they aren't needed.
+
+        `q` is parsed by InvoiceSearch: invoice-number-shaped input becomes a
+        prefix/sequence lookup on invoices, words become customer_id IN (...) via
+        the customer name token index. Matches are ranked exact number, then
+        number prefix, then name, newest first. The due date and total amount
+        ranges are served by idx_invoices_due_date / idx_invoices_total_amount.
+        """
+        rank_sql, rank_params = "", []
+        search_sql, search_params = None, []
+        if q:
+            search = InvoiceSearch(q)
+            search_sql, search_params, rank_sql, rank_params = cls._search_conditions(search)
+            if search_sql is None:
+                return [], 0
+
         where = []
         if not include_deleted:
             where.append("i.deleted_at IS NULL")
 
-        params = []
-        query_base = """ 
-            SELECT i.*, 
+        if fields:
+            select_sql, join_payments, join_customer = cls._build_select(fields)
+        else:
+            select_sql = """i.*, 
                    c.id AS customer_id,
                    c.name AS customer_name,
                    c.phone AS customer_phone,
                    COALESCE(SUM(p.amount), 0) AS amount_paid,
-                   (i.total_amount - COALESCE(SUM(p.amount), 0)) AS due_amount
+                   (i.total_amount - COALESCE(SUM(p.amount), 0)) AS due_amount"""
+            join_payments = join_customer = True
+
+        params = []
+        query_base = f""" 
+            SELECT {select_sql}
             FROM invoices i
-            JOIN customers c ON i.customer_id = c.id
-            LEFT JOIN payments p ON i.id = p.invoice_id
         """
+        if join_customer:
+            query_base += " JOIN customers c ON i.customer_id = c.id"
+        if join_payments:
+            query_base += " LEFT JOIN payments p ON i.id = p.invoice_id"
+
+        filter_sql, filter_params = cls._filter_conditions(customer_id, status, due_from, due_to, min_total, max_total)
+        where.extend(filter_sql)
+        params.extend(filter_params)
+        if search_sql:
+            where.append(search_sql)
+            params.extend(search_params)
+
+        where_sql = " WHERE " + " AND ".join(where) if where else ""
+        group_by_sql = " GROUP BY i.id" if join_payments else ""
+        if join_payments and join_customer:
+            group_by_sql += ", c.id, c.name, c.phone"
+        final_query = query_base + where_sql + group_by_sql + f" ORDER BY {rank_sql}i.id DESC LIMIT %s OFFSET %s"
+        query_params = tuple(params + rank_params + [limit, offset])
+
+        if stream:
+            invoices = (cls.from_row(row) for row in DBManager.iter_query(final_query, query_params))
+        else:
+            rows = DBManager.execute_query(final_query, query_params, fetch='all')
+            invoices = [cls.from_row(row) for row in rows] if rows else []
 
+        count_query_params = tuple(params)
+        count_query = "SELECT COUNT(*) as total FROM invoices i" + where_sql
+
+        count_result = DBManager.execute_query(count_query, count_query_params, fetch='one')
+        total = count_result['total'] if count_result else 0
+
+        return invoices, total
+    
+    @classmethod
+    def _filter_conditions(cls, customer_id=None, status=None, due_from=None, due_to=None, min_total=None, max_total=None):
+        """WHERE conditions (and their params) for the list filters, shared by list_all and export_rows."""
+        where, params = [], []
         if customer_id:
             where.append("i.customer_id = %s")
             params.append(customer_id)
         if status:
             where.append("i.status = %s")
             params.append(status)
+        if due_from:
+            where.append("i.due_date >= %s")
+            params.append(due_from)
+        if due_to:
+            where.append("i.due_date <= %s")
+            params.append(due_to)
+        if min_total is not None:
+            where.append("i.total_amount >= %s")
+            params.append(min_total)
+        if max_total is not None:
+            where.append("i.total_amount <= %s")
+            params.append(max_total)
+        return where, params
+
+    @classmethod
+    def export_rows(cls, q=None, include_deleted=False, updated_since=None, batch_size=1000, **filters):
+        """
+        Yields every invoice matching the list filters, with customer name and
+        paid/due amounts, in id order. Reads go through DBManager.iter_keyset, so
+        the aggregate joins only ever run over one batch of ids and there is no
+        COUNT. `updated_since` keeps invoices created or updated at or after it.
+        """
+        where, params = cls._filter_conditions(**filters)
+        if not include_deleted:
+            where.append("i.deleted_at IS NULL")
         if q:
-            where.append("(i.invoice_number LIKE %s OR c.name LIKE %s)")
-            like_q = f"%{q}%"
-            params.extend([like_q, like_q])
+            search_sql, search_params, _, _ = cls._search_conditions(InvoiceSearch(q))
+            if search_sql is None:
+                return
+            where.append(search_sql)
+            params.extend(search_params)
+        if updated_since:
+            where.append("(i.updated_at >= %s OR i.created_at >= %s)")
+            params.extend([updated_since, updated_since])
 
-        where_sql = " WHERE " + " AND ".join(where) if where else ""
-        group_by_sql = " GROUP BY i.id, c.id, c.name, c.phone ORDER BY i.id DESC LIMIT %s OFFSET %s"
-        final_query = query_base + where_sql + group_by_sql
-        params.extend([limit, offset])
+        def build_query(after, limit):
+            query = f"""
+                SELECT i.*, c.name AS customer_name, c.phone AS customer_phone,
+                       COALESCE(SUM(p.amount), 0) AS amount_paid,
+                       (i.total_amount - COALESCE(SUM(p.amount), 0)) AS due_amount
+                FROM {cls._table_name} i
+                JOIN customers c ON i.customer_id = c.id
+                LEFT JOIN payments p ON i.id = p.invoice_id
+                WHERE {" AND ".join(["i.id > %s"] + where)}
+                GROUP BY i.id, c.id, c.name, c.phone
+                ORDER BY i.id
+                LIMIT %s
+            """
+            return query, (after, *params, limit)
 
-        rows = DBManager.execute_query(final_query, tuple(params), fetch='all')
-        invoices = [cls.from_row(row) for row in rows] if rows else []
+        for row in DBManager.iter_keyset(build_query, batch_size=batch_size):
+            yield cls.from_row(row)
 
-        count_query_params = tuple(params[:-2])
-        count_query = """
-            SELECT COUNT(DISTINCT i.id) as total 
-            FROM invoices i 
-            JOIN customers c ON i.customer_id = c.id
-        """ + where_sql
+    @classmethod
+    def aging_by_customer(cls, as_of, customer_id=None):
+        """
+        Receivables aging as of the date `as_of`: one row per customer with an open
+        balance, holding the unpaid amount of their invoices per bucket of days
+        past due_date (current, 1-30, 31-60, 61-90, over 90), the total due and the
+        number of open invoices. Only invoices created and payments dated by
+        `as_of` count. Largest balances first.
 
-        count_result = DBManager.execute_query(count_query, count_query_params, fetch='one')
-        total = count_result['total'] if count_result else 0
+        One grouped statement: payments are summed per invoice from the covering
+        idx_payments_invoice, invoices are read from the covering idx_invoices_aging,
+        and customer names are only joined to the grouped rows. Results are cached
+        per table version by app.utils.reports.get_aging_report.
+        """
+        day_30, day_60, day_90 = (as_of - timedelta(days=days) for days in (30, 60, 90))
+        balance = "(i.total_amount - COALESCE(p.paid, 0))"
+        invoice_filter, payment_filter, filter_params = "", "", ()
+        if customer_id is not None:
+            invoice_filter = "AND i.customer_id = %s"
+            payment_filter = f"AND invoice_id IN (SELECT id FROM {cls._table_name} WHERE customer_id = %s)"
+            filter_params = (customer_id,)
+        query = f"""
+            SELECT c.id AS customer_id, c.name, c.email, a.open_invoices, a.total_due,
+                   a.current, a.days_1_30, a.days_31_60, a.days_61_90, a.days_over_90
+            FROM (
+                SELECT i.customer_id,
+                       COUNT(*) AS open_invoices,
+                       SUM({balance}) AS total_due,
+                       SUM(CASE WHEN i.due_date IS NULL OR i.due_date >= %s THEN {balance} ELSE 0 END) AS current,
+                       SUM(CASE WHEN i.due_date < %s AND i.due_date >= %s THEN {balance} ELSE 0 END) AS days_1_30,
+                       SUM(CASE WHEN i.due_date < %s AND i.due_date >= %s THEN {balance} ELSE 0 END) AS days_31_60,
+                       SUM(CASE WHEN i.due_date < %s AND i.due_date >= %s THEN {balance} ELSE 0 END) AS days_61_90,
+                       SUM(CASE WHEN i.due_date < %s THEN {balance} ELSE 0 END) AS days_over_90
+                FROM {cls._table_name} i
+                LEFT JOIN (
+                    SELECT invoice_id, SUM(amount) AS paid
+                    FROM payments
+                    WHERE deleted_at IS NULL AND payment_date <= %s {payment_filter}
+                    GROUP BY invoice_id
+                ) p ON p.invoice_id = i.id
+                WHERE i.deleted_at IS NULL AND i.created_at < %s {invoice_filter}
+                  AND i.total_amount > COALESCE(p.paid, 0)
+                GROUP BY i.customer_id
+            ) a
+            JOIN customers c ON c.id = a.customer_id
+            ORDER BY a.total_due DESC, c.id
+        """
+        params = (
+            as_of, as_of, day_30, day_30, day_60, day_60, day_90, day_90,
+            as_of, *filter_params,
+            datetime.combine(as_of + timedelta(days=1), time.min), *filter_params,
+        )
+        return DBManager.execute_query(query, params, fetch='all')
+
+    @classmethod
+    def iter_statement_debits(cls, customer_id, start=None, end=None, batch_size=1000):
+        """
+        Yields a customer's live invoices created between the dates `start` and
+        `end` (inclusive, either open) as raw rows, oldest first, through a
+        server-side cursor. Ordered by idx_invoices_statement, so nothing is sorted.
+        """
+        where, params = ["customer_id = %s", "deleted_at IS NULL"], [customer_id]
+        if start:
+            where.append("created_at >= %s")
+            params.append(datetime.combine(start, time.min))
+        if end:
+            where.append("created_at < %s")
+            params.append(datetime.combine(end + timedelta(days=1), time.min))
+        query = f"""
+            SELECT id, invoice_number, created_at, due_date, total_amount
+            FROM {cls._table_name}
+            WHERE {" AND ".join(where)}
+            ORDER BY created_at, id
+        """
+        return DBManager.iter_query(query, tuple(params), batch_size=batch_size)
+
+    @classmethod
+    def _search_conditions(cls, search):
+        """
+        Builds the WHERE condition and ORDER BY rank for an InvoiceSearch.
+        Returns (where_sql, where_params, rank_sql, rank_params), with where_sql None
+        when the search has nothing to match on.
+        """
+        conditions, params = [], []
+        number_conditions, number_params = [], []
+        if search.number_prefix:
+            number_conditions.append("i.invoice_number LIKE %s")
+            number_params.append(escape_like(search.number_prefix) + "%")
+        if search.sequence is not None:
+            number_conditions.append("i.invoice_seq = %s")
+            number_params.append(search.sequence)
+        conditions += number_conditions
+        params += number_params
+
+        if search.name_words:
+            customers_sql, customers_params = Customer.name_tokens_subquery(search.name_words)
+            conditions.append(f"i.customer_id IN ({customers_sql})")
+            params += customers_params
+
+        if not conditions:
+            return None, [], "", []
+
+        rank_sql, rank_params = "", []
+        if number_conditions:
+            rank_sql = f"CASE WHEN i.invoice_number = %s THEN 0 WHEN {' OR '.join(number_conditions)} THEN 1 ELSE 2 END, "
+            rank_params = [search.q.upper()] + number_params
+        return f"({' OR '.join(conditions)})", params, rank_sql, rank_params
 
-        return invoices, total
-    
     @classmethod
     def bulk_soft_delete(cls, ids):
         if not ids:
             return 0
         placeholders = ', '.join(['%s'] * len(ids))
-        query = f"UPDATE {cls._table_name} SET deleted_at = NOW() WHERE id IN ({placeholders}) AND deleted_at IS NULL"
-        DBManager.execute_write_query(query, tuple(ids))
-        return len(ids)
+        with DBManager.transaction():
+            # Locks the live rows first, so only invoices this call deletes get an event.
+            rows = DBManager.execute_query(
+                f"SELECT id FROM {cls._table_name} WHERE id IN ({placeholders}) AND deleted_at IS NULL FOR UPDATE",
+                tuple(ids), fetch='all'
+            )
+            live = [row['id'] for row in rows]
+            if not live:
+                return 0
+            placeholders = ', '.join(['%s'] * len(live))
+            query = f"UPDATE {cls._table_name} SET deleted_at = NOW(), version = version + 1 WHERE id IN ({placeholders})"
+            deleted = DBManager.execute_write_query(query, tuple(live)).rowcount
+            record_events('invoice', 'invoice.deleted', [(invoice_id, {}) for invoice_id in live], publish_each=False)
+            publish('invoices.deleted', ids=live)
+        return deleted
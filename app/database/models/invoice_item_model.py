@@ -1,31 +1,30 @@
 
-from .base_model import BaseModel
+from .base_model import BaseModel, to_datetime, to_decimal, to_int
 from app.database.db_manager import DBManager
 from decimal import Decimal
 
 class InvoiceItem(BaseModel):
     _table_name = 'invoice_items'
 
-    def __init__(self, **kwargs):
-        # Let the base model set all attributes from the database row
-        super().__init__(**kwargs)
-
-        # Now, specifically override and forcefully cast the attributes to their correct types.
-        # This corrects any automatic type conversions (e.g., INT to Decimal) by the DB driver.
-        if hasattr(self, 'quantity') and self.quantity is not None:
-            self.quantity = int(self.quantity)
-        
-        if hasattr(self, 'price') and self.price is not None:
-            self.price = Decimal(self.price)
-
-        if hasattr(self, 'total') and self.total is not None:
-            self.total = Decimal(self.total)
+    _columns = (
+        ('id', None),
+        ('invoice_id', None),
+        ('product_id', None),
+        # The driver may hand INT columns back as Decimal, so quantity is cast explicitly.
+        ('quantity', to_int),
+        ('price', to_decimal),
+        ('total', to_decimal),
+        ('created_at', to_datetime),
+        ('updated_at', to_datetime),
+        ('deleted_at', to_datetime),
+        # Joined from products.
+        ('product_name', None),
+        ('product_code', None),
+        ('product_description', None),
+        ('stock', to_int),
+    )
 
     def to_dict(self):
-        # Ensure price and total are converted to float for JSON serialization
-        price_float = float(self.price) if self.price is not None else 0.0
-        total_float = float(self.total) if self.total is not None else 0.0
-        
         product_details = {
             'name': getattr(self, 'product_name', None),
             'product_code': getattr(self, 'product_code', None),
@@ -38,15 +37,11 @@ class InvoiceItem(BaseModel):
             'invoice_id': self.invoice_id,
             'product_id': self.product_id,
             'quantity': self.quantity, # Guaranteed to be an int
-            'price': price_float,
-            'total': total_float,
+            'price': self.price,
+            'total': self.total,
             'product': product_details
         }
 
-    @classmethod
-    def from_row(cls, row):
-        return cls(**row) if row else None
-
     @classmethod
     def find_by_invoice_id(cls, invoice_id):
         query = """
@@ -61,6 +56,26 @@ class InvoiceItem(BaseModel):
         rows = DBManager.execute_query(query, params, fetch='all')
         return [cls.from_row(row) for row in rows] if rows else []
 
+    @classmethod
+    def find_by_invoice_ids(cls, invoice_ids):
+        """Batched find_by_invoice_id: one query for many invoices, grouped by invoice id."""
+        if not invoice_ids:
+            return {}
+        placeholders = ", ".join(["%s"] * len(invoice_ids))
+        query = f"""
+            SELECT
+                ii.id, ii.invoice_id, ii.product_id, ii.quantity, ii.price, ii.total,
+                p.name as product_name, p.product_code, p.description as product_description, p.stock
+            FROM invoice_items ii
+            JOIN products p ON ii.product_id = p.id
+            WHERE ii.invoice_id IN ({placeholders})
+            ORDER BY ii.invoice_id, ii.id
+        """
+        items = {}
+        for row in DBManager.execute_query(query, tuple(invoice_ids), fetch='all'):
+            items.setdefault(row['invoice_id'], []).append(cls.from_row(row))
+        return items
+
     @classmethod
     def delete_by_invoice_id(cls, invoice_id):
         query = f"DELETE FROM {cls._table_name} WHERE invoice_id = %s"
@@ -77,5 +92,18 @@ class InvoiceItem(BaseModel):
         query = f"INSERT INTO {cls._table_name} (invoice_id, product_id, quantity, price, total) VALUES (%s, %s, %s, %s, %s)"
         params = (data['invoice_id'], data['product_id'], quantity, price, total)
         
-        item_id = DBManager.execute_write_query(query, params)
-        return item_id
+        return DBManager.execute_write_query(query, params).lastrowid
+
+    @classmethod
+    def bulk_create(cls, items):
+        """Inserts many line items (create() keys) with one multi-row INSERT."""
+        if not items:
+            return 0
+        values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(items))
+        query = f"INSERT INTO {cls._table_name} (invoice_id, product_id, quantity, price, total) VALUES {values}"
+        params = []
+        for item in items:
+            quantity = int(item['quantity'])
+            price = Decimal(item['price'])
+            params.extend((item['invoice_id'], item['product_id'], quantity, price, quantity * price))
+        return DBManager.execute_write_query(query, tuple(params)).rowcount
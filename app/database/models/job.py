@@ -0,0 +1,171 @@
+import json
+from .base_model import BaseModel, to_datetime, to_int
+from .import_batch import to_json_object
+from app.database.db_manager import DBManager
+
+
+class Job(BaseModel):
+    """
+    One unit of background work in the durable `jobs` queue. Workers claim queued
+    jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any number of worker threads
+    and processes can poll the same table without claiming a job twice or waiting
+    on each other's locks.
+
+    `attempts` doubles as a fencing token: progress and outcome writes only apply
+    while the job is still running the attempt that made them, so a worker whose
+    job was requeued as stale can't overwrite the newer attempt.
+    """
+    _table_name = 'jobs'
+    _public_fields = ('id', 'kind', 'payload', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by',
+                      'heartbeat_at', 'progress_done', 'progress_total', 'progress_message', 'result',
+                      'last_error', 'user_id', 'created_at', 'updated_at', 'started_at', 'finished_at')
+
+    _columns = (
+        ('id', None),
+        ('kind', None),
+        ('payload', to_json_object),
+        ('status', None),
+        ('attempts', to_int),
+        ('max_attempts', to_int),
+        ('run_at', to_datetime),
+        ('locked_by', None),
+        ('heartbeat_at', to_datetime),
+        ('progress_done', to_int),
+        ('progress_total', None),
+        ('progress_message', None),
+        ('result', to_json_object),
+        ('last_error', None),
+        ('user_id', None),
+        ('created_at', to_datetime),
+        ('updated_at', to_datetime),
+        ('started_at', to_datetime),
+        ('finished_at', to_datetime),
+    )
+    _defaults = (('payload', dict),)
+
+    def to_dict(self):
+        return {field: getattr(self, field, None) for field in self._public_fields}
+
+    @property
+    def finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    @classmethod
+    def enqueue(cls, kind, payload=None, user_id=None, max_attempts=3):
+        """Adds a job for the `kind` handler. Inside a transaction it becomes claimable on commit."""
+        return cls._insert({
+            'kind': kind,
+            'payload': json.dumps(payload or {}, default=str),
+            'max_attempts': max_attempts,
+            'user_id': user_id,
+        })
+
+    @classmethod
+    def find_by_id(cls, job_id):
+        # Progress is written by whichever worker runs the job, so never cached.
+        query = f"SELECT * FROM {cls._table_name} WHERE id = %s"
+        return cls.from_row(DBManager.execute_query(query, (job_id,), fetch='one', cache=False))
+
+    @classmethod
+    def claim(cls, worker_id, limit=1):
+        """
+        Marks up to `limit` due jobs as running on `worker_id` and returns them,
+        oldest first. Rows other workers are claiming right now are skipped rather
+        than waited for.
+        """
+        with DBManager.transaction():
+            rows = DBManager.execute_query(
+                f"""
+                SELECT id FROM {cls._table_name}
+                WHERE status = 'queued' AND run_at <= NOW()
+                ORDER BY run_at, id LIMIT %s
+                FOR UPDATE SKIP LOCKED
+                """,
+                (limit,), fetch='all'
+            )
+            if not rows:
+                return []
+            ids = [row['id'] for row in rows]
+            placeholders = ", ".join(["%s"] * len(ids))
+            DBManager.execute_write_query(
+                f"""
+                UPDATE {cls._table_name}
+                SET status = 'running', attempts = attempts + 1, locked_by = %s,
+                    heartbeat_at = NOW(), started_at = COALESCE(started_at, NOW())
+                WHERE id IN ({placeholders})
+                """,
+                (worker_id, *ids)
+            )
+            rows = DBManager.execute_query(
+                f"SELECT * FROM {cls._table_name} WHERE id IN ({placeholders}) ORDER BY run_at, id",
+                tuple(ids), fetch='all'
+            )
+        return [cls.from_row(row) for row in rows]
+
+    @classmethod
+    def heartbeat(cls, jobs):
+        """Refreshes the heartbeat of running (id, attempt) pairs so they aren't taken for stale."""
+        if not jobs:
+            return
+        conditions = " OR ".join(["(id = %s AND attempts = %s)"] * len(jobs))
+        params = [value for job in jobs for value in job]
+        DBManager.execute_write_query(
+            f"UPDATE {cls._table_name} SET heartbeat_at = NOW() WHERE status = 'running' AND ({conditions})",
+            tuple(params)
+        )
+
+    @classmethod
+    def report_progress(cls, job_id, attempt, done, total=None, message=None):
+        query = f"""
+            UPDATE {cls._table_name}
+            SET progress_done = %s, progress_total = %s, progress_message = %s, heartbeat_at = NOW()
+            WHERE id = %s AND attempts = %s AND status = 'running'
+        """
+        return DBManager.execute_write_query(query, (done, total, message, job_id, attempt)).rowcount > 0
+
+    @classmethod
+    def succeed(cls, job_id, attempt, result=None):
+        query = f"""
+            UPDATE {cls._table_name}
+            SET status = 'succeeded', result = %s, last_error = NULL, locked_by = NULL, finished_at = NOW()
+            WHERE id = %s AND attempts = %s AND status = 'running'
+        """
+        return DBManager.execute_write_query(query, (json.dumps(result, default=str), job_id, attempt)).rowcount > 0
+
+    @classmethod
+    def fail(cls, job_id, attempt, error, retry_in=None):
+        """
+        Records a failed attempt. With `retry_in` (seconds) the job is queued again
+        to run after that delay, otherwise it is marked failed for good.
+        """
+        if retry_in is None:
+            query = f"""
+                UPDATE {cls._table_name}
+                SET status = 'failed', last_error = %s, locked_by = NULL, finished_at = NOW()
+                WHERE id = %s AND attempts = %s AND status = 'running'
+            """
+            params = (error, job_id, attempt)
+        else:
+            query = f"""
+                UPDATE {cls._table_name}
+                SET status = 'queued', last_error = %s, locked_by = NULL, run_at = NOW() + INTERVAL %s SECOND
+                WHERE id = %s AND attempts = %s AND status = 'running'
+            """
+            params = (error, int(retry_in), job_id, attempt)
+        return DBManager.execute_write_query(query, params).rowcount > 0
+
+    @classmethod
+    def requeue_stale(cls, lease_seconds):
+        """
+        Takes back running jobs whose worker stopped sending heartbeats (a crashed
+        or killed process): they are queued again, or failed once out of attempts.
+        Returns the number of jobs taken back.
+        """
+        query = f"""
+            UPDATE {cls._table_name}
+            SET status = IF(attempts >= max_attempts, 'failed', 'queued'),
+                finished_at = IF(attempts >= max_attempts, NOW(), NULL),
+                last_error = 'The worker running this job stopped responding.', locked_by = NULL
+            WHERE status = 'running' AND heartbeat_at < NOW() - INTERVAL %s SECOND
+        """
+        return DBManager.execute_write_query(query, (int(lease_seconds),)).rowcount
@@ -0,0 +1,151 @@
+import json
+from .base_model import BaseModel, to_datetime, to_int
+from .import_batch import to_json_object
+from app.database.db_manager import DBManager
+
+
+class OutboxEvent(BaseModel):
+    """
+    A domain event waiting in (or delivered from) the transactional outbox.
+
+    Model write paths append events inside the transaction of the change they
+    describe, after writing the changed row, so an event exists exactly when its
+    change committed. Writes to one aggregate are serialized by the row lock its
+    UPDATE takes, so that aggregate's events also get increasing ids in commit
+    order, which the dispatcher delivers them in.
+    """
+    _table_name = 'outbox'
+    _public_fields = ('id', 'aggregate_type', 'aggregate_id', 'event_type', 'payload', 'created_at',
+                      'dispatched_at', 'attempts', 'last_error', 'dead_lettered_at')
+
+    _columns = (
+        ('id', None),
+        ('aggregate_type', None),
+        ('aggregate_id', None),
+        ('event_type', None),
+        ('payload', to_json_object),
+        ('created_at', to_datetime),
+        ('dispatched_at', to_datetime),
+        ('attempts', to_int),
+        ('last_error', None),
+        ('dead_lettered_at', to_datetime),
+    )
+    _defaults = (('payload', dict),)
+
+    def to_message(self):
+        """The event as delivered to sinks."""
+        return {
+            'id': self.id,
+            'type': self.event_type,
+            'aggregate_type': self.aggregate_type,
+            'aggregate_id': self.aggregate_id,
+            'data': self.payload,
+            'created_at': self.created_at,
+        }
+
+    @classmethod
+    def append_many(cls, events):
+        """
+        Appends (aggregate_type, aggregate_id, event_type, data) events with one
+        multi-row INSERT. Run it inside the transaction of the change.
+        """
+        if not events:
+            return 0
+        values = ", ".join(["(%s, %s, %s, %s)"] * len(events))
+        params = []
+        for aggregate_type, aggregate_id, event_type, data in events:
+            params.extend((aggregate_type, aggregate_id, event_type, json.dumps(data, default=str)))
+        query = f"INSERT INTO {cls._table_name} (aggregate_type, aggregate_id, event_type, payload) VALUES {values}"
+        return DBManager.execute_write_query(query, tuple(params)).rowcount
+
+    @classmethod
+    def pending(cls, limit=100):
+        """The oldest undelivered events, in id order. Dead letters are skipped."""
+        query = f"""
+            SELECT * FROM {cls._table_name}
+            WHERE dispatched_at IS NULL AND dead_lettered_at IS NULL
+            ORDER BY id LIMIT %s
+        """
+        return [cls.from_row(row) for row in DBManager.execute_query(query, (limit,), fetch='all', cache=False)]
+
+    @classmethod
+    def mark_dispatched(cls, ids):
+        if not ids:
+            return 0
+        placeholders = ", ".join(["%s"] * len(ids))
+        query = f"UPDATE {cls._table_name} SET dispatched_at = NOW(), last_error = NULL WHERE id IN ({placeholders})"
+        return DBManager.execute_write_query(query, tuple(ids)).rowcount
+
+    @classmethod
+    def record_failure(cls, ids, error):
+        """Counts a failed delivery of the batch `ids`; the events stay pending."""
+        if not ids:
+            return 0
+        placeholders = ", ".join(["%s"] * len(ids))
+        query = f"UPDATE {cls._table_name} SET attempts = attempts + 1, last_error = %s WHERE id IN ({placeholders})"
+        return DBManager.execute_write_query(query, (error, *ids)).rowcount
+
+    @classmethod
+    def dead_letter(cls, event_id, error):
+        """
+        Gives up on delivering `event_id`: counts the failure and sets the event
+        aside, so the events after it are delivered. It stays until requeued.
+        """
+        query = f"""
+            UPDATE {cls._table_name} SET attempts = attempts + 1, last_error = %s, dead_lettered_at = NOW()
+            WHERE id = %s AND dispatched_at IS NULL
+        """
+        return DBManager.execute_write_query(query, (error, event_id)).rowcount
+
+    @classmethod
+    def dead_letters(cls, limit=50):
+        """The oldest dead-lettered events, in id order."""
+        query = f"""
+            SELECT * FROM {cls._table_name}
+            WHERE dispatched_at IS NULL AND dead_lettered_at IS NOT NULL
+            ORDER BY id LIMIT %s
+        """
+        return [cls.from_row(row) for row in DBManager.execute_query(query, (limit,), fetch='all', cache=False)]
+
+    @classmethod
+    def requeue_dead_letters(cls, ids=None):
+        """
+        Puts dead-lettered events (all, or the given ids) back in the queue with
+        their attempts reset. They are delivered after any event already sent,
+        so consumers see them out of order.
+        """
+        query = f"""
+            UPDATE {cls._table_name} SET dead_lettered_at = NULL, attempts = 0
+            WHERE dispatched_at IS NULL AND dead_lettered_at IS NOT NULL
+        """
+        params = ()
+        if ids is not None:
+            if not ids:
+                return 0
+            query += f" AND id IN ({', '.join(['%s'] * len(ids))})"
+            params = tuple(ids)
+        return DBManager.execute_write_query(query, params).rowcount
+
+    @classmethod
+    def purge_dispatched(cls, retention_seconds, batch_size=1000):
+        """Deletes events delivered more than `retention_seconds` ago, `batch_size` rows per statement."""
+        query = f"DELETE FROM {cls._table_name} WHERE dispatched_at < NOW() - INTERVAL %s SECOND LIMIT %s"
+        deleted = 0
+        while True:
+            rowcount = DBManager.execute_write_query(query, (int(retention_seconds), batch_size)).rowcount
+            deleted += rowcount
+            if rowcount < batch_size:
+                return deleted
+
+    @classmethod
+    def backlog(cls):
+        """Count and age of the undelivered events, and how many are dead-lettered."""
+        query = f"""
+            SELECT COUNT(*) AS pending, MIN(id) AS oldest_id, MIN(created_at) AS oldest_created_at,
+                   MAX(attempts) AS max_attempts
+            FROM {cls._table_name} WHERE dispatched_at IS NULL AND dead_lettered_at IS NULL
+        """
+        backlog = DBManager.execute_query(query, fetch='one', cache=False)
+        query = f"SELECT COUNT(*) AS dead_lettered FROM {cls._table_name} WHERE dispatched_at IS NULL AND dead_lettered_at IS NOT NULL"
+        backlog['dead_lettered'] = DBManager.execute_query(query, fetch='one', cache=False)['dead_lettered']
+        return backlog
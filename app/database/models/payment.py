@@ -1,34 +1,42 @@
-from .base_model import BaseModel
+from .base_model import BaseModel, to_date, to_datetime, to_decimal
+from app.database.config import Config
 from app.database.db_manager import DBManager
+from app.database import identity_map
 from decimal import Decimal
 from datetime import date
 from app.database.models.invoice import Invoice
+from app.utils.events import publish, record_event, record_events
 
 class Payment(BaseModel):
     _table_name = 'payments'
+    _public_fields = ('id', 'invoice_id', 'amount', 'payment_date', 'method', 'reference_no', 'created_at')
+    # Columns of CSV/NDJSON exports, in order.
+    export_fields = _public_fields + ('updated_at',)
+    # Stored columns returned by /sync.
+    sync_fields = export_fields
 
-    def __init__(self, **kwargs):
-        super().__init__()
-        for key, value in kwargs.items():
-            if key == 'amount' and value is not None:
-                value = Decimal(value)
-            setattr(self, key, value)
+    _columns = (
+        ('id', None),
+        ('invoice_id', None),
+        ('amount', to_decimal),
+        ('payment_date', to_date),
+        ('method', None),
+        ('reference_no', None),
+        ('created_at', to_datetime),
+        ('updated_at', to_datetime),
+        ('deleted_at', to_datetime),
+    )
 
     def to_dict(self):
-        amount_float = float(self.amount)
         return {
             'id': self.id,
             'invoice_id': self.invoice_id,
-            'amount': amount_float,
-            'payment_date': self.payment_date.isoformat() if isinstance(self.payment_date, date) else None,
+            'amount': self.amount,
+            'payment_date': self.payment_date,
             'method': self.method,
             'reference_no': self.reference_no
         }
 
-    @classmethod
-    def from_row(cls, row):
-        return cls(**row) if row else None
-
     @classmethod
     def record_payment(cls, invoice_id, amount, method, payment_date=None, reference_no=None):
         # Ensure amount is a Decimal with two places
@@ -44,15 +52,101 @@ class Payment(BaseModel):
         """
         params = (invoice_id, amount_decimal, payment_date, method, reference_no)
         
-        payment_id = DBManager.execute_write_query(query, params)
-
+        with DBManager.transaction():
+            payment_id = DBManager.execute_write_query(query, params).lastrowid
+            record_event('payment', payment_id, 'payment.recorded', invoice_id=invoice_id, amount=amount_decimal,
+                         payment_date=payment_date, method=method, reference_no=reference_no)
         return payment_id
 
     @classmethod
-    def find_by_id(cls, payment_id):
-        query = f"SELECT * FROM {cls._table_name} WHERE id = %s"
+    def create(cls, data):
+        with DBManager.transaction():
+            payment = super().create(data)
+            record_event('payment', payment.id, 'payment.recorded', invoice_id=payment.invoice_id, amount=payment.amount,
+                         payment_date=payment.payment_date, method=payment.method, reference_no=payment.reference_no)
+        return payment
+
+    @classmethod
+    def bulk_record(cls, payments):
+        """
+        Inserts many payments (record_payment() keyword arguments) with one
+        multi-row INSERT, in one transaction (joining the caller's, if any).
+        """
+        if not payments:
+            return 0
+        with DBManager.transaction():
+            before = None
+            if Config.OUTBOX["enabled"]:
+                # A consistent read, so it also fixes the transaction's snapshot if no earlier
+                # read has: later reads see other transactions' payments only up to this id.
+                before = DBManager.execute_query(
+                    f"SELECT COALESCE(MAX(id), 0) AS max_id FROM {cls._table_name}", fetch='one'
+                )['max_id']
+            values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(payments))
+            query = f"INSERT INTO {cls._table_name} (invoice_id, amount, payment_date, method, reference_no) VALUES {values}"
+            params = []
+            for payment in payments:
+                params.extend((
+                    payment['invoice_id'],
+                    Decimal(payment['amount']).quantize(Decimal('0.00')),
+                    payment.get('payment_date') or date.today(),
+                    payment['method'],
+                    payment.get('reference_no'),
+                ))
+            result = DBManager.execute_write_query(query, tuple(params))
+            publish('payments.imported', count=result.rowcount)
+            if before is not None:
+                # Ids of a multi-row INSERT aren't necessarily consecutive, so the rows are
+                # read back. In this transaction's snapshot, the only payments past `before`
+                # are the ones this statement inserted.
+                invoice_ids = sorted({payment['invoice_id'] for payment in payments})
+                placeholders = ", ".join(["%s"] * len(invoice_ids))
+                rows = DBManager.execute_query(
+                    f"""
+                    SELECT id, invoice_id, amount, payment_date, method, reference_no FROM {cls._table_name}
+                    WHERE id > %s AND invoice_id IN ({placeholders}) ORDER BY id
+                    """,
+                    (before, *invoice_ids), fetch='all'
+                )
+                record_events('payment', 'payment.recorded', [
+                    (row['id'], {key: row[key] for key in ('invoice_id', 'amount', 'payment_date', 'method', 'reference_no')})
+                    for row in rows
+                ], publish_each=False)
+            return result.rowcount
+
+    @classmethod
+    def iter_statement_credits(cls, customer_id, start=None, end=None, batch_size=1000):
+        """
+        Yields the live payments against a customer's live invoices dated between
+        `start` and `end` (inclusive, either open) as raw rows with the invoice
+        number, oldest first, through a server-side cursor.
+        """
+        where, params = ["i.customer_id = %s", "i.deleted_at IS NULL", "p.deleted_at IS NULL"], [customer_id]
+        if start:
+            where.append("p.payment_date >= %s")
+            params.append(start)
+        if end:
+            where.append("p.payment_date <= %s")
+            params.append(end)
+        query = f"""
+            SELECT p.id, p.invoice_id, i.invoice_number, p.payment_date, p.amount, p.method, p.reference_no
+            FROM {cls._table_name} p
+            JOIN {Invoice._table_name} i ON i.id = p.invoice_id
+            WHERE {" AND ".join(where)}
+            ORDER BY p.payment_date, p.id
+        """
+        return DBManager.iter_query(query, tuple(params), batch_size=batch_size)
+
+    @classmethod
+    def find_by_id(cls, payment_id, fields=None):
+        key = identity_map.make_key(cls._table_name, payment_id, tuple(fields or ()))
+        payment = identity_map.lookup(key)
+        if payment is not identity_map.MISSING:
+            return payment
+
+        query = f"SELECT {cls._select_list(fields)} FROM {cls._table_name} WHERE id = %s"
         row = DBManager.execute_query(query, (payment_id,), fetch='one')
-        return cls.from_row(row)
+        return identity_map.store(key, cls.from_row(row), (cls._table_name,))
 
     @classmethod
     def find_by_invoice_id(cls, invoice_id):
@@ -60,6 +154,18 @@ class Payment(BaseModel):
         rows = DBManager.execute_query(query, (invoice_id,), fetch='all')
         return [cls.from_row(row) for row in rows] if rows else []
     
+    @classmethod
+    def find_by_invoice_ids(cls, invoice_ids):
+        """Batched find_by_invoice_id: one query for many invoices, grouped by invoice id."""
+        if not invoice_ids:
+            return {}
+        placeholders = ", ".join(["%s"] * len(invoice_ids))
+        query = f"SELECT * FROM {cls._table_name} WHERE invoice_id IN ({placeholders}) ORDER BY payment_date DESC, id DESC"
+        payments = {}
+        for row in DBManager.execute_query(query, tuple(invoice_ids), fetch='all'):
+            payments.setdefault(row['invoice_id'], []).append(cls.from_row(row))
+        return payments
+
     @classmethod
     def find_latest_by_invoice_id(cls, invoice_id):
         # return only one (latest) payment
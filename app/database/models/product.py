@@ -1,23 +1,29 @@
 
-from .base_model import BaseModel
+from .base_model import BaseModel, to_datetime, to_decimal, to_int
 from app.utils.utils import generate_unique_product_code
 from decimal import Decimal
 from app.database.db_manager import DBManager
 
 class Product(BaseModel):
     _table_name = 'products'
+    _versioned = True
+    _public_fields = ('id', 'product_code', 'name', 'description', 'price', 'stock', 'created_at', 'updated_at')
+    # Columns of CSV/NDJSON exports, in order.
+    export_fields = _public_fields
+    # Stored columns returned by /sync.
+    sync_fields = _public_fields
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        if 'stock' in kwargs and kwargs['stock'] is not None:
-            self.stock = int(kwargs['stock'])
-
-    @classmethod
-    def from_row(cls, row):
-        """
-        Creates a Product instance from a database row.
-        """
-        return cls(**row)
+    _columns = (
+        ('id', None),
+        ('product_code', None),
+        ('name', None),
+        ('description', None),
+        ('price', to_decimal),
+        ('stock', to_int),
+        ('created_at', to_datetime),
+        ('updated_at', to_datetime),
+        ('deleted_at', to_datetime),
+    )
 
     @classmethod
     def create(cls, data):
@@ -41,10 +47,44 @@ class Product(BaseModel):
         Updates the stock for a given product.
         `quantity_change` is the amount to add to the stock (can be negative).
         """
-        query = f"UPDATE {cls._table_name} SET stock = stock + %s WHERE id = %s"
+        query = f"UPDATE {cls._table_name} SET stock = stock + %s, version = version + 1 WHERE id = %s"
         params = (int(quantity_change), product_id)
         DBManager.execute_write_query(query, params)
 
+    @classmethod
+    def _find_where_in(cls, column, values):
+        placeholders = ", ".join(["%s"] * len(values))
+        query = f"SELECT * FROM {cls._table_name} WHERE {column} IN ({placeholders}) AND deleted_at IS NULL"
+        return [cls.from_row(row) for row in DBManager.execute_query(query, tuple(values), fetch='all')]
+
+    @classmethod
+    def find_by_ids(cls, ids):
+        """Loads many live products in one query, keyed by id."""
+        if not ids:
+            return {}
+        return {product.id: product for product in cls._find_where_in('id', ids)}
+
+    @classmethod
+    def find_by_codes(cls, codes):
+        """Loads many live products in one query, keyed by product_code."""
+        if not codes:
+            return {}
+        return {product.product_code: product for product in cls._find_where_in('product_code', codes)}
+
+    @classmethod
+    def apply_stock_changes(cls, changes):
+        """
+        Batched update_stock: applies {product_id: quantity_change} with one UPDATE.
+        """
+        changes = {product_id: int(change) for product_id, change in changes.items() if change}
+        if not changes:
+            return
+        cases = " ".join(["WHEN %s THEN %s"] * len(changes))
+        placeholders = ", ".join(["%s"] * len(changes))
+        query = f"UPDATE {cls._table_name} SET stock = stock + CASE id {cases} END, version = version + 1 WHERE id IN ({placeholders})"
+        params = [value for item in changes.items() for value in item] + list(changes)
+        DBManager.execute_write_query(query, tuple(params))
+
     @classmethod
     def search(cls, search_term, include_deleted=False):
         """
@@ -1,71 +1,79 @@
 
-from werkzeug.security import generate_password_hash, check_password_hash
-from .base_model import BaseModel
+from .base_model import BaseModel, to_datetime
 from app.database.db_manager import DBManager
+from app.utils.password_hasher import password_hasher, PasswordHasherBusy
 
 class User(BaseModel):
     _table_name = 'users'
+    _public_fields = ('id', 'username', 'email', 'role', 'name', 'phone', 'billing_address', 'billing_city', 'billing_state', 'billing_pin', 'billing_gst')
 
-    def __init__(self, id, username, email, password_hash, role='staff', name=None, phone=None, billing_address=None, billing_city=None, billing_state=None, billing_pin=None, billing_gst=None, **kwargs):
-        self.id = id
-        self.username = username
-        self.email = email
-        self.password_hash = password_hash
-        self.role = role
-        self.name = name
-        self.phone = phone
-        self.billing_address = billing_address
-        self.billing_city = billing_city
-        self.billing_state = billing_state
-        self.billing_pin = billing_pin
-        self.billing_gst = billing_gst
-        # Absorb any extra columns that might be in the database row
-        for key, value in kwargs.items():
-            setattr(self, key, value)
+    _columns = (
+        ('id', None),
+        ('username', None),
+        ('email', None),
+        ('password_hash', None),
+        ('role', None),
+        ('name', None),
+        ('phone', None),
+        ('twofa_secret', None),
+        ('billing_address', None),
+        ('billing_city', None),
+        ('billing_state', None),
+        ('billing_pin', None),
+        ('billing_gst', None),
+        ('created_at', to_datetime),
+        ('updated_at', to_datetime),
+        ('deleted_at', to_datetime),
+    )
+    _defaults = (('role', lambda: 'staff'),)
 
     @property
     def is_admin(self):
         return self.role == 'admin'
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'role': self.role,
-            'name': self.name,
-            'phone': self.phone,
-            'billing_address': self.billing_address,
-            'billing_city': self.billing_city,
-            'billing_state': self.billing_state,
-            'billing_pin': self.billing_pin,
-            'billing_gst': self.billing_gst
-        }
+    def upgrade_password_hash(self, password):
+        """
+        Re-hashes the password with the current scrypt parameters if the stored
+        hash was created with different ones. Must only be called after a
+        successful check_password. A saturated hashing pool simply postpones
+        the upgrade to the next sign-in.
+        """
+        if not password_hasher.needs_rehash(self.password_hash):
+            return False
+        try:
+            new_hash = password_hasher.hash(password)
+        except PasswordHasherBusy:
+            return False
+        query = f'UPDATE {self._table_name} SET password_hash = %s WHERE id = %s'
+        DBManager.execute_write_query(query, (new_hash, self.id))
+        self.password_hash = new_hash
+        return True
 
-    @classmethod
-    def from_row(cls, row):
-        if not row:
-            return None
-        # Unpack the row dictionary into the constructor
-        return cls(**row)
+    def to_dict(self, fields=None):
+        # Attributes outside a sparse fieldset were never loaded onto the instance.
+        names = [key for key in fields if key in self._public_fields] if fields else self._public_fields
+        return {key: getattr(self, key, None) for key in names}
 
     @classmethod
     def create(cls, data):
-        hashed_password = generate_password_hash(data['password'], method='scrypt')
+        hashed_password = password_hasher.hash(data['password'])
         role = data.get('role', 'staff')
         name = data.get('name')
         phone = data.get('phone')
         username = data['username']
         email = data['email']
 
-        query = f'INSERT INTO {cls._table_name} (username, email, password_hash, name, role, phone) VALUES (%s, %s, %s, %s, %s, %s)'
-        user_id = DBManager.execute_write_query(query, (username, email, hashed_password, name, role, phone))
-        
-        # Return the ID directly. The route will be responsible for fetching.
-        return user_id
+        return cls._insert({
+            'username': username,
+            'email': email,
+            'password_hash': hashed_password,
+            'name': name,
+            'role': role,
+            'phone': phone,
+        })
 
     @classmethod
     def find_by_email(cls, email, include_deleted=False):
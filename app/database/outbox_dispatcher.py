@@ -0,0 +1,198 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from .config import Config
+from .db_manager import DBManager
+from .models.outbox_event import OutboxEvent
+from app.utils.events import event_bus
+from app.utils.outbox import build_sinks
+
+logger = logging.getLogger(__name__)
+
+DISPATCHER_NAME = "outbox_dispatcher"
+
+
+class OutboxDispatcher:
+    """
+    Background job that delivers outbox events to the configured sinks.
+
+    Events are read in id order, `batch_size` at a time, handed to every sink and
+    only then marked dispatched, so delivery is at least once: a batch that a
+    sink rejects (or whose marking fails) is delivered again, to all sinks, on
+    the next attempt. Nothing after a failed batch is delivered before it, which
+    keeps each aggregate's events in order. Failed attempts back off
+    exponentially up to `backoff_max` seconds.
+
+    Once the head of the queue has failed `max_attempts` times, events are sent
+    one at a time to find the one a sink rejects; that event is dead-lettered
+    (set aside until requeued from /maintenance/outbox) and delivery moves on
+    past it. A long sink outage dead-letters one event per attempt after that,
+    so size `max_attempts` to outlast the outages you expect; 0 never gives up.
+
+    A MySQL named lock (GET_LOCK) ensures only one worker process dispatches at
+    a time. Committed events wake this process's dispatcher right away; events
+    from other processes are picked up by the next poll.
+    """
+
+    def __init__(self, config, bus=None):
+        self.config = config
+        self.batch_size = config["batch_size"]
+        self.interval = config["interval"]
+        self.backoff_max = config["backoff_max"]
+        self.max_attempts = config["max_attempts"]
+        self.retention = config["retention"]
+        self.purge_interval = config["purge_interval"]
+        self._sinks = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._run_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "runs": 0,
+            "skipped": 0,
+            "failures": 0,
+            "delivered": 0,
+            "dead_lettered": 0,
+            "purged": 0,
+            "last_run_at": None,
+            "last_error": None,
+        }
+        if bus is not None:
+            bus.add_listener(self._on_event)
+
+    @classmethod
+    def from_config(cls, config, bus=None):
+        return cls(config, bus)
+
+    @property
+    def sinks(self):
+        # Built on first use, so a misconfigured sink only fails where dispatching is enabled.
+        if self._sinks is None:
+            self._sinks = build_sinks(self.config)
+        return self._sinks
+
+    def _on_event(self, event):
+        if event['type'] != 'dashboard':
+            self._wakeup.set()
+
+    def run_once(self):
+        """Delivers pending events until none are left. Returns how many, or None if skipped."""
+        if not self._run_lock.acquire(blocking=False):
+            self._count("skipped")
+            return None
+        try:
+            # One connection holds the named lock for the whole run.
+            with DBManager.shared_connection():
+                row = DBManager.execute_query("SELECT GET_LOCK(%s, 0) AS acquired", (DISPATCHER_NAME,), fetch='one', cache=False)
+                if not row["acquired"]:
+                    self._count("skipped")
+                    return None
+                try:
+                    return self._drain()
+                finally:
+                    DBManager.execute_query("SELECT RELEASE_LOCK(%s) AS released", (DISPATCHER_NAME,), fetch='one', cache=False)
+        finally:
+            self._run_lock.release()
+
+    def _drain(self):
+        sinks = self.sinks
+        delivered = 0
+        while not self._stop.is_set():
+            events = OutboxEvent.pending(self.batch_size)
+            if not events:
+                break
+            # A batch that keeps failing is retried event by event, so only the rejected one is dead-lettered.
+            exhausted = self.max_attempts and events[0].attempts >= self.max_attempts
+            batch = events[:1] if exhausted else events
+            ids = [event.id for event in batch]
+            messages = [event.to_message() for event in batch]
+            try:
+                for sink in sinks:
+                    sink.deliver(messages)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                with self._stats_lock:
+                    self._stats["failures"] += 1
+                    self._stats["last_error"] = error
+                logger.exception("Outbox delivery of events %s-%s failed", ids[0], ids[-1])
+                if exhausted:
+                    # One per attempt, then back off as usual: an outage must not empty the queue.
+                    logger.error("Outbox event %s failed %s times; dead-lettering it", ids[0], batch[0].attempts + 1)
+                    OutboxEvent.dead_letter(ids[0], error)
+                    self._count("dead_lettered")
+                else:
+                    OutboxEvent.record_failure(ids, error)
+                raise
+            OutboxEvent.mark_dispatched(ids)
+            delivered += len(ids)
+            if len(events) < self.batch_size and not exhausted:
+                break
+        with self._stats_lock:
+            self._stats["runs"] += 1
+            self._stats["delivered"] += delivered
+            self._stats["last_run_at"] = datetime.now(timezone.utc).isoformat()
+            self._stats["last_error"] = None
+        return delivered
+
+    def purge(self):
+        """Deletes events delivered longer ago than the retention. Returns the count."""
+        purged = OutboxEvent.purge_dispatched(self.retention)
+        if purged:
+            self._count("purged", purged)
+        return purged
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def start(self):
+        """Starts dispatching in a daemon thread (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=DISPATCHER_NAME, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        failures = 0
+        last_purge = time.monotonic()
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                self.run_once()
+                failures = 0
+            except Exception:
+                # Logged and counted in _drain (or a connection error); back off.
+                failures += 1
+                if failures == 1 or failures % 10 == 0:
+                    logger.warning("Outbox dispatch failed %s times in a row", failures)
+            if time.monotonic() - last_purge >= self.purge_interval:
+                last_purge = time.monotonic()
+                try:
+                    self.purge()
+                except Exception:
+                    logger.exception("Outbox purge failed")
+            if failures:
+                self._stop.wait(min(self.backoff_max, self.interval * 2 ** failures))
+            else:
+                self._wakeup.wait(self.interval)
+
+    def stats(self):
+        """Delivery counters of this worker process."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["running"] = bool(self._thread and self._thread.is_alive())
+        stats["sinks"] = [sink.name for sink in self._sinks] if self._sinks is not None else None
+        return stats
+
+
+outbox_dispatcher = OutboxDispatcher.from_config(Config.OUTBOX, event_bus)
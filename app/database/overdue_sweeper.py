@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from .base import get_db_connection
+from .config import Config
+from .db_manager import query_cache
+from app.utils.events import event_bus
+
+logger = logging.getLogger(__name__)
+
+SWEEPER_NAME = "overdue_sweeper"
+
+# Served by the (status, due_date) index, so each batch touches only due rows.
+_SWEEP_BATCH_QUERY = """
+    UPDATE invoices SET status = 'Overdue', version = version + 1
+    WHERE status = 'Pending' AND due_date < CURDATE() AND deleted_at IS NULL
+    LIMIT %s
+"""
+_SAVE_WATERMARK_QUERY = """
+    INSERT INTO maintenance_state (name, watermark, last_run_at, last_rows, total_rows)
+    VALUES (%s, CURDATE(), NOW(), %s, %s)
+    ON DUPLICATE KEY UPDATE watermark = VALUES(watermark), last_run_at = VALUES(last_run_at),
+        last_rows = VALUES(last_rows), total_rows = total_rows + VALUES(last_rows)
+"""
+# For a run cut off by max_batches: recorded, but the watermark stays where it was.
+_SAVE_RUN_QUERY = """
+    INSERT INTO maintenance_state (name, watermark, last_run_at, last_rows, total_rows)
+    VALUES (%s, NULL, NOW(), %s, %s)
+    ON DUPLICATE KEY UPDATE last_run_at = VALUES(last_run_at),
+        last_rows = VALUES(last_rows), total_rows = total_rows + VALUES(last_rows)
+"""
+
+
+class OverdueSweeper:
+    """
+    Background job that marks pending invoices past their due date as 'Overdue'.
+
+    Read paths trust the stored status instead of comparing due dates per query,
+    so the job must run at least daily; by default it runs every few minutes.
+    Each run flips rows in LIMIT-ed batches committed one at a time, so no single
+    statement holds locks for long, then records CURDATE() as the watermark (every
+    invoice due before it has been swept) and invalidates cached invoice reads. A
+    run stopped by `max_batches` while batches were still full leaves the
+    watermark alone; the next run carries on.
+
+    A MySQL named lock (GET_LOCK) ensures only one worker process sweeps at a
+    time; the others skip the run.
+    """
+
+    def __init__(self, interval=300, batch_size=500, max_batches=1000):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self._stop = threading.Event()
+        self._thread = None
+        self._run_lock = threading.Lock()
+        # Separate from _run_lock so stats() never waits on a running sweep.
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "runs": 0,
+            "skipped": 0,
+            "failures": 0,
+            "last_run_at": None,
+            "last_duration_ms": None,
+            "last_rows": 0,
+            "last_batches": 0,
+            "total_rows": 0,
+            "last_error": None,
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(interval=config["interval"], batch_size=config["batch_size"])
+
+    def run_once(self):
+        """Runs one sweep. Returns the number of invoices flipped, or None if skipped."""
+        if not self._run_lock.acquire(blocking=False):
+            self._count_skip()
+            return None
+        try:
+            return self._sweep()
+        finally:
+            self._run_lock.release()
+
+    def _sweep(self):
+        started = time.monotonic()
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT GET_LOCK(%s, 0) AS acquired", (SWEEPER_NAME,))
+                if not cursor.fetchone()["acquired"]:
+                    self._count_skip()
+                    return None
+                try:
+                    flipped, batches, complete = 0, 0, False
+                    while batches < self.max_batches:
+                        cursor.execute(_SWEEP_BATCH_QUERY, (self.batch_size,))
+                        conn.commit()
+                        batches += 1
+                        flipped += cursor.rowcount
+                        if cursor.rowcount < self.batch_size:
+                            complete = True
+                            break
+                    save_query = _SAVE_WATERMARK_QUERY if complete else _SAVE_RUN_QUERY
+                    cursor.execute(save_query, (SWEEPER_NAME, flipped, flipped))
+                    conn.commit()
+                finally:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (SWEEPER_NAME,))
+        except Exception as e:
+            with self._stats_lock:
+                self._stats["failures"] += 1
+                self._stats["last_error"] = str(e)
+            logger.exception("Overdue sweep failed")
+            raise
+        finally:
+            conn.close()
+
+        if flipped:
+            query_cache.invalidate("invoices")
+            event_bus.publish("invoices.overdue", {"count": flipped})
+        with self._stats_lock:
+            self._stats["runs"] += 1
+            self._stats["last_run_at"] = datetime.now(timezone.utc).isoformat()
+            self._stats["last_duration_ms"] = round((time.monotonic() - started) * 1000, 2)
+            self._stats["last_rows"] = flipped
+            self._stats["last_batches"] = batches
+            self._stats["total_rows"] += flipped
+            self._stats["last_error"] = None
+        return flipped
+
+    def _count_skip(self):
+        with self._stats_lock:
+            self._stats["skipped"] += 1
+
+    def start(self):
+        """Starts the periodic sweep in a daemon thread (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=SWEEPER_NAME, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                pass  # Logged and counted in _sweep; retry on the next tick.
+            self._stop.wait(self.interval)
+
+    def watermark(self):
+        """The persisted state shared by all workers, or None before the first sweep."""
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT watermark, last_run_at, last_rows, total_rows FROM maintenance_state WHERE name = %s",
+                    (SWEEPER_NAME,),
+                )
+                return cursor.fetchone()
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Run counters of this worker process."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["running"] = bool(self._thread and self._thread.is_alive())
+        stats["interval"] = self.interval
+        stats["batch_size"] = self.batch_size
+        return stats
+
+
+overdue_sweeper = OverdueSweeper.from_config(Config.OVERDUE_SWEEPER)
@@ -0,0 +1,275 @@
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.utils.files import ensure_private_dir
+
+# Tables a SELECT reads from, and the table a write statement modifies.
+_READ_TABLES_RE = re.compile(r"\b(?:FROM|JOIN)\s+`?(\w+)`?", re.IGNORECASE)
+_WRITE_TABLE_RE = re.compile(
+    r"^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)`?",
+    re.IGNORECASE,
+)
+# Results that depend on the clock, randomness or locks must never be cached.
+_UNCACHEABLE_RE = re.compile(
+    r"\b(?:NOW|CURDATE|CURTIME|SYSDATE|UTC_TIMESTAMP|RAND|UUID|CURRENT_TIMESTAMP|CURRENT_DATE)\b|\bFOR\s+UPDATE\b|\bLOCK\s+IN\s+SHARE\s+MODE\b",
+    re.IGNORECASE,
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(query):
+    """Collapses whitespace so formatting differences don't produce distinct cache keys."""
+    return _WHITESPACE_RE.sub(" ", query).strip()
+
+
+def read_tables(query):
+    """The set of tables a SELECT statement reads, used as its invalidation tags."""
+    return frozenset(table.lower() for table in _READ_TABLES_RE.findall(query))
+
+
+def written_table(query):
+    """The table an INSERT/UPDATE/DELETE statement writes to, or None."""
+    match = _WRITE_TABLE_RE.match(query)
+    return match.group(1).lower() if match else None
+
+
+def is_cacheable(query):
+    return query.lstrip()[:6].upper() == "SELECT" and not _UNCACHEABLE_RE.search(query)
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU store. Fast, but each worker process has its own copy, so writes
+    made by one worker only invalidate that worker's entries (others expire via TTL).
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None, 0
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None, 1
+            self._entries.move_to_end(key)
+            return True, value, 0
+
+    def set(self, key, value, ttl):
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def generations(self, tags):
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def bump(self, tag):
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """
+    Shared store in a local SQLite file, for multi-worker deployments on one host
+    (e.g. several gunicorn workers). Table generations live in the same file, so a
+    write in any worker invalidates the cached reads of all of them.
+    """
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        # Entries are unpickled on read, so the file must live where no other
+        # local user can create or swap it.
+        ensure_private_dir(os.path.dirname(os.path.abspath(path)))
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires_at REAL, accessed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed_at ON entries (accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS generations (tag TEXT PRIMARY KEY, generation INTEGER)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connection()
+        row = conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False, None, 0
+        now = time.time()
+        if row[1] < now:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return False, None, 1
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return True, pickle.loads(row[0]), 0
+
+    def set(self, key, value, ttl):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now + ttl, now),
+        )
+        overflow = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            return overflow
+        return 0
+
+    def generations(self, tags):
+        if not tags:
+            return ()
+        conn = self._connection()
+        placeholders = ", ".join("?" * len(tags))
+        found = dict(conn.execute(f"SELECT tag, generation FROM generations WHERE tag IN ({placeholders})", tags))
+        return tuple(found.get(tag, 0) for tag in tags)
+
+    def bump(self, tag):
+        self._connection().execute(
+            "INSERT INTO generations (tag, generation) VALUES (?, 1) "
+            "ON CONFLICT(tag) DO UPDATE SET generation = generation + 1",
+            (tag,),
+        )
+
+    def clear(self):
+        self._connection().execute("DELETE FROM entries")
+
+    def size(self):
+        return self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class QueryCache:
+    """
+    Result cache for DBManager.execute_query, keyed by normalized SQL + params.
+
+    Each entry is tagged with the tables its query reads. Rather than tracking keys
+    per tag, every tag has a generation number that is folded into the key; a write
+    to a table bumps its generation, so all earlier reads of that table stop
+    matching and age out of the LRU. This works the same for the in-process and
+    shared backends.
+    """
+
+    def __init__(self, backend, ttl=30, enabled=False):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0, "bypassed": 0}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        if config.get("backend") == "sqlite":
+            backend = SQLiteCacheBackend(config["path"], max_entries=config["max_entries"])
+        else:
+            backend = MemoryCacheBackend(max_entries=config["max_entries"])
+        return cls(backend, ttl=config["ttl"], enabled=config["enabled"])
+
+    def _count(self, stat, amount=1):
+        if amount:
+            with self._stats_lock:
+                self._stats[stat] += amount
+
+    def _key(self, query, params, fetch, tags):
+        generations = self.backend.generations(tags)
+        raw = repr((normalize_sql(query), tuple(params or ()), fetch, tags, generations))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def should_cache(self, query, cache=None):
+        """
+        `cache` is the per-call flag: None follows the global setting, True opts a
+        single query in, False bypasses the cache for that call.
+        """
+        if cache is False:
+            self._count("bypassed")
+            return False
+        if not (self.enabled or cache):
+            return False
+        return is_cacheable(query)
+
+    def get(self, query, params, fetch):
+        """
+        Returns (hit, value, key). On a miss, the caller runs the query and passes
+        the same key to set(): the key captures the table generations from before
+        the read, so a write that lands in between can't be cached as current.
+        Rows are copied so callers can't mutate the cached result.
+        """
+        tags = tuple(sorted(read_tables(query)))
+        key = self._key(query, params, fetch, tags)
+        found, value, expired = self.backend.get(key)
+        self._count("evictions", expired)
+        if not found:
+            self._count("misses")
+            return False, None, key
+        self._count("hits")
+        return True, _copy_result(value), key
+
+    def set(self, key, value):
+        self._count("evictions", self.backend.set(key, _copy_result(value), self.ttl))
+        self._count("stores")
+
+    def invalidate_for_write(self, query):
+        """Invalidates every cached read of the table modified by a write statement."""
+        table = written_table(query)
+        if table:
+            self.invalidate(table)
+
+    def invalidate(self, *tables):
+        for table in tables:
+            self.backend.bump(table.lower())
+            self._count("invalidations")
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["entries"] = self.backend.size()
+        stats["enabled"] = self.enabled
+        stats["backend"] = type(self.backend).__name__
+        return stats
+
+
+def _copy_result(value):
+    if isinstance(value, list):
+        return [dict(row) for row in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
@@ -6,6 +6,14 @@
 -- ==================================================================
 
 -- Drop existing tables in reverse order of creation to handle foreign keys
+DROP TABLE IF EXISTS outbox;
+DROP TABLE IF EXISTS jobs;
+DROP TABLE IF EXISTS idempotency_keys;
+DROP TABLE IF EXISTS import_errors;
+DROP TABLE IF EXISTS import_batches;
+DROP TABLE IF EXISTS sequences;
+DROP TABLE IF EXISTS maintenance_state;
+DROP TABLE IF EXISTS customer_name_tokens;
 DROP TABLE IF EXISTS token_blacklist;
 DROP TABLE IF EXISTS payments;
 DROP TABLE IF EXISTS invoice_items;
@@ -57,15 +65,18 @@ CREATE TABLE IF NOT EXISTS customers (
   address TEXT,                            -- Customer's physical address
   gst_number VARCHAR(50),                  -- Customer's GST identification number
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Timestamp of customer creation
-  updated_at TIMESTAMP NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, -- Last write, the sync watermark
   deleted_at TIMESTAMP NULL DEFAULT NULL,   -- Timestamp of soft deletion
+  version INT UNSIGNED NOT NULL DEFAULT 1,  -- Bumped by every update, checked by If-Match
 
   -- Indexes for faster queries
   INDEX idx_customers_name (name),
   INDEX idx_customers_email (email),
   INDEX idx_customers_phone (phone),
   INDEX idx_customers_gst_number (gst_number),
-  INDEX idx_customers_deleted_at (deleted_at)
+  INDEX idx_customers_deleted_at (deleted_at),
+  INDEX idx_customers_sync (updated_at, id),     -- Delta sync cursor and MAX(updated_at) version probes
+  INDEX idx_customers_created_at (created_at)   -- With updated_at, serves ?updated_since= on exports
 );
 
 -- ------------------------------------------------------------------
@@ -80,15 +91,32 @@ CREATE TABLE IF NOT EXISTS products (
   price DECIMAL(10,2) NOT NULL,            -- Price of the product
   stock INT DEFAULT 0,                     -- Current stock level
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Timestamp of product creation
-  updated_at TIMESTAMP NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, -- Last write, the sync watermark
   deleted_at TIMESTAMP NULL DEFAULT NULL,   -- Timestamp of soft deletion
+  version INT UNSIGNED NOT NULL DEFAULT 1,  -- Bumped by every update, checked by If-Match
 
   -- Indexes for faster queries
   INDEX idx_products_code_name (product_code, name),
   INDEX idx_products_name (name),
   INDEX idx_products_price (price),
   INDEX idx_products_stock (stock),
-  INDEX idx_products_deleted_at (deleted_at)
+  INDEX idx_products_deleted_at (deleted_at),
+  INDEX idx_products_sync (updated_at, id),     -- Delta sync cursor and MAX(updated_at) version probes
+  INDEX idx_products_created_at (created_at)   -- With updated_at, serves ?updated_since= on exports
+);
+
+-- ------------------------------------------------------------------
+-- Table: customer_name_tokens
+-- Purpose: Search index of lower-cased customer name words, so invoice
+--          search can find customers by name prefix with a range scan.
+-- ------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS customer_name_tokens (
+  token VARCHAR(64) NOT NULL,              -- One word of the customer's name
+  customer_id INT UNSIGNED NOT NULL,       -- Foreign key linking to the customer
+
+  PRIMARY KEY (token, customer_id),
+  FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE,
+  INDEX idx_customer_name_tokens_customer (customer_id)
 );
 
 -- ------------------------------------------------------------------
@@ -107,21 +135,28 @@ CREATE TABLE IF NOT EXISTS invoices (
   tax_amount DECIMAL(10,2) NOT NULL,
   total_amount DECIMAL(10,2) NOT NULL,     -- The final amount of the invoice
   status ENUM('Paid','Pending','Overdue', 'Partially Paid') DEFAULT 'Pending', -- Current status of the invoice
+  invoice_seq INT UNSIGNED AS (IF(invoice_number REGEXP '-[0-9]+$', CAST(SUBSTRING_INDEX(invoice_number, '-', -1) AS UNSIGNED), NULL)) STORED, -- Trailing sequence of invoice_number
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Timestamp of invoice creation
-  updated_at TIMESTAMP NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, -- Last write, the sync watermark
   deleted_at TIMESTAMP NULL DEFAULT NULL,   -- Timestamp of soft deletion
+  version INT UNSIGNED NOT NULL DEFAULT 1,  -- Bumped by every update, checked by If-Match
 
   -- Foreign key constraints
   FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE RESTRICT,
   FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE RESTRICT,
 
   -- Indexes for faster queries
-  INDEX idx_invoices_status_date (status),
+  INDEX idx_invoices_status_date (status, due_date), -- Drives the overdue sweeper's batched UPDATEs
   INDEX idx_invoices_customer_id (customer_id),
   INDEX idx_invoices_user_id (user_id),
   INDEX idx_invoices_due_date (due_date),
   INDEX idx_invoices_total_amount (total_amount),
-  INDEX idx_invoices_deleted_at (deleted_at)
+  INDEX idx_invoices_deleted_at (deleted_at),
+  INDEX idx_invoices_sync (updated_at, id),     -- Delta sync cursor and MAX(updated_at) version probes
+  INDEX idx_invoices_created_at (created_at),  -- With updated_at, serves ?updated_since= on exports
+  INDEX idx_invoices_seq (invoice_seq),         -- Sequence lookups in search
+  INDEX idx_invoices_aging (deleted_at, customer_id, due_date, total_amount, created_at), -- Covers the aging report's scan
+  INDEX idx_invoices_statement (customer_id, deleted_at, created_at) -- A customer's invoices in date order, for statements
 );
 
 -- ------------------------------------------------------------------
@@ -145,7 +180,8 @@ CREATE TABLE IF NOT EXISTS invoice_items (
   -- Indexes for faster queries
   INDEX idx_invoice_items_invoice (invoice_id),
   INDEX idx_invoice_items_product_id (product_id),
-  INDEX idx_invoice_items_deleted_at (deleted_at)
+  INDEX idx_invoice_items_deleted_at (deleted_at),
+  INDEX idx_invoice_items_updated_at (updated_at) -- MAX(updated_at) version probes of list endpoints
 );
 
 -- ------------------------------------------------------------------
@@ -160,17 +196,19 @@ CREATE TABLE IF NOT EXISTS payments (
   method ENUM('cash','card','upi','bank_transfer') DEFAULT 'cash', -- Method of payment
   reference_no VARCHAR(100),               -- A reference number from the payment processor
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Timestamp of payment record creation
-  updated_at TIMESTAMP NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, -- Last write, the sync watermark
   deleted_at TIMESTAMP NULL DEFAULT NULL,   -- Timestamp of soft deletion
   -- Foreign key constraints
   FOREIGN KEY (invoice_id) REFERENCES invoices(id) ON DELETE CASCADE,
 
   -- Indexes for faster queries
-  INDEX idx_payments_invoice (invoice_id),
+  INDEX idx_payments_invoice (invoice_id, deleted_at, payment_date, amount), -- Also covers per-invoice payment sums
   INDEX idx_payments_payment_date (payment_date),
   INDEX idx_payments_method (method),
   INDEX idx_payments_reference_no (reference_no),
-  INDEX idx_payments_deleted_at (deleted_at)
+  INDEX idx_payments_deleted_at (deleted_at),
+  INDEX idx_payments_sync (updated_at, id),     -- Delta sync cursor and MAX(updated_at) version probes
+  INDEX idx_payments_created_at (created_at)   -- With updated_at, serves ?updated_since= on exports
 );
 
 -- ------------------------------------------------------------------
@@ -191,3 +229,153 @@ CREATE TABLE IF NOT EXISTS token_blacklist (
   INDEX idx_token_blacklist_token (token),
   INDEX idx_token_blacklist_deleted_at (deleted_at)
 );
+
+-- ------------------------------------------------------------------
+-- Table: maintenance_state
+-- Purpose: Watermarks and run stats of background maintenance jobs
+--          (e.g. the overdue sweeper), shared by all app workers.
+-- ------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS maintenance_state (
+  name VARCHAR(64) PRIMARY KEY,            -- Job name
+  watermark DATE,                          -- Everything before this date has been processed
+  last_run_at TIMESTAMP NULL DEFAULT NULL, -- When the job last completed
+  last_rows INT UNSIGNED DEFAULT 0,        -- Rows changed by the last run
+  total_rows BIGINT UNSIGNED DEFAULT 0     -- Rows changed by all runs
+);
+
+-- ------------------------------------------------------------------
+-- Table: sequences
+-- Purpose: Named counters handed out in blocks (e.g. invoice numbers),
+--          bumped atomically with UPDATE ... LAST_INSERT_ID(expr).
+-- ------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS sequences (
+  name VARCHAR(64) PRIMARY KEY,            -- Counter name
+  next_value BIGINT UNSIGNED NOT NULL      -- Last value handed out
+);
+
+-- Continues after the highest existing invoice number (seeded once, a rerun keeps the counter)
+INSERT IGNORE INTO sequences (name, next_value)
+SELECT 'invoice_number', COALESCE(MAX(invoice_seq), 0) FROM invoices;
+
+-- ------------------------------------------------------------------
+-- Table: import_batches
+-- Purpose: Progress of bulk imports. Each chunk commits together with
+--          its checkpoint, so a failed import resumes where it stopped.
+-- ------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS import_batches (
+  id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+  kind VARCHAR(32) NOT NULL,               -- What is imported (e.g. invoices)
+  format ENUM('csv','ndjson') NOT NULL,    -- Input format
+  source VARCHAR(255),                     -- File name or other description of the input
+  options TEXT,                            -- JSON import options (e.g. skip_stock)
+  status ENUM('running','completed','failed') DEFAULT 'running',
+  processed_records INT UNSIGNED DEFAULT 0, -- Input records committed so far (resume skips them)
+  imported_records INT UNSIGNED DEFAULT 0, -- Records written
+  failed_records INT UNSIGNED DEFAULT 0,   -- Records rejected, see import_errors
+  counts TEXT,                             -- JSON record counts per outcome (e.g. created, updated)
+  last_error TEXT,                         -- Why the last run stopped, if it failed
+  user_id INT UNSIGNED,                    -- User who started the import
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP,
+
+  FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
+  INDEX idx_import_batches_kind (kind, created_at)
+);
+
+-- ------------------------------------------------------------------
+-- Table: import_errors
+-- Purpose: Per-record validation errors of a bulk import.
+-- ------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS import_errors (
+  id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+  batch_id INT UNSIGNED NOT NULL,          -- Foreign key linking to the import batch
+  record_number INT UNSIGNED NOT NULL,     -- 1-based position of the record in the input
+  reference VARCHAR(255),                  -- The record's own identifier (e.g. external_id)
+  errors TEXT NOT NULL,                    -- JSON object of field errors
+
+  FOREIGN KEY (batch_id) REFERENCES import_batches(id) ON DELETE CASCADE,
+  INDEX idx_import_errors_batch (batch_id, record_number)
+);
+
+-- ------------------------------------------------------------------
+-- Table: idempotency_keys
+-- Purpose: Idempotency-Key headers of POST requests and the response
+--          each produced, replayed to retries. The row is written in
+--          the request's own transaction, and expired rows are purged
+--          in the background.
+-- ------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+  id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+  user_id INT UNSIGNED NOT NULL,           -- Keys are scoped per user
+  idempotency_key VARCHAR(255) NOT NULL,   -- Client-chosen key
+  request_method VARCHAR(10) NOT NULL,
+  request_path VARCHAR(255) NOT NULL,
+  fingerprint CHAR(64) NOT NULL,           -- SHA-256 of method, path, query string and body
+  response_status SMALLINT UNSIGNED,       -- Stored response, replayed to retries
+  response_body MEDIUMTEXT,
+  response_mimetype VARCHAR(100),
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+  UNIQUE KEY uq_idempotency_keys_user_key (user_id, idempotency_key),
+  INDEX idx_idempotency_keys_created_at (created_at) -- Purge of expired keys
+);
+
+
+-- ------------------------------------------------------------------
+-- Table: jobs
+-- Purpose: Durable queue of background work (imports, sweeps). Any
+--          worker process claims queued jobs with FOR UPDATE SKIP
+--          LOCKED, reports progress and stores the result. Failed
+--          attempts are retried with backoff until max_attempts.
+-- ------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS jobs (
+  id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+  kind VARCHAR(64) NOT NULL,               -- Registered handler (e.g. overdue_sweep)
+  payload TEXT,                            -- JSON arguments of the handler
+  status ENUM('queued','running','succeeded','failed') NOT NULL DEFAULT 'queued',
+  attempts INT UNSIGNED NOT NULL DEFAULT 0, -- Attempts started so far
+  max_attempts INT UNSIGNED NOT NULL DEFAULT 3,
+  run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP, -- Not claimed before this (retry backoff)
+  locked_by VARCHAR(128),                  -- Worker running the current attempt
+  heartbeat_at TIMESTAMP NULL DEFAULT NULL, -- Refreshed while running, stale jobs are requeued
+  progress_done INT UNSIGNED NOT NULL DEFAULT 0,
+  progress_total INT UNSIGNED,             -- NULL when the amount of work isn't known
+  progress_message VARCHAR(255),
+  result MEDIUMTEXT,                       -- JSON result of a succeeded job
+  last_error TEXT,                         -- Why the last attempt failed
+  user_id INT UNSIGNED,                    -- User who enqueued the job
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP,
+  started_at TIMESTAMP NULL DEFAULT NULL,
+  finished_at TIMESTAMP NULL DEFAULT NULL,
+
+  FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
+  INDEX idx_jobs_claim (status, run_at, id), -- Next queued job, and stale running ones
+  INDEX idx_jobs_kind (kind, created_at)
+);
+
+
+-- ------------------------------------------------------------------
+-- Table: outbox
+-- Purpose: Domain events (invoice, payment and customer changes)
+--          written in the same transaction as the change itself. A
+--          dispatcher delivers them in id order to the configured
+--          sinks, at least once, and purges them after a retention.
+--          An event a sink keeps rejecting is dead-lettered (set aside
+--          until requeued) so it stops blocking the events behind it.
+-- ------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS outbox (
+  id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY, -- Delivery order, and the consumers' de-duplication key
+  aggregate_type VARCHAR(32) NOT NULL,     -- invoice, payment or customer
+  aggregate_id INT UNSIGNED NOT NULL,
+  event_type VARCHAR(64) NOT NULL,         -- e.g. invoice.created
+  payload TEXT NOT NULL,                   -- JSON event data
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  dispatched_at TIMESTAMP NULL DEFAULT NULL, -- NULL until every sink accepted the event
+  attempts INT UNSIGNED NOT NULL DEFAULT 0, -- Failed deliveries so far
+  last_error TEXT,
+  dead_lettered_at TIMESTAMP NULL DEFAULT NULL, -- Set once delivery gave up, until requeued
+
+  INDEX idx_outbox_pending (dispatched_at, dead_lettered_at, id), -- Next undelivered events, dead letters, and the purge
+  INDEX idx_outbox_aggregate (aggregate_type, aggregate_id, id)
+);
@@ -5,6 +5,7 @@ from app.database.token_blocklist import BLOCKLIST
 from app.utils.auth import require_admin
 from app.utils.error_messages import ERROR_MESSAGES
 from app.utils.response import success_response, error_response
+from app.utils.password_hasher import PasswordHasherBusy
 
 auth_blueprint = Blueprint('auth', __name__)
 
@@ -25,7 +26,13 @@ def sign_in():
 
     user = User.find_by_username_or_email(login_identifier)
 
-    if user and user.check_password(password):
+    try:
+        authenticated = bool(user) and user.check_password(password)
+    except PasswordHasherBusy:
+        return error_response(error_code='service_busy', message=ERROR_MESSAGES["service_unavailable"]["password_hasher_busy"], status=503, headers={'Retry-After': '1'})
+
+    if authenticated:
+        user.upgrade_password_hash(password)
         additional_claims = {"role": user.role}
         access_token = create_access_token(identity=str(user.id), additional_claims=additional_claims)
         return success_response({'access_token': access_token, 'user_info': user.to_dict()}, message="Authentication successful.")
@@ -63,9 +70,8 @@ def register():
         return error_response(error_code='conflict', message=ERROR_MESSAGES["conflict"]["user_exists"], status=409)
 
     try:
-        user_id = User.create(data)
-        if user_id:
-            new_user = User.find_by_id(user_id)
+        new_user = User.create(data)
+        if new_user:
             # Convert user to a dictionary for the response
             user_data = {
                 'id': new_user.id,
@@ -76,5 +82,7 @@ def register():
             }
             return success_response(user_data, message="User registered successfully.", status=201)
         return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["create_user"], status=500)
+    except PasswordHasherBusy:
+        return error_response(error_code='service_busy', message=ERROR_MESSAGES["service_unavailable"]["password_hasher_busy"], status=503, headers={'Retry-After': '1'})
     except Exception as e:
         return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["create_user"], details=str(e), status=500)
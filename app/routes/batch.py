@@ -0,0 +1,32 @@
+from flask import Blueprint, request
+from flask_jwt_extended import jwt_required
+
+from app.utils.response import success_response, error_response
+from app.utils.error_messages import ERROR_MESSAGES
+from app.utils.batch import parse_batch, run_batch, InvalidBatchError
+
+batch_blueprint = Blueprint('batch', __name__)
+
+@batch_blueprint.route('/batch', methods=['POST'])
+@jwt_required()
+def execute_batch():
+    """
+    Runs several API calls in one round trip. The body lists sub-requests as
+    {"method", "path", "body", "headers", "id"}; each is dispatched through the
+    app's URL map with the caller's credentials, on one shared database
+    connection, and the results ({"id", "status", "headers", "body"}) come back
+    in request order. Each sub-request is still authorized by its own endpoint.
+    With "parallel": true, consecutive GETs run concurrently.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["request_body_empty"], status=400)
+    try:
+        sub_requests, parallel = parse_batch(data)
+    except InvalidBatchError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_batch"], details=err.to_details(), status=400)
+    try:
+        results = run_batch(sub_requests, parallel=parallel)
+        return success_response(result=results, message="Batch executed.", meta={'count': len(results), 'parallel': parallel})
+    except Exception as e:
+        return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["batch"], details=str(e), status=500)
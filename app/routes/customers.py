@@ -1,16 +1,43 @@
 from flask import Blueprint, request
 from flask_jwt_extended import jwt_required
 from marshmallow import ValidationError
+from decimal import Decimal
 
+from app.database.config import Config
+from app.database.models.base_model import VersionConflict
 from app.database.models.customer import Customer
+from app.database.models.invoice import Invoice
+from app.database.models.payment import Payment
 from app.schemas.customer_schema import CustomerSchema, CustomerSummarySchema, CustomerDetailSchema, CustomerUpdateSchema
-from app.utils.response import success_response, error_response
+from app.utils.response import success_response, error_response, stream_response, wants_stream
 from app.utils.error_messages import ERROR_MESSAGES
 from app.utils.auth import require_admin
-from app.utils.pagination import get_pagination
+from app.utils.pagination import get_pagination, MAX_STREAM_PER_PAGE
+from app.utils.fields import get_fields, InvalidFieldsError
+from app.utils.includes import (
+    Relation, get_includes, include_fields, expand_includes, InvalidIncludeError, MAX_INCLUDED_PER_PARENT,
+)
+from app.utils.customer_import import CustomerImporter
+from app.utils.bulk_import import handle_import_request, handle_import_status
+from app.utils.export import get_export_params, export_response, InvalidExportError
+from app.utils.reports import StatementEntry, get_statement_params, statement_entries, InvalidReportError
+from app.utils.conditional import (
+    evaluate_conditional, evaluate_table_conditional, not_modified_response, latest_timestamp,
+    has_if_match, check_if_match, precondition_failed_response, resource_etag,
+)
 
 customers_blueprint = Blueprint('customers', __name__)
 
+# Relations that can be embedded in the customer list with ?include=. Each customer
+# embeds at most MAX_INCLUDED_PER_PARENT of its newest invoices.
+CUSTOMER_INCLUDES = {
+    'invoices': Relation(
+        lambda customer: customer.id,
+        lambda ids: Invoice.find_by_customer_ids(ids, per_customer=MAX_INCLUDED_PER_PARENT),
+        many=True,
+    ),
+}
+
 # Instantiate schemas
 customer_schema = CustomerSchema()
 customer_summary_schema = CustomerSummarySchema()
@@ -51,11 +78,9 @@ def create_customer():
                 )
 
     try:
-        customer_id = Customer.create(validated_data)
-        if customer_id:
-            customer = Customer.find_by_id_with_aggregates(customer_id)
-            if customer:
-                return success_response(customer_summary_schema.dump(customer), message="Customer created successfully.", status=201)
+        customer = Customer.create(validated_data)
+        if customer:
+            return success_response(customer_summary_schema.dump(customer), message="Customer created successfully.", status=201)
         return error_response(error_code='server_error', 
                               message=ERROR_MESSAGES["server_error"]["create_customer"], 
                               status=500)
@@ -68,40 +93,163 @@ def create_customer():
 @customers_blueprint.route('/customers', methods=['GET'])
 @jwt_required()
 def get_customers():
-    page, per_page = get_pagination()
+    stream = wants_stream()
+    page, per_page = get_pagination(max_per_page=MAX_STREAM_PER_PAGE) if stream else get_pagination()
     q = request.args.get('q', None)
     status = request.args.get('status', None)
     include_deleted = request.args.get('include_deleted', 'false').lower() == 'true'
+    try:
+        fields = get_fields(Customer.list_fields)
+    except InvalidFieldsError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_fields"], details=err.to_details(), status=400)
+    try:
+        includes = get_includes(CUSTOMER_INCLUDES)
+    except InvalidIncludeError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_include"], details=err.to_details(), status=400)
+    fields = include_fields(fields, includes, CUSTOMER_INCLUDES)
+    summary_schema = CustomerSummarySchema(only=fields) if fields else customer_summary_schema
     
     try:
+        tables = ['customers', 'invoices']
+        if 'invoices' in includes:
+            tables.append('payments')
+        headers, not_modified = evaluate_table_conditional(*tables)
+        if not_modified:
+            return not_modified_response(headers)
+
         customers, total = Customer.list_all(
             q=q, 
             status=status,
             offset=(page - 1) * per_page, 
             limit=per_page, 
-            include_deleted=include_deleted
+            include_deleted=include_deleted,
+            stream=stream,
+            fields=fields
         )
-        serialized_customers = customer_summary_schema.dump(customers, many=True)
         meta_data = {
             'total': total,
             'page': page,
             'per_page': per_page
         }
-        return success_response(result=serialized_customers, meta=meta_data, message="Customers retrieved successfully.")
+        if includes:
+            customers = expand_includes(customers, summary_schema.dump, includes, CUSTOMER_INCLUDES)
+            serialize = None
+        else:
+            serialize = summary_schema.dump
+        if stream:
+            return stream_response(customers, serialize=serialize, meta=meta_data, message="Customers retrieved successfully.", headers=headers)
+        serialized_customers = list(customers) if includes else summary_schema.dump(customers, many=True)
+        return success_response(result=serialized_customers, meta=meta_data, message="Customers retrieved successfully.", headers=headers)
     except Exception as e:
         return error_response(error_code='server_error', 
                               message=ERROR_MESSAGES["server_error"]["fetch_customer"], 
                               details=str(e), 
                               status=500)
 
+@customers_blueprint.route('/customers/import', methods=['POST'])
+@jwt_required()
+@require_admin
+def import_customers():
+    """
+    Bulk import of customers from a CSV (or NDJSON) request body, read as a
+    stream and de-duplicated by email. ?on_existing=skip|update|reject and
+    ?on_deleted=skip|restore|reject decide what happens when an email already
+    belongs to a live or a soft-deleted customer (default: skip). Resume a
+    failed import by sending the same body with ?batch_id=<id>.
+    """
+    options = {
+        'on_existing': request.args.get('on_existing'),
+        'on_deleted': request.args.get('on_deleted'),
+    }
+    return handle_import_request(CustomerImporter, options=options)
+
+@customers_blueprint.route('/customers/import/<int:batch_id>', methods=['GET'])
+@jwt_required()
+@require_admin
+def get_customer_import(batch_id):
+    """Progress, per-outcome counts and paginated error report of a customer import."""
+    return handle_import_status(CustomerImporter, batch_id)
+
+@customers_blueprint.route('/customers/export', methods=['GET'])
+@jwt_required()
+def export_customers():
+    """Streams all customers matching the list filters (q, status, include_deleted) as CSV or NDJSON."""
+    try:
+        export_format, updated_since = get_export_params()
+    except InvalidExportError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_export"], details=err.to_details(), status=400)
+    try:
+        rows = Customer.export_rows(
+            q=request.args.get('q'),
+            status=request.args.get('status'),
+            include_deleted=request.args.get('include_deleted', 'false').lower() == 'true',
+            updated_since=updated_since,
+            batch_size=Config.EXPORT['batch_size'],
+        )
+        return export_response(rows, Customer.export_fields, export_format, 'customers')
+    except Exception as e:
+        return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["export"], details=str(e), status=500)
+
+@customers_blueprint.route('/customers/<string:customer_id>/statement', methods=['GET'])
+@jwt_required()
+def get_customer_statement(customer_id):
+    """
+    Streams the customer's account statement for ?from=&to= (inclusive dates):
+    the opening balance, every invoice (debit) and payment (credit) in date
+    order with the running balance, and the closing balance. ?format=csv or
+    ndjson downloads it like an export; the default JSON body streams too.
+    """
+    include_deleted = request.args.get('include_deleted', 'false').lower() == 'true'
+    try:
+        start, end, statement_format = get_statement_params()
+    except InvalidReportError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_report"], details=err.to_details(), status=400)
+    try:
+        customer = Customer.find_by_id(customer_id, include_deleted=include_deleted)
+        if not customer:
+            return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["customer"], status=404)
+        opening_balance = Customer.opening_balance(customer.id, start) if start else Decimal('0.00')
+        batch_size = Config.EXPORT['batch_size']
+        entries = statement_entries(
+            opening_balance,
+            Invoice.iter_statement_debits(customer.id, start, end, batch_size=batch_size),
+            Payment.iter_statement_credits(customer.id, start, end, batch_size=batch_size),
+            start=start,
+            end=end,
+        )
+        if statement_format != 'json':
+            return export_response(entries, StatementEntry._fields, statement_format, f'statement-{customer.id}')
+        meta = {'customer_id': customer.id, 'from': start, 'to': end, 'opening_balance': opening_balance}
+        return stream_response(entries, serialize=StatementEntry._asdict, meta=meta, message="Customer statement retrieved successfully.")
+    except Exception as e:
+        return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["statement"], details=str(e), status=500)
+
 @customers_blueprint.route('/customers/<string:customer_id>', methods=['GET'])
 @jwt_required()
 def get_customer(customer_id):
     include_deleted = request.args.get('include_deleted', 'false').lower() == 'true'
     try:
-        customer = Customer.find_by_id_with_aggregates(customer_id, include_deleted=include_deleted)
+        fields = get_fields(Customer.detail_fields)
+    except InvalidFieldsError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_fields"], details=err.to_details(), status=400)
+    detail_schema = CustomerDetailSchema(only=fields) if fields else customer_detail_schema
+    try:
+        probe = Customer.version_probe(customer_id, include_deleted=include_deleted)
+        if not probe:
+            return error_response(error_code='not_found', 
+                                  message=ERROR_MESSAGES["not_found"]["customer"], 
+                                  status=404)
+        # The body embeds invoice and payment totals, so their writes count as modifications too.
+        last_modified = latest_timestamp(
+            probe['created_at'], probe['updated_at'], probe['invoices_updated_at'], probe['payments_updated_at']
+        )
+        headers, not_modified = evaluate_conditional(probe, last_modified)
+        if not_modified:
+            return not_modified_response(headers)
+
+        customer = Customer.find_by_id_with_aggregates(customer_id, include_deleted=include_deleted, fields=fields)
         if customer:
-            return success_response(customer_detail_schema.dump(customer), message="Customer details fetched successfully")
+            return success_response(detail_schema.dump(customer), message="Customer details fetched successfully", headers=headers)
         return error_response(error_code='not_found', 
                               message=ERROR_MESSAGES["not_found"]["customer"], 
                               status=404)
@@ -132,10 +280,16 @@ def update_customer(customer_id):
         )
 
     try:
-        # First, ensure the customer exists.
-        customer_to_update = Customer.find_by_id(customer_id)
-        if not customer_to_update:
-            return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["customer"], status=404)
+        # With If-Match, a stale copy is rejected up front; the UPDATE re-checks the version atomically.
+        expected_version = None
+        if has_if_match():
+            probe = Customer.version_probe(customer_id)
+            if not probe:
+                return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["customer"], status=404)
+            failed = check_if_match(probe)
+            if failed:
+                return failed
+            expected_version = probe['version']
 
         # If email is being updated, check for conflicts.
         if 'email' in validated_data and validated_data['email']:
@@ -151,12 +305,20 @@ def update_customer(customer_id):
                         status=409
                     )
 
-        # Proceed with the update.
-        Customer.update(customer_id, validated_data)
+        # Proceed with the update; its matched-row count tells us whether the customer exists.
+        if not Customer.update(customer_id, validated_data, expected_version=expected_version):
+            return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["customer"], status=404)
+
+        # Fetch the updated data and its status; the summary doesn't need the aggregates.
+        updated_customer = Customer.find_by_id_with_aggregates(customer_id, fields=list(Customer.list_fields))
+        headers = {'ETag': resource_etag(Customer.version_probe(customer_id))}
+        return success_response(customer_summary_schema.dump(updated_customer), message="Customer updated successfully.", headers=headers)
 
-        # Fetch the updated data and return it.
-        updated_customer = Customer.find_by_id_with_aggregates(customer_id)
-        return success_response(customer_summary_schema.dump(updated_customer), message="Customer updated successfully.")
+    except VersionConflict:
+        probe = Customer.version_probe(customer_id)
+        if not probe:
+            return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["customer"], status=404)
+        return precondition_failed_response(probe)
 
     except Exception as e:
         return error_response(error_code='server_error', 
@@ -172,7 +334,7 @@ def restore_customer(customer_id):
         # The restore method returns the number of rows affected.
         restored_count = Customer.restore(customer_id)
         if restored_count > 0:
-            restored_customer = Customer.find_by_id_with_aggregates(customer_id)
+            restored_customer = Customer.find_by_id_with_aggregates(customer_id, fields=list(Customer.list_fields))
             return success_response(
                 customer_summary_schema.dump(restored_customer),
                 message="Customer restored successfully."
@@ -0,0 +1,70 @@
+from flask import Blueprint, current_app, request
+from flask_jwt_extended import jwt_required
+
+from app.database.config import Config
+from app.database.dashboard_feed import dashboard_feed
+from app.utils import serializer
+from app.utils.auth import require_admin
+from app.utils.events import event_bus
+from app.utils.response import error_response, _as_bytes
+
+events_blueprint = Blueprint('events', __name__)
+
+# Milliseconds a disconnected EventSource waits before reconnecting.
+RECONNECT_MS = 5000
+
+
+def _format_event(event_type, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {_as_bytes(serializer.dumps(data)).decode('utf-8')}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+@events_blueprint.route('/events', methods=['GET'])
+# Browsers' EventSource can't set headers, so the token may also come as ?jwt=.
+@jwt_required(locations=['headers', 'query_string'])
+@require_admin
+def stream_events():
+    """
+    Server-sent event stream of changes: invoice.created, invoice.updated,
+    invoices.imported, invoices.deleted, invoices.overdue, payment.recorded,
+    payments.imported, customer.created, customer.updated, customer.restored and
+    customers.deleted, plus 'dashboard' events carrying the refreshed dashboard
+    counters. The first event is the current dashboard snapshot. A reconnecting
+    EventSource sends Last-Event-ID and receives the events it missed, or a
+    'resync' event when it should refetch instead.
+
+    Waiting connections hold no database connection and, under an async worker
+    (gunicorn -k gevent), no thread either.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    keepalive = Config.EVENTS['keepalive']
+    try:
+        snapshot = dashboard_feed.snapshot()
+    except Exception as e:
+        return error_response(error_code='server_error', message="Failed to start the event stream.", details=str(e), status=500)
+
+    def generate():
+        # Subscribed only once the server starts iterating, so a response that is
+        # never sent can't leave a subscription behind.
+        subscription = event_bus.subscribe(last_event_id)
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n".encode("utf-8")
+            yield _format_event('dashboard', snapshot)
+            while True:
+                event = subscription.get(timeout=keepalive)
+                if event is None:
+                    # Comment line; keeps proxies from closing an idle connection.
+                    yield b": keep-alive\n\n"
+                    continue
+                yield _format_event(event['type'], {**event['data'], 'at': event['at']}, event['id'])
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return current_app.response_class(
+        generate(),
+        status=200,
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
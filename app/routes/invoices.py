@@ -3,63 +3,184 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
 from app.schemas.invoice_schema import invoice_schema
 from app.utils.error_messages import ERROR_MESSAGES
+from app.database.config import Config
+from app.database.db_manager import DBManager
+from app.database.models.base_model import VersionConflict
 from app.database.models.invoice import Invoice
 from app.database.models.invoice_item_model import InvoiceItem
 from app.database.models.product import Product
 from app.database.models.customer import Customer
 from app.database.models.payment import Payment
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from datetime import datetime, date
 from app.utils.auth import require_admin
-from app.utils.response import success_response, error_response
-from app.utils.pagination import get_pagination
+from app.utils.response import success_response, error_response, stream_response, wants_stream
+from app.utils.pagination import get_pagination, MAX_STREAM_PER_PAGE
+from app.utils.fields import get_fields, InvalidFieldsError
+from app.utils.includes import Relation, get_includes, include_fields, expand_includes, InvalidIncludeError
+from app.utils.export import get_export_params, export_response, InvalidExportError
+from app.utils.conditional import (
+    evaluate_conditional, evaluate_table_conditional, not_modified_response, latest_timestamp,
+    has_if_match, check_if_match, precondition_failed_response, resource_etag,
+)
 from app.utils.utils import generate_invoice_number
+from app.utils.invoice_import import InvoiceImporter
+from app.utils.idempotency import idempotent
+from app.utils.bulk_import import handle_import_request, handle_import_status
 
 invoices_blueprint = Blueprint('invoices', __name__)
 
+def _range_filters():
+    """
+    Parses the due_from/due_to (YYYY-MM-DD) and min_total/max_total list filters.
+    Returns (filters, errors); errors maps each invalid parameter to a message.
+    """
+    filters, errors = {}, {}
+    for name in ('due_from', 'due_to'):
+        value = request.args.get(name)
+        if value:
+            try:
+                filters[name] = date.fromisoformat(value)
+            except ValueError:
+                errors[name] = 'Expected a date in YYYY-MM-DD format.'
+    for name in ('min_total', 'max_total'):
+        value = request.args.get(name)
+        if value:
+            try:
+                amount = Decimal(value)
+            except InvalidOperation:
+                amount = None
+            if amount is None or not amount.is_finite():
+                errors[name] = 'Expected a number.'
+            else:
+                filters[name] = amount
+    return filters, errors
+
+# Relations that can be embedded in the invoice list with ?include=.
+INVOICE_INCLUDES = {
+    'items': Relation(lambda invoice: invoice.id, InvoiceItem.find_by_invoice_ids, many=True),
+    'payments': Relation(lambda invoice: invoice.id, Payment.find_by_invoice_ids, many=True),
+    'customer': Relation(lambda invoice: getattr(invoice, 'customer_id', None), Customer.find_by_ids, field='customer'),
+}
+
 @invoices_blueprint.route('/invoices', methods=['GET'])
 @jwt_required()
 def list_invoices():
     try:
-        page, per_page = get_pagination()
+        fields = get_fields(Invoice.list_fields)
+    except InvalidFieldsError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_fields"], details=err.to_details(), status=400)
+    try:
+        includes = get_includes(INVOICE_INCLUDES)
+    except InvalidIncludeError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_include"], details=err.to_details(), status=400)
+    fields = include_fields(fields, includes, INVOICE_INCLUDES)
+
+    try:
+        stream = wants_stream()
+        page, per_page = get_pagination(max_per_page=MAX_STREAM_PER_PAGE) if stream else get_pagination()
         status = request.args.get('status')
         customer_id = request.args.get('customer_id')
         q = request.args.get('q')
+        filters, filter_errors = _range_filters()
+        if filter_errors:
+            return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_filter"], details=filter_errors, status=400)
+
+        tables = ['invoices', 'customers', 'payments']
+        if 'items' in includes:
+            tables += ['invoice_items', 'products']
+        headers, not_modified = evaluate_table_conditional(*tables)
+        if not_modified:
+            return not_modified_response(headers)
 
         offset = (page - 1) * per_page
-        invoices, total = Invoice.list_all(customer_id=customer_id, status=status, offset=offset, limit=per_page, q=q)
+        invoices, total = Invoice.list_all(customer_id=customer_id, status=status, offset=offset, limit=per_page, q=q, stream=stream, fields=fields, **filters)
+
+        results = expand_includes(invoices, lambda invoice: invoice.to_dict(fields), includes, INVOICE_INCLUDES)
+        if stream:
+            return stream_response(
+                results,
+                meta={'total': total, 'page': page, 'per_page': per_page},
+                headers=headers,
+            )
 
         return success_response(
-            result=[invoice.to_dict() for invoice in invoices],
+            result=list(results),
             meta={
                 'total': total,
                 'page': page,
                 'per_page': per_page,
             },
-            status=200
+            status=200,
+            headers=headers
         )
 
     except Exception as e:
         return error_response(error_code='server_error', message='An unexpected error occurred while fetching invoices.', details=str(e), status=500)
 
+@invoices_blueprint.route('/invoices/export', methods=['GET'])
+@jwt_required()
+def export_invoices():
+    """
+    Streams all invoices matching the list filters (status, customer_id, q, due
+    date and total ranges) as CSV or NDJSON, with paid and due amounts.
+    """
+    try:
+        export_format, updated_since = get_export_params()
+    except InvalidExportError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_export"], details=err.to_details(), status=400)
+    filters, filter_errors = _range_filters()
+    if filter_errors:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_filter"], details=filter_errors, status=400)
+    try:
+        rows = Invoice.export_rows(
+            q=request.args.get('q'),
+            customer_id=request.args.get('customer_id'),
+            status=request.args.get('status'),
+            updated_since=updated_since,
+            batch_size=Config.EXPORT['batch_size'],
+            **filters
+        )
+        return export_response(rows, Invoice.export_fields, export_format, 'invoices')
+    except Exception as e:
+        return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["export"], details=str(e), status=500)
+
 @invoices_blueprint.route('/invoices/<int:invoice_id>', methods=['GET'])
 @jwt_required()
 def get_invoice(invoice_id):
     try:
-        invoice = Invoice.find_by_id(invoice_id)
-        if not invoice:
+        fields = get_fields(Invoice.detail_fields)
+    except InvalidFieldsError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_fields"], details=err.to_details(), status=400)
+
+    try:
+        probe = Invoice.version_probe(invoice_id)
+        if not probe:
             return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["invoice"], status=404)
+        headers, not_modified = evaluate_conditional(
+            probe,
+            latest_timestamp(probe['created_at'], probe['updated_at'], probe['customer_updated_at'], probe['payments_created_at'])
+        )
+        if not_modified:
+            return not_modified_response(headers)
 
-        customer = Customer.find_by_id(invoice.customer_id)
-        invoice_items = InvoiceItem.find_by_invoice_id(invoice_id)
-        payment = Payment.find_latest_by_invoice_id(invoice_id)
+        invoice = Invoice.find_by_id(invoice_id, fields=fields)
+        if not invoice:
+            return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["invoice"], status=404)
 
-        invoice_data = invoice.to_dict()
-        invoice_data['customer'] = customer.to_dict() if customer else None
-        invoice_data['items'] = [item.to_dict() for item in invoice_items]
-        invoice_data['payment'] = payment.to_dict() if payment else None
+        # Related entities are only loaded when the sparse fieldset asks for them.
+        invoice_data = invoice.to_dict(fields)
+        if not fields or 'customer' in fields:
+            customer = Customer.find_by_id(invoice.customer_id)
+            invoice_data['customer'] = customer.to_dict() if customer else None
+        if not fields or 'items' in fields:
+            invoice_items = InvoiceItem.find_by_invoice_id(invoice_id)
+            invoice_data['items'] = [item.to_dict() for item in invoice_items]
+        if not fields or 'payment' in fields:
+            payment = Payment.find_latest_by_invoice_id(invoice_id)
+            invoice_data['payment'] = payment.to_dict() if payment else None
 
-        return success_response(result=invoice_data, status=200)
+        return success_response(result=invoice_data, status=200, headers=headers)
 
     except Exception as e:
         return error_response(error_code='server_error', message='An unexpected error occurred while fetching the invoice.', details=str(e), status=500)
@@ -67,6 +188,7 @@ def get_invoice(invoice_id):
 @invoices_blueprint.route('/invoices', methods=['POST'])
 @jwt_required()
 @require_admin
+@idempotent
 def create_invoice():
     data = request.get_json()
     if not data:
@@ -119,31 +241,34 @@ def create_invoice():
             'status': initial_status
         }
 
-        invoice_id = Invoice.create(invoice_data)
-        if not invoice_id:
-            return error_response(error_code='server_error', message="Failed to create the invoice record.", status=500)
-
-        for item in validated_data['items']:
-            product = Product.find_by_id(item['product_id'])
-            item_data = {
-                'invoice_id': invoice_id,
-                'product_id': item['product_id'],
-                'quantity': item['quantity'],
-                'price': product.price
-            }
-            InvoiceItem.create(item_data)
-            # Update the stock for the product
-            Product.update_stock(item['product_id'], -item['quantity'])
+        # One transaction, so the invoice, its items, stock changes, payment and
+        # their outbox events commit together.
+        with DBManager.transaction():
+            invoice_id = Invoice.create(invoice_data)
+            if not invoice_id:
+                return error_response(error_code='server_error', message="Failed to create the invoice record.", status=500)
 
-        if 'initial_payment' in validated_data and validated_data['initial_payment']:
-            payment_info = validated_data['initial_payment']
-            Payment.record_payment(
-                invoice_id=invoice_id,
-                amount=Decimal(payment_info['amount']),
-                payment_date=date.today(),
-                method=payment_info['method'],
-                reference_no=payment_info.get('reference_no')
-            )
+            for item in validated_data['items']:
+                product = Product.find_by_id(item['product_id'])
+                item_data = {
+                    'invoice_id': invoice_id,
+                    'product_id': item['product_id'],
+                    'quantity': item['quantity'],
+                    'price': product.price
+                }
+                InvoiceItem.create(item_data)
+                # Update the stock for the product
+                Product.update_stock(item['product_id'], -item['quantity'])
+
+            if 'initial_payment' in validated_data and validated_data['initial_payment']:
+                payment_info = validated_data['initial_payment']
+                Payment.record_payment(
+                    invoice_id=invoice_id,
+                    amount=Decimal(payment_info['amount']),
+                    payment_date=date.today(),
+                    method=payment_info['method'],
+                    reference_no=payment_info.get('reference_no')
+                )
 
         created_invoice = Invoice.find_by_id(invoice_id)
         return success_response(result=created_invoice.to_dict(), status=201)
@@ -151,6 +276,27 @@ def create_invoice():
     except Exception as e:
         return error_response(error_code='server_error', message='An unexpected error occurred while creating the invoice.', details=str(e), status=500)
 
+@invoices_blueprint.route('/invoices/import', methods=['POST'])
+@jwt_required()
+@require_admin
+def import_invoices():
+    """
+    Bulk import of invoices from a CSV or NDJSON request body, read as a stream
+    (see app.utils.invoice_import for the record layout). ?skip_stock=true leaves
+    product stock alone, for historical data. If the import stops part-way, send
+    the same body again with ?batch_id=<id> to continue after the last committed
+    chunk.
+    """
+    skip_stock = request.args.get('skip_stock', 'false').lower() == 'true'
+    return handle_import_request(InvoiceImporter, options={'skip_stock': skip_stock})
+
+@invoices_blueprint.route('/invoices/import/<int:batch_id>', methods=['GET'])
+@jwt_required()
+@require_admin
+def get_invoice_import(batch_id):
+    """Progress and paginated error report of an invoice import."""
+    return handle_import_status(InvoiceImporter, batch_id)
+
 @invoices_blueprint.route('/invoices/<int:invoice_id>', methods=['PUT'])
 @jwt_required()
 @require_admin
@@ -159,6 +305,18 @@ def update_invoice(invoice_id):
     if not data:
         return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["request_body_empty"], status=400)
 
+    # With If-Match, a stale copy is rejected before any recalculation; the final
+    # UPDATE re-checks the version atomically.
+    expected_version = None
+    if has_if_match():
+        probe = Invoice.version_probe(invoice_id)
+        if not probe:
+            return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["invoice"], status=404)
+        failed = check_if_match(probe)
+        if failed:
+            return failed
+        expected_version = probe['version']
+
     invoice = Invoice.find_by_id(invoice_id)
     if not invoice:
         return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["invoice"], status=404)
@@ -168,72 +326,83 @@ def update_invoice(invoice_id):
     except ValidationError as err:
         return error_response(error_code='validation_error', message="The provided data is invalid.", details=err.messages, status=400)
 
+    # Every product is checked before anything is written; returning from inside the
+    # transaction below would commit its partial item and stock changes.
+    products = {}
+    if 'items' in validated_data:
+        product_ids = {item['product_id'] for item in validated_data['items']}
+        products = Product.find_by_ids(list(product_ids))
+        missing = sorted(product_ids - set(products))
+        if missing:
+            return error_response(error_code='not_found', message=f"Product with ID {missing[0]} not found.", status=404)
+
     try:
-        # If items are being updated, handle stock changes and replace items.
-        if 'items' in validated_data:
-            old_items = InvoiceItem.find_by_invoice_id(invoice_id)
-            old_items_map = {item.product_id: item.quantity for item in old_items}
-            new_items_data = validated_data['items']
-            new_items_map = {item['product_id']: item['quantity'] for item in new_items_data}
+        # One transaction, so a version conflict at the final UPDATE also undoes the
+        # item and stock changes.
+        with DBManager.transaction():
+            # If items are being updated, handle stock changes and replace items.
+            if 'items' in validated_data:
+                old_items = InvoiceItem.find_by_invoice_id(invoice_id)
+                old_items_map = {item.product_id: item.quantity for item in old_items}
+                new_items_data = validated_data['items']
+                new_items_map = {item['product_id']: item['quantity'] for item in new_items_data}
             
-            all_product_ids = set(old_items_map.keys()) | set(new_items_map.keys())
-
-            for pid in all_product_ids:
-                old_qty = old_items_map.get(pid, 0)
-                new_qty = new_items_map.get(pid, 0)
-                if old_qty != new_qty:
-                    quantity_diff = old_qty - new_qty
-                    Product.update_stock(pid, quantity_diff)
-
-            InvoiceItem.delete_by_invoice_id(invoice_id)
-            for item_data in new_items_data:
-                product = Product.find_by_id(item_data['product_id'])
-                if not product:
-                    return error_response(error_code='not_found', message=f"Product with ID {item_data['product_id']} not found.", status=404)
-                InvoiceItem.create({
-                    'invoice_id': invoice_id,
-                    'product_id': item_data['product_id'],
-                    'quantity': item_data['quantity'],
-                    'price': product.price
-                })
-
-        # Recalculate totals if financial fields have changed.
-        recalculate = 'items' in validated_data or 'discount_amount' in validated_data or 'tax_percent' in validated_data
-        if recalculate:
-            current_items = InvoiceItem.find_by_invoice_id(invoice_id)
-            subtotal_amount = sum(item.price * item.quantity for item in current_items)
+                all_product_ids = set(old_items_map.keys()) | set(new_items_map.keys())
+
+                for pid in all_product_ids:
+                    old_qty = old_items_map.get(pid, 0)
+                    new_qty = new_items_map.get(pid, 0)
+                    if old_qty != new_qty:
+                        quantity_diff = old_qty - new_qty
+                        Product.update_stock(pid, quantity_diff)
+
+                InvoiceItem.delete_by_invoice_id(invoice_id)
+                for item_data in new_items_data:
+                    product = products[item_data['product_id']]
+                    InvoiceItem.create({
+                        'invoice_id': invoice_id,
+                        'product_id': item_data['product_id'],
+                        'quantity': item_data['quantity'],
+                        'price': product.price
+                    })
+
+            # Recalculate totals if financial fields have changed.
+            recalculate = 'items' in validated_data or 'discount_amount' in validated_data or 'tax_percent' in validated_data
+            if recalculate:
+                current_items = InvoiceItem.find_by_invoice_id(invoice_id)
+                subtotal_amount = sum(item.price * item.quantity for item in current_items)
             
-            discount_amount = Decimal(validated_data.get('discount_amount', invoice.discount_amount))
-            tax_percent = Decimal(validated_data.get('tax_percent', invoice.tax_percent))
+                discount_amount = Decimal(validated_data.get('discount_amount', invoice.discount_amount))
+                tax_percent = Decimal(validated_data.get('tax_percent', invoice.tax_percent))
             
-            tax_amount = (subtotal_amount - discount_amount) * (tax_percent / Decimal('100.00'))
-            total_amount = subtotal_amount - discount_amount + tax_amount
-
-            validated_data['subtotal_amount'] = subtotal_amount
-            validated_data['discount_amount'] = discount_amount
-            validated_data['tax_percent'] = tax_percent
-            validated_data['tax_amount'] = tax_amount
-            validated_data['total_amount'] = total_amount
-        else:
-            total_amount = invoice.total_amount
-
-        # Always re-evaluate status
-        payments = Payment.find_by_invoice_id(invoice_id)
-        total_paid = sum(p.amount for p in payments)
-
-        if total_paid >= total_amount:
-            validated_data['status'] = 'Paid'
-        elif total_paid > 0:
-            validated_data['status'] = 'Partially Paid'
-        else:
-            validated_data['status'] = 'Pending'
-
-        # Remove 'items' as it's not a direct column in the 'invoices' table
-        validated_data.pop('items', None)
-
-        # Update the invoice record
-        if validated_data:
-            Invoice.update(invoice_id, validated_data)
+                tax_amount = (subtotal_amount - discount_amount) * (tax_percent / Decimal('100.00'))
+                total_amount = subtotal_amount - discount_amount + tax_amount
+
+                validated_data['subtotal_amount'] = subtotal_amount
+                validated_data['discount_amount'] = discount_amount
+                validated_data['tax_percent'] = tax_percent
+                validated_data['tax_amount'] = tax_amount
+                validated_data['total_amount'] = total_amount
+            else:
+                total_amount = invoice.total_amount
+
+            # Always re-evaluate status
+            payments = Payment.find_by_invoice_id(invoice_id)
+            total_paid = sum(p.amount for p in payments)
+
+            if total_paid >= total_amount:
+                validated_data['status'] = 'Paid'
+            elif total_paid > 0:
+                validated_data['status'] = 'Partially Paid'
+            else:
+                validated_data['status'] = 'Pending'
+
+            # Remove 'items' as it's not a direct column in the 'invoices' table
+            validated_data.pop('items', None)
+
+            # Update the invoice record
+            if validated_data:
+                Invoice.update(invoice_id, validated_data, expected_version=expected_version)
 
         # Fetch and return the fully updated invoice
         updated_invoice = Invoice.find_by_id(invoice_id)
@@ -246,7 +415,13 @@ def update_invoice(invoice_id):
         updated_invoice_data['items'] = [item.to_dict() for item in invoice_items]
         updated_invoice_data['payments'] = [payment.to_dict() for payment in payments]
 
-        return success_response(result=updated_invoice_data, status=200)
+        headers = {'ETag': resource_etag(Invoice.version_probe(invoice_id))}
+        return success_response(result=updated_invoice_data, status=200, headers=headers)
 
+    except VersionConflict:
+        probe = Invoice.version_probe(invoice_id)
+        if not probe:
+            return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["invoice"], status=404)
+        return precondition_failed_response(probe)
     except Exception as e:
         return error_response(error_code='server_error', message='An unexpected error occurred while updating the invoice.', details=str(e), status=500)
@@ -0,0 +1,68 @@
+from flask import Blueprint
+from flask_jwt_extended import jwt_required
+
+from app.database.config import Config
+from app.database.job_pool import job_pool
+from app.database.models.job import Job
+from app.utils.response import success_response, error_response
+from app.utils.error_messages import ERROR_MESSAGES
+from app.utils.auth import require_admin
+
+jobs_blueprint = Blueprint('jobs', __name__)
+
+
+def job_status(job):
+    """The job without its result, which /jobs/<id>/result returns."""
+    status = job.to_dict()
+    status.pop('result', None)
+    return status
+
+
+@jobs_blueprint.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+@require_admin
+def get_job(job_id):
+    """Status, attempts and progress of a background job."""
+    try:
+        job = Job.find_by_id(job_id)
+        if not job:
+            return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["job"], status=404)
+        return success_response(result=job_status(job), message="Job retrieved successfully.")
+    except Exception as e:
+        return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["fetch_job"], details=str(e), status=500)
+
+
+@jobs_blueprint.route('/jobs/<int:job_id>/result', methods=['GET'])
+@jwt_required()
+@require_admin
+def get_job_result(job_id):
+    """
+    The result of a succeeded job. While the job is queued or running the
+    response is 202 with its status and a Retry-After hint; a job that failed
+    for good is a 409 carrying its last error.
+    """
+    try:
+        job = Job.find_by_id(job_id)
+    except Exception as e:
+        return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["fetch_job"], details=str(e), status=500)
+    if not job:
+        return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["job"], status=404)
+    if job.status == 'succeeded':
+        return success_response(result=job.result, message="Job result retrieved successfully.")
+    if job.status == 'failed':
+        return error_response(error_code='job_failed', message=ERROR_MESSAGES["conflict"]["job_failed"],
+                              details={'job': job_status(job)}, status=409)
+    return success_response(
+        result=job_status(job),
+        message="The job has not finished yet.",
+        status=202,
+        headers={'Retry-After': str(max(1, round(Config.JOBS['poll_interval'])))}
+    )
+
+
+@jobs_blueprint.route('/jobs/pool', methods=['GET'])
+@jwt_required()
+@require_admin
+def get_job_pool_stats():
+    """Counters of the job pool running in this worker process, if any."""
+    return success_response(result=job_pool.stats(), message="Job pool stats retrieved successfully.")
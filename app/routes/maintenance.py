@@ -0,0 +1,100 @@
+from flask import Blueprint, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.database.overdue_sweeper import overdue_sweeper
+from app.database.outbox_dispatcher import outbox_dispatcher
+from app.database.models.outbox_event import OutboxEvent
+from app.utils.response import success_response, error_response
+from app.utils.auth import require_admin
+from app.utils.jobs import enqueue
+
+maintenance_blueprint = Blueprint('maintenance', __name__)
+
+@maintenance_blueprint.route('/maintenance/overdue-sweeper', methods=['GET'])
+@jwt_required()
+@require_admin
+def get_overdue_sweeper_stats():
+    """
+    Run stats of the overdue sweeper in this worker, plus the watermark and
+    totals persisted by whichever worker swept last.
+    """
+    try:
+        return success_response(
+            result={'worker': overdue_sweeper.stats(), 'state': overdue_sweeper.watermark()},
+            message="Overdue sweeper stats retrieved successfully."
+        )
+    except Exception as e:
+        return error_response(error_code='server_error', message="Failed to read the overdue sweeper state.", details=str(e), status=500)
+
+@maintenance_blueprint.route('/maintenance/overdue-sweeper/run', methods=['POST'])
+@jwt_required()
+@require_admin
+def run_overdue_sweeper():
+    """
+    Runs a sweep now instead of waiting for the next scheduled one. With
+    ?async=true the sweep is queued as a background job and the 202 response
+    links to it.
+    """
+    if request.args.get('async', 'false').lower() == 'true':
+        try:
+            job = enqueue('overdue_sweep', user_id=get_jwt_identity())
+        except Exception as e:
+            return error_response(error_code='server_error', message="Failed to queue the overdue sweep.", details=str(e), status=500)
+        return success_response(result=job.to_dict(), message="Overdue sweep queued.", status=202,
+                                headers={'Location': f"/api/jobs/{job.id}"})
+    try:
+        flipped = overdue_sweeper.run_once()
+    except Exception as e:
+        return error_response(error_code='server_error', message="The overdue sweep failed.", details=str(e), status=500)
+    if flipped is None:
+        return error_response(error_code='conflict', message="A sweep is already running.", status=409)
+    return success_response(result={'updated': flipped}, message="Overdue sweep completed.")
+
+@maintenance_blueprint.route('/maintenance/outbox', methods=['GET'])
+@jwt_required()
+@require_admin
+def get_outbox_stats():
+    """
+    Undelivered outbox events (count, oldest, most attempts), the oldest
+    dead-lettered events with their last error, and this worker's dispatcher
+    counters.
+    """
+    try:
+        return success_response(
+            result={'backlog': OutboxEvent.backlog(), 'dispatcher': outbox_dispatcher.stats(),
+                    'dead_letters': [event.to_dict() for event in OutboxEvent.dead_letters()]},
+            message="Outbox stats retrieved successfully."
+        )
+    except Exception as e:
+        return error_response(error_code='server_error', message="Failed to read the outbox state.", details=str(e), status=500)
+
+@maintenance_blueprint.route('/maintenance/outbox/dispatch', methods=['POST'])
+@jwt_required()
+@require_admin
+def dispatch_outbox():
+    """Delivers the pending outbox events now instead of waiting for the next poll."""
+    try:
+        delivered = outbox_dispatcher.run_once()
+    except Exception as e:
+        return error_response(error_code='server_error', message="The outbox dispatch failed.", details=str(e), status=500)
+    if delivered is None:
+        return error_response(error_code='conflict', message="A dispatch is already running.", status=409)
+    return success_response(result={'delivered': delivered}, message="Outbox dispatch completed.")
+
+@maintenance_blueprint.route('/maintenance/outbox/requeue', methods=['POST'])
+@jwt_required()
+@require_admin
+def requeue_outbox_dead_letters():
+    """
+    Puts dead-lettered outbox events back in the queue, e.g. once the sink that
+    rejected them is fixed: the ids in a JSON body {"ids": [...]}, or all of
+    them without one. They are delivered after the events sent meanwhile.
+    """
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+        return error_response(error_code='validation_error', message="ids must be a list of event ids.", status=400)
+    try:
+        requeued = OutboxEvent.requeue_dead_letters(ids)
+    except Exception as e:
+        return error_response(error_code='server_error', message="Failed to requeue the outbox events.", details=str(e), status=500)
+    return success_response(result={'requeued': requeued}, message="Outbox events requeued.")
@@ -2,16 +2,26 @@ from flask import Blueprint, request
 from flask_jwt_extended import jwt_required
 from marshmallow import ValidationError
 
+from app.database.config import Config
 from app.database.models.invoice import Invoice
 from app.database.models.payment import Payment
 from app.schemas.payment_schema import PaymentSchema
-from app.utils.response import success_response, error_response
+from app.utils.response import success_response, error_response, stream_response, wants_stream
 from app.utils.error_messages import ERROR_MESSAGES
 from app.utils.auth import require_admin
-from app.utils.pagination import get_pagination
+from app.utils.pagination import get_pagination, MAX_STREAM_PER_PAGE
+from app.utils.fields import get_fields, InvalidFieldsError
+from app.utils.idempotency import idempotent
+from app.utils.export import get_export_params, export_response, InvalidExportError
+from app.utils.includes import Relation, get_includes, include_fields, expand_includes, InvalidIncludeError
 
 payments_blueprint = Blueprint('payments', __name__)
 
+# Relations that can be embedded in the payment list with ?include=.
+PAYMENT_INCLUDES = {
+    'invoice': Relation(lambda payment: getattr(payment, 'invoice_id', None), Invoice.find_by_ids, field='invoice_id'),
+}
+
 # Instantiate schema
 payment_schema = PaymentSchema()
 
@@ -33,6 +43,7 @@ def search_payments():
 @payments_blueprint.route('/payments', methods=['POST'])
 @jwt_required()
 @require_admin
+@idempotent
 def create_payment():
     data = request.get_json()
     if not data:
@@ -48,23 +59,55 @@ def create_payment():
         if not invoice:
             return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["invoice"], status=404)
 
-        payment_id = Payment.create(validated_data)
+        new_payment = Payment.create(validated_data)
 
-        if payment_id:
-            new_payment = Payment.find_by_id(payment_id)
+        if new_payment:
             return success_response(payment_schema.dump(new_payment), message="Payment recorded successfully.", status=201)
         return error_response(error_code='server_error', message="Failed to record payment.", status=500)
     except Exception as e:
         return error_response(error_code='server_error', message="An error occurred while recording the payment.", details=str(e), status=500)
 
 
+@payments_blueprint.route('/payments/export', methods=['GET'])
+@jwt_required()
+def export_payments():
+    """Streams all payments as CSV or NDJSON."""
+    try:
+        export_format, updated_since = get_export_params()
+    except InvalidExportError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_export"], details=err.to_details(), status=400)
+    try:
+        rows = Payment.export_rows(updated_since=updated_since, batch_size=Config.EXPORT['batch_size'])
+        return export_response(rows, Payment.export_fields, export_format, 'payments')
+    except Exception as e:
+        return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["export"], details=str(e), status=500)
+
 @payments_blueprint.route('/payments', methods=['GET'])
 @jwt_required()
 def get_payments():
-    page, per_page = get_pagination()
+    stream = wants_stream()
+    page, per_page = get_pagination(max_per_page=MAX_STREAM_PER_PAGE) if stream else get_pagination()
     try:
-        payments, total = Payment.find_with_pagination_and_count(page=page, per_page=per_page)
-        serialized_payments = payment_schema.dump(payments, many=True)
+        fields = get_fields(Payment._public_fields)
+    except InvalidFieldsError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_fields"], details=err.to_details(), status=400)
+    try:
+        includes = get_includes(PAYMENT_INCLUDES)
+    except InvalidIncludeError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_include"], details=err.to_details(), status=400)
+    fields = include_fields(fields, includes, PAYMENT_INCLUDES)
+    schema = PaymentSchema(only=fields) if fields else payment_schema
+    try:
+        payments, total = Payment.find_with_pagination_and_count(page=page, per_page=per_page, stream=stream, fields=fields)
+        if includes:
+            payments = expand_includes(payments, schema.dump, includes, PAYMENT_INCLUDES)
+            serialize = None
+        else:
+            serialize = schema.dump
+        if stream:
+            meta_data = {'total': total, 'page': page, 'per_page': per_page}
+            return stream_response(payments, serialize=serialize, meta=meta_data, message="Payments retrieved successfully.", results_key='payments')
+        serialized_payments = list(payments) if includes else schema.dump(payments, many=True)
         return success_response({
             'payments': serialized_payments,
             'total': total,
@@ -78,9 +121,14 @@ def get_payments():
 @jwt_required()
 def get_payment(payment_id):
     try:
-        payment = Payment.find_by_id(payment_id)
+        fields = get_fields(Payment._public_fields)
+    except InvalidFieldsError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_fields"], details=err.to_details(), status=400)
+    schema = PaymentSchema(only=fields) if fields else payment_schema
+    try:
+        payment = Payment.find_by_id(payment_id, fields=fields)
         if payment:
-            return success_response(payment_schema.dump(payment), message="Payment retrieved successfully.")
+            return success_response(schema.dump(payment), message="Payment retrieved successfully.")
         return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["payment"], status=404)
     except Exception as e:
         return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["fetch_payment"], details=str(e), status=500)
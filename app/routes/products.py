@@ -2,12 +2,20 @@ from flask import Blueprint, request
 from flask_jwt_extended import jwt_required
 from marshmallow import ValidationError
 
+from app.database.config import Config
+from app.database.models.base_model import VersionConflict
 from app.database.models.product import Product
 from app.schemas.product_schema import ProductSchema
-from app.utils.response import success_response, error_response
+from app.utils.response import success_response, error_response, stream_response, wants_stream
 from app.utils.error_messages import ERROR_MESSAGES
 from app.utils.auth import require_admin
-from app.utils.pagination import get_pagination
+from app.utils.pagination import get_pagination, MAX_STREAM_PER_PAGE
+from app.utils.fields import get_fields, InvalidFieldsError
+from app.utils.export import get_export_params, export_response, InvalidExportError
+from app.utils.conditional import (
+    evaluate_conditional, evaluate_table_conditional, not_modified_response, latest_timestamp,
+    has_if_match, check_if_match, precondition_failed_response, resource_etag,
+)
 
 products_blueprint = Blueprint('products', __name__)
 
@@ -51,11 +59,9 @@ def create_product():
                               status=400)
 
     try:
-        product_id = Product.create(validated_data)
-        if product_id:
-            product = Product.find_by_id(product_id)
-            if product:
-                return success_response(product_schema.dump(product), message="Product created successfully.", status=201)
+        product = Product.create(validated_data)
+        if product:
+            return success_response(product_schema.dump(product), message="Product created successfully.", status=201)
         return error_response(error_code='server_error', 
                               message=ERROR_MESSAGES["server_error"]["create_product"], 
                               status=500)
@@ -65,20 +71,50 @@ def create_product():
                               details=str(e), 
                               status=500)
 
+@products_blueprint.route('/products/export', methods=['GET'])
+@jwt_required()
+def export_products():
+    """Streams all products (optionally including deleted ones) as CSV or NDJSON."""
+    try:
+        export_format, updated_since = get_export_params()
+    except InvalidExportError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_export"], details=err.to_details(), status=400)
+    try:
+        rows = Product.export_rows(
+            include_deleted=request.args.get('include_deleted', 'false').lower() == 'true',
+            updated_since=updated_since,
+            batch_size=Config.EXPORT['batch_size'],
+        )
+        return export_response(rows, Product.export_fields, export_format, 'products')
+    except Exception as e:
+        return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["export"], details=str(e), status=500)
+
 @products_blueprint.route('/products', methods=['GET'])
 @jwt_required()
 def get_products():
-    page, per_page = get_pagination()
+    stream = wants_stream()
+    page, per_page = get_pagination(max_per_page=MAX_STREAM_PER_PAGE) if stream else get_pagination()
     include_deleted = request.args.get('include_deleted', 'false').lower() == 'true'
     try:
-        products, total = Product.find_with_pagination_and_count(page=page, per_page=per_page, include_deleted=include_deleted)
-        serialized_products = product_schema.dump(products, many=True)
+        fields = get_fields(Product._public_fields)
+    except InvalidFieldsError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_fields"], details=err.to_details(), status=400)
+    schema = ProductSchema(only=fields) if fields else product_schema
+    try:
+        headers, not_modified = evaluate_table_conditional('products')
+        if not_modified:
+            return not_modified_response(headers)
+
+        products, total = Product.find_with_pagination_and_count(page=page, per_page=per_page, include_deleted=include_deleted, stream=stream, fields=fields)
         meta_data = {
             'total': total,
             'page': page,
             'per_page': per_page
         }
-        return success_response(result=serialized_products, meta=meta_data, message="Products retrieved successfully.")
+        if stream:
+            return stream_response(products, serialize=schema.dump, meta=meta_data, message="Products retrieved successfully.", headers=headers)
+        serialized_products = schema.dump(products, many=True)
+        return success_response(result=serialized_products, meta=meta_data, message="Products retrieved successfully.", headers=headers)
     except Exception as e:
         return error_response(error_code='server_error', 
                               message=ERROR_MESSAGES["server_error"]["fetch_product"], 
@@ -90,9 +126,23 @@ def get_products():
 def get_product(product_id):
     include_deleted = request.args.get('include_deleted', 'false').lower() == 'true'
     try:
-        product = Product.find_by_id(product_id, include_deleted=include_deleted)
+        fields = get_fields(Product._public_fields)
+    except InvalidFieldsError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_fields"], details=err.to_details(), status=400)
+    schema = ProductSchema(only=fields) if fields else product_schema
+    try:
+        probe = Product.version_probe(product_id, include_deleted=include_deleted)
+        if not probe:
+            return error_response(error_code='not_found', 
+                                  message=ERROR_MESSAGES["not_found"]["product"], 
+                                  status=404)
+        headers, not_modified = evaluate_conditional(probe, latest_timestamp(probe['created_at'], probe['updated_at']))
+        if not_modified:
+            return not_modified_response(headers)
+
+        product = Product.find_by_id(product_id, include_deleted=include_deleted, fields=fields)
         if product:
-            return success_response(product_schema.dump(product), message="Product retrieved successfully.")
+            return success_response(schema.dump(product), message="Product retrieved successfully.", headers=headers)
         return error_response(error_code='not_found', 
                               message=ERROR_MESSAGES["not_found"]["product"], 
                               status=404)
@@ -121,13 +171,29 @@ def update_product(product_id):
                               status=400)
 
     try:
-        if not Product.update(product_id, validated_data):
+        expected_version = None
+        if has_if_match():
+            probe = Product.version_probe(product_id)
+            if not probe:
+                return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["product"], status=404)
+            failed = check_if_match(probe)
+            if failed:
+                return failed
+            expected_version = probe['version']
+
+        updated_product = Product.update(product_id, validated_data, returning=True, expected_version=expected_version)
+        if not updated_product:
             return error_response(error_code='not_found', 
                                   message=ERROR_MESSAGES["not_found"]["product"], 
                                   status=404)
 
-        updated_product = Product.find_by_id(product_id)
-        return success_response(product_schema.dump(updated_product), message="Product updated successfully.")
+        headers = {'ETag': resource_etag(Product.version_probe(product_id))}
+        return success_response(product_schema.dump(updated_product), message="Product updated successfully.", headers=headers)
+    except VersionConflict:
+        probe = Product.version_probe(product_id)
+        if not probe:
+            return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["product"], status=404)
+        return precondition_failed_response(probe)
     except Exception as e:
         return error_response(error_code='server_error', 
                               message=ERROR_MESSAGES["server_error"]["update_product"], 
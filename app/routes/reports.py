@@ -0,0 +1,39 @@
+from flask import Blueprint
+from flask_jwt_extended import jwt_required
+
+from app.utils.response import success_response, error_response
+from app.utils.error_messages import ERROR_MESSAGES
+from app.utils.auth import require_admin
+from app.utils.pagination import get_pagination
+from app.utils.reports import AGING_BUCKETS, get_aging_params, get_aging_report, InvalidReportError
+
+reports_blueprint = Blueprint('reports', __name__)
+
+@reports_blueprint.route('/reports/aging', methods=['GET'])
+@jwt_required()
+@require_admin
+def aging_report():
+    """
+    Accounts receivable aging: for every customer with an open balance, the
+    unpaid invoice amounts bucketed by days past due (current, 1-30, 31-60,
+    61-90, over 90), plus totals over all of them. ?as_of=YYYY-MM-DD ages
+    against that date (default today), ?customer_id= limits the report to one
+    customer, and page/per_page page through the customers, largest balance
+    first. Totals always cover every customer, not just the page.
+    """
+    try:
+        as_of, customer_id = get_aging_params()
+    except InvalidReportError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_report"], details=err.to_details(), status=400)
+    page, per_page = get_pagination()
+    try:
+        # Cached per table version, so paging reuses one grouped query.
+        rows, totals = get_aging_report(as_of, customer_id=customer_id)
+        start = (page - 1) * per_page
+        return success_response(
+            result={'customers': rows[start:start + per_page], 'totals': totals},
+            message="Aging report retrieved successfully.",
+            meta={'as_of': as_of.isoformat(), 'buckets': list(AGING_BUCKETS), 'total': len(rows), 'page': page, 'per_page': per_page}
+        )
+    except Exception as e:
+        return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["report"], details=str(e), status=500)
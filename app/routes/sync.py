@@ -0,0 +1,34 @@
+from flask import Blueprint
+from flask_jwt_extended import jwt_required
+
+from app.utils.response import success_response, error_response
+from app.utils.error_messages import ERROR_MESSAGES
+from app.utils.auth import require_admin
+from app.utils.sync import get_sync_params, fetch_changes, encode_token, InvalidSyncError
+
+sync_blueprint = Blueprint('sync', __name__)
+
+@sync_blueprint.route('/sync', methods=['GET'])
+@jwt_required()
+@require_admin
+def sync_changes():
+    """
+    Delta sync for clients that keep a local copy of customers, invoices, products
+    and payments. Without ?since= it returns every row; with the next_token of an
+    earlier response it returns only rows created, updated or soft-deleted since.
+    Rows are paged by an (updated_at, id) cursor per entity: while meta.has_more is
+    true, call again with meta.next_token.
+    """
+    try:
+        cursors, entities, limit = get_sync_params()
+    except InvalidSyncError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_sync"], details=err.to_details(), status=400)
+    try:
+        changes, cursors, has_more = fetch_changes(cursors, entities, limit)
+        return success_response(
+            result=changes,
+            message="Changes retrieved successfully.",
+            meta={'next_token': encode_token(cursors), 'has_more': has_more, 'limit': limit}
+        )
+    except Exception as e:
+        return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["sync"], details=str(e), status=500)
@@ -1,14 +1,15 @@
 from flask import Blueprint, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
-from werkzeug.security import generate_password_hash, check_password_hash
 
 from app.database.models.user import User
-from app.utils.response import success_response, error_response
+from app.utils.response import success_response, error_response, stream_response, wants_stream
 from app.utils.error_messages import ERROR_MESSAGES
 from app.utils.auth import require_admin
-from app.utils.pagination import get_pagination
+from app.utils.pagination import get_pagination, MAX_STREAM_PER_PAGE
+from app.utils.fields import get_fields, InvalidFieldsError
 from app.schemas.user_schema import UserUpdateSchema
+from app.utils.password_hasher import password_hasher, PasswordHasherBusy
 
 users_blueprint = Blueprint('users', __name__)
 
@@ -62,16 +63,19 @@ def update_user_profile(user_id):
     if 'password' in validated_data:
         if 'old_password' not in validated_data:
             return error_response(error_code='validation_error', message="Old password is required to set a new password.", status=400)
-        if not target_user.check_password(validated_data['old_password']):
-            return error_response(error_code='unauthorized', message="Invalid old password.", status=401)
-        validated_data['password_hash'] = generate_password_hash(validated_data.pop('password'), method='scrypt')
+        try:
+            if not target_user.check_password(validated_data['old_password']):
+                return error_response(error_code='unauthorized', message="Invalid old password.", status=401)
+            validated_data['password_hash'] = password_hasher.hash(validated_data.pop('password'))
+        except PasswordHasherBusy:
+            return error_response(error_code='service_busy', message=ERROR_MESSAGES["service_unavailable"]["password_hasher_busy"], status=503, headers={'Retry-After': '1'})
         validated_data.pop('old_password', None)
 
     try:
-        if not User.update(user_id, validated_data):
+        updated_user = User.update(user_id, validated_data, returning=True)
+        if not updated_user:
             return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["user"], status=404)
 
-        updated_user = User.find_by_id(user_id)
         return success_response(updated_user.to_dict(), message="User profile updated successfully")
     except Exception as e:
         return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["update_user"], details=str(e), status=500)
@@ -81,12 +85,20 @@ def update_user_profile(user_id):
 @jwt_required()
 @require_admin
 def get_users():
-    page, per_page = get_pagination()
+    stream = wants_stream()
+    page, per_page = get_pagination(max_per_page=MAX_STREAM_PER_PAGE) if stream else get_pagination()
     include_deleted = request.args.get('include_deleted', 'false').lower() == 'true'
     try:
-        users, total = User.find_with_pagination_and_count(page=page, per_page=per_page, include_deleted=include_deleted)
+        fields = get_fields(User._public_fields)
+    except InvalidFieldsError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_fields"], details=err.to_details(), status=400)
+    try:
+        users, total = User.find_with_pagination_and_count(page=page, per_page=per_page, include_deleted=include_deleted, stream=stream, fields=fields)
+        if stream:
+            meta_data = {'total': total, 'page': page, 'per_page': per_page}
+            return stream_response(users, serialize=lambda u: u.to_dict(fields), meta=meta_data, message="Users retrieved successfully", results_key='users')
         return success_response({
-            'users': [u.to_dict() for u in users],
+            'users': [u.to_dict(fields) for u in users],
             'total': total,
             'page': page,
             'per_page': per_page
@@ -106,9 +118,13 @@ def get_user(user_id):
 
     include_deleted = request.args.get('include_deleted', 'false').lower() == 'true'
     try:
-        target_user = User.find_by_id(user_id, include_deleted=include_deleted)
+        fields = get_fields(User._public_fields)
+    except InvalidFieldsError as err:
+        return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_fields"], details=err.to_details(), status=400)
+    try:
+        target_user = User.find_by_id(user_id, include_deleted=include_deleted, fields=fields)
         if target_user:
-            return success_response(target_user.to_dict(), message="User retrieved successfully")
+            return success_response(target_user.to_dict(fields), message="User retrieved successfully")
         return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["user"], status=404)
     except Exception as e:
         return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["fetch_user"], details=str(e), status=500)
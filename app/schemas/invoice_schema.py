@@ -1,4 +1,4 @@
-from marshmallow import Schema, fields, validate
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError, EXCLUDE
 # Import both schemas from the payment_schema module
 from app.schemas.payment_schema import InitialPaymentSchema
 
@@ -17,5 +17,51 @@ class InvoiceSchema(Schema):
     # Use the new, more flexible schema for initial payments
     initial_payment = fields.Nested(InitialPaymentSchema, allow_none=True)
 
+# Bulk import: historical invoices may reference customers by email and products
+# by code, carry their own prices and dates, and record a payment made earlier.
+class InvoiceImportItemSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    product_id = fields.Int(validate=validate.Range(min=1))
+    product_code = fields.Str()
+    quantity = fields.Int(required=True, validate=validate.Range(min=1))
+    # Unit price at the time of sale; defaults to the product's current price.
+    price = fields.Decimal(places=2, allow_none=True, validate=validate.Range(min=0))
+
+    @validates_schema
+    def validate_product(self, data, **kwargs):
+        if not data.get('product_id') and not data.get('product_code'):
+            raise ValidationError("Either product_id or product_code is required.", "product_id")
+
+class InvoiceImportPaymentSchema(InitialPaymentSchema):
+    class Meta:
+        unknown = EXCLUDE
+
+    payment_date = fields.Date(allow_none=True)
+
+class InvoiceImportSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    # The invoice's id in the source system, echoed in the error report.
+    external_id = fields.Str(allow_none=True)
+    customer_id = fields.Int(validate=validate.Range(min=1))
+    customer_email = fields.Email()
+    invoice_date = fields.Date(allow_none=True)
+    due_date = fields.Date(allow_none=True)
+    # Derived from the payment (like POST /invoices) when omitted.
+    status = fields.Str(validate=validate.OneOf(["Pending", "Paid", "Overdue", "Partially Paid"]), allow_none=True)
+    discount_amount = fields.Decimal(places=2, allow_none=True, validate=validate.Range(min=0))
+    tax_percent = fields.Decimal(places=2, allow_none=True, validate=validate.Range(min=0, max=100))
+    items = fields.List(fields.Nested(InvoiceImportItemSchema), required=True, validate=validate.Length(min=1))
+    payment = fields.Nested(InvoiceImportPaymentSchema, allow_none=True)
+
+    @validates_schema
+    def validate_customer(self, data, **kwargs):
+        if not data.get('customer_id') and not data.get('customer_email'):
+            raise ValidationError("Either customer_id or customer_email is required.", "customer_id")
+
 # Create an instance of the schema to be used in the application
 invoice_schema = InvoiceSchema()
+invoice_import_schema = InvoiceImportSchema()
@@ -0,0 +1,167 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, request
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+
+from app.database.config import Config
+from app.database.db_manager import DBManager
+
+logger = logging.getLogger(__name__)
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+# Endpoints that can't run inside a batch: the batch endpoint itself, and streams
+# that never finish.
+_EXCLUDED_ENDPOINTS = ('batch.execute_batch', 'events.stream_events')
+
+# Request headers every sub-request inherits from the batch request.
+_INHERITED_HEADERS = ('Authorization', 'Cookie', 'Accept-Language')
+
+# Response headers worth returning to the client for each sub-request.
+_RETURNED_HEADERS = ('ETag', 'Last-Modified', 'Location', 'Cache-Control')
+
+
+class InvalidBatchError(ValueError):
+    """Raised when the batch body isn't a list of well-formed sub-requests."""
+
+    def __init__(self, errors):
+        super().__init__("Invalid batch request")
+        self.errors = errors
+
+    def to_details(self):
+        return self.errors
+
+
+def parse_batch(data):
+    """
+    Validates a batch body: {"requests": [{"method", "path", "body", "headers", "id"}],
+    "parallel": bool}. Returns (sub_requests, parallel); raises InvalidBatchError.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list) or not data['requests']:
+        raise InvalidBatchError({'requests': ['Expected a non-empty list of sub-requests.']})
+    sub_requests = data['requests']
+    limit = Config.BATCH['max_requests']
+    if len(sub_requests) > limit:
+        raise InvalidBatchError({'requests': [f'At most {limit} sub-requests per batch.']})
+
+    errors, parsed = {}, []
+    for index, sub in enumerate(sub_requests):
+        if not isinstance(sub, dict):
+            errors[index] = ['Expected an object.']
+            continue
+        method = str(sub.get('method', 'GET')).upper()
+        path = sub.get('path')
+        item_errors = []
+        if method not in BATCH_METHODS:
+            item_errors.append(f"method must be one of: {', '.join(BATCH_METHODS)}.")
+        if not isinstance(path, str) or not path.startswith('/api/'):
+            item_errors.append("path must be an /api/ path.")
+        elif _resolve_endpoint(method, path) in _EXCLUDED_ENDPOINTS:
+            item_errors.append("path can't be used inside a batch.")
+        if sub.get('headers') is not None and not isinstance(sub['headers'], dict):
+            item_errors.append("headers must be an object.")
+        if item_errors:
+            errors[index] = item_errors
+            continue
+        parsed.append({
+            'id': sub.get('id', index),
+            'method': method,
+            'path': path,
+            'body': sub.get('body'),
+            'headers': sub.get('headers') or {},
+        })
+    if errors:
+        raise InvalidBatchError(errors)
+    return parsed, bool(data.get('parallel'))
+
+
+def _build_environ(method, path, headers=None, body=None):
+    builder = EnvironBuilder(path=path, method=method, headers=headers, json=body)
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+
+def _resolve_endpoint(method, path):
+    """
+    The endpoint a sub-request would be routed to, or None if it matches none.
+    Resolved from the decoded environ, exactly as dispatch will see it, so an
+    encoded path (e.g. /api/%62atch) can't get around the exclusions.
+    """
+    environ = _build_environ(method, path)
+    try:
+        endpoint, _ = current_app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        # 404, 405 or a redirect: the sub-request won't reach any view.
+        return None
+    return endpoint
+
+
+def _dispatch(app, sub, inherited):
+    """Runs one sub-request through the app's URL map and returns its result entry."""
+    headers = {**inherited, **{str(k): str(v) for k, v in sub['headers'].items()}}
+    environ = _build_environ(sub['method'], sub['path'], headers, sub['body'])
+
+    # Inside the batch request's app context the sub-request shares its `g`, so
+    # the identity map (and with it the JWT user lookup) carries across sub-requests.
+    with app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            logger.exception("Batch sub-request %s %s failed", sub['method'], sub['path'])
+            body = {'success': False, 'error': {'code': 'server_error', 'message': 'An unexpected error occurred.', 'details': str(e)}}
+            return {'id': sub['id'], 'status': 500, 'headers': {}, 'body': body}
+        data = response.get_data(as_text=True)
+        body = (json.loads(data) if data else None) if response.is_json else data
+        return {
+            'id': sub['id'],
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in _RETURNED_HEADERS if name in response.headers},
+            'body': body,
+        }
+
+
+def _dispatch_parallel(app, subs, inherited):
+    """Runs independent GETs at the same time, each worker on its own app context and connection."""
+    def run(sub):
+        with app.app_context(), DBManager.shared_connection():
+            return _dispatch(app, sub, inherited)
+
+    workers = min(Config.BATCH['max_workers'], len(subs))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') as executor:
+        return list(executor.map(run, subs))
+
+
+def run_batch(sub_requests, parallel=False):
+    """
+    Executes the sub-requests in order, on one shared database connection, and
+    returns their results in the same order. With `parallel`, each run of
+    consecutive GETs is executed concurrently; writes still run one at a time,
+    after everything before them.
+    """
+    app = current_app._get_current_object()
+    inherited = {name: request.headers[name] for name in _INHERITED_HEADERS if name in request.headers}
+
+    results = []
+    with DBManager.shared_connection():
+        pending_gets = []
+
+        def flush_gets():
+            if len(pending_gets) > 1:
+                results.extend(_dispatch_parallel(app, pending_gets, inherited))
+            elif pending_gets:
+                results.append(_dispatch(app, pending_gets[0], inherited))
+            pending_gets.clear()
+
+        for sub in sub_requests:
+            if parallel and sub['method'] == 'GET':
+                pending_gets.append(sub)
+                continue
+            flush_gets()
+            results.append(_dispatch(app, sub, inherited))
+        flush_gets()
+    return results
@@ -0,0 +1,355 @@
+import csv
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+from collections import Counter
+from itertools import dropwhile, islice
+
+from flask import request
+from flask_jwt_extended import get_jwt_identity
+from marshmallow import ValidationError
+
+from app.database.config import Config
+from app.database.models.import_batch import ImportBatch
+from app.utils.error_messages import ERROR_MESSAGES
+from app.utils.files import ensure_private_dir
+from app.utils.jobs import job_handler, enqueue, FatalJobError
+from app.utils.pagination import get_pagination, MAX_STREAM_PER_PAGE
+from app.utils.response import success_response, error_response
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# Content types accepted by the import endpoints when ?format= is not given.
+IMPORT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+
+class ImportBatchError(ValueError):
+    """Raised when an import can't be started or resumed; `code` names the reason."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class ImportFailed(Exception):
+    """Raised when an import stops part-way. Committed chunks stay, so it can be resumed."""
+
+    def __init__(self, batch, cause):
+        super().__init__(str(cause))
+        self.batch = batch
+
+
+class RecordParseError(str):
+    """Stands in for an input record that couldn't be parsed at all."""
+
+
+def read_ndjson(lines):
+    """Yields (record_number, record) for each non-blank line of NDJSON input."""
+    number = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = RecordParseError(f"Invalid JSON: {e}")
+        if not isinstance(record, (dict, RecordParseError)):
+            record = RecordParseError("Expected a JSON object.")
+        yield number, record
+
+
+def csv_rows(lines):
+    """CSV rows as dicts of their non-empty cells; empty cells mean "not given"."""
+    for row in csv.DictReader(lines):
+        # Extra cells (key None) are ignored.
+        row = {
+            name.strip(): value.strip()
+            for name, value in row.items()
+            if name and isinstance(value, str) and value.strip()
+        }
+        if row:
+            yield row
+
+
+def read_csv(lines):
+    """Yields (record_number, record) with one record per CSV row."""
+    return enumerate(csv_rows(lines), start=1)
+
+
+def pick(row, columns):
+    return {column: row[column] for column in columns if column in row}
+
+
+class BulkImporter:
+    """
+    Base class of the bulk imports. Reads CSV or NDJSON records as a stream and
+    hands them to _import_chunk() `chunk_size` at a time. Subclasses validate the
+    chunk, write it with multi-row statements and call _checkpoint() inside the
+    same DBManager.transaction(), so a chunk's rows, its rejected records and
+    the resume position always commit together.
+
+    Invalid records are reported in import_errors and don't stop the import. If
+    anything else fails, the current chunk rolls back and the batch is marked
+    'failed'; re-running the same input with resume() continues after the last
+    committed chunk. Only one run per batch should be active at a time.
+    """
+
+    kind = None
+    # kind -> importer class, for import jobs.
+    importers = {}
+    readers = {'csv': read_csv, 'ndjson': read_ndjson}
+    # Marshmallow schema records are loaded with.
+    schema = None
+    # Record key echoed as the reference in the error report.
+    reference_field = None
+    chunk_size_setting = 'chunk_size'
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.kind:
+            BulkImporter.importers[cls.kind] = cls
+
+    def __init__(self, batch, chunk_size=None):
+        self.batch = batch
+        self.options = batch.options
+        # Per-outcome record counts (e.g. created, rejected), carried over on resume.
+        self.counts = Counter(batch.counts)
+        self.chunk_size = chunk_size or Config.IMPORT[self.chunk_size_setting]
+
+    @classmethod
+    def validate_options(cls, options):
+        """Returns the options to store on the batch; raises ImportBatchError('invalid_option')."""
+        return options
+
+    @classmethod
+    def start(cls, import_format, user_id, source=None, options=None, chunk_size=None):
+        """Creates a new import batch."""
+        if import_format not in cls.readers:
+            raise ImportBatchError('invalid_format', f"Unsupported import format: {import_format}")
+        options = cls.validate_options(dict(options or {}))
+        batch = ImportBatch.create(cls.kind, import_format, user_id, source=source, options=options)
+        return cls(batch, chunk_size)
+
+    @classmethod
+    def resume(cls, batch_id, chunk_size=None):
+        """Continues an earlier batch with its original format and options."""
+        batch = ImportBatch.find_by_id(batch_id)
+        if not batch:
+            raise ImportBatchError('not_found', f"Import batch {batch_id} not found.")
+        if batch.kind != cls.kind:
+            raise ImportBatchError('mismatch', f"Import batch {batch_id} is not a {cls.kind} import.")
+        if batch.status == 'completed':
+            raise ImportBatchError('finished', f"Import batch {batch_id} has already completed.")
+        return cls(batch, chunk_size)
+
+    def run(self, lines, progress=None):
+        """
+        Imports the records of `lines` (an iterable of text lines) and returns the
+        finished batch. `progress(processed_records)` is called after each chunk.
+        """
+        done = self.batch.processed_records or 0
+        records = dropwhile(lambda record: record[0] <= done, self.readers[self.batch.format](lines))
+        try:
+            while True:
+                chunk = list(islice(records, self.chunk_size))
+                if not chunk:
+                    break
+                self._import_chunk(chunk)
+                if progress:
+                    progress(chunk[-1][0])
+        except Exception as e:
+            logger.exception("Import batch %s (%s) failed", self.batch.id, self.kind)
+            ImportBatch.finish(self.batch.id, 'failed', str(e))
+            raise ImportFailed(ImportBatch.find_by_id(self.batch.id), e) from e
+        ImportBatch.finish(self.batch.id, 'completed')
+        self.batch = ImportBatch.find_by_id(self.batch.id)
+        return self.batch
+
+    def _import_chunk(self, chunk):
+        raise NotImplementedError
+
+    def _validate(self, chunk):
+        """Loads each record with `schema`. Returns (valid, errors) as (number, reference, data/errors) tuples."""
+        valid, errors = [], []
+        for number, record in chunk:
+            if isinstance(record, RecordParseError):
+                errors.append((number, None, {'_record': [str(record)]}))
+                continue
+            reference = record.get(self.reference_field) if self.reference_field else None
+            try:
+                valid.append((number, reference, self.schema.load(record)))
+            except ValidationError as err:
+                errors.append((number, reference, err.messages))
+        return valid, errors
+
+    def _checkpoint(self, chunk, imported, errors, **counts):
+        """
+        Records the chunk's outcome: `imported` records written, `errors` as
+        (record_number, reference, errors) tuples, and any extra per-outcome counts.
+        Must be called inside the chunk's DBManager.transaction().
+        """
+        errors.sort(key=lambda error: error[0])
+        self.counts.update({name: count for name, count in counts.items() if count})
+        if errors:
+            self.counts['rejected'] += len(errors)
+        ImportBatch.checkpoint(self.batch.id, chunk[-1][0], imported, errors, dict(self.counts))
+        logger.info("Import batch %s (%s): through record %s, %s imported, %s rejected",
+                    self.batch.id, self.kind, chunk[-1][0], imported, len(errors))
+
+
+def import_report(batch):
+    """The batch's progress plus one page of its per-record error report."""
+    page, per_page = get_pagination(max_per_page=MAX_STREAM_PER_PAGE)
+    errors, total = ImportBatch.find_errors(batch.id, offset=(page - 1) * per_page, limit=per_page)
+    return success_response(
+        result={'batch': batch.to_dict(), 'errors': errors},
+        meta={'total': total, 'page': page, 'per_page': per_page},
+        status=200
+    )
+
+
+_IMPORT_BATCH_ERRORS = {
+    'not_found': ('not_found', ERROR_MESSAGES["not_found"]["import_batch"], 404),
+    'finished': ('conflict', ERROR_MESSAGES["conflict"]["import_finished"], 409),
+    'mismatch': ('conflict', ERROR_MESSAGES["conflict"]["import_mismatch"], 409),
+    'invalid_format': ('validation_error', ERROR_MESSAGES["validation"]["invalid_import_format"], 400),
+    'invalid_option': ('validation_error', ERROR_MESSAGES["validation"]["invalid_import_option"], 400),
+}
+
+
+def spool_input(stream, batch):
+    """
+    Copies the request body to a file in the job spool directory and returns its
+    path. The directory must be private (0700, ours), as it holds uploaded data.
+    """
+    spool_dir = ensure_private_dir(Config.JOBS['spool_dir'])
+    fd, path = tempfile.mkstemp(dir=spool_dir, prefix=f"import-{batch.id}-", suffix=f".{batch.format}")
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            shutil.copyfileobj(stream, spool, 64 * 1024)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def queue_import(importer):
+    """Spools the request body and queues an import job for it; responds 202 with the job."""
+    path = spool_input(request.stream, importer.batch)
+    try:
+        job = enqueue('import', {'importer': importer.kind, 'batch_id': importer.batch.id, 'path': path},
+                      user_id=get_jwt_identity())
+    except Exception:
+        os.remove(path)
+        raise
+    return success_response(
+        result={'job': job.to_dict(), 'batch': importer.batch.to_dict()},
+        message="Import queued.",
+        status=202,
+        headers={'Location': f"/api/jobs/{job.id}"}
+    )
+
+
+@job_handler('import')
+def run_import_job(context):
+    """
+    Runs a queued import from its spooled input. A retry resumes the batch after
+    its last committed chunk. The input is deleted once the job is done for good.
+    """
+    payload = context.payload
+    importer_class = BulkImporter.importers.get(payload.get('importer'))
+    if importer_class is None:
+        raise FatalJobError(f"Unknown importer: {payload.get('importer')}")
+    path = payload['path']
+    try:
+        importer = importer_class.resume(payload['batch_id'])
+    except ImportBatchError as err:
+        if err.code == 'finished':
+            # An earlier attempt completed but its outcome wasn't recorded.
+            _remove_spooled(path)
+            return ImportBatch.find_by_id(payload['batch_id']).to_dict()
+        raise FatalJobError(str(err)) from err
+    if not os.path.exists(path):
+        raise FatalJobError("The queued import input is no longer available.")
+
+    def progress(processed):
+        context.progress(processed, message=f"{processed} records processed")
+
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as lines:
+            batch = importer.run(lines, progress=progress)
+    except Exception:
+        if context.last_attempt:
+            _remove_spooled(path)
+        raise
+    _remove_spooled(path)
+    return batch.to_dict()
+
+
+def _remove_spooled(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def handle_import_request(importer_class, options=None):
+    """
+    Runs an import endpoint: starts a batch from the request body (or resumes
+    ?batch_id=), reads the body as a stream and responds with the import report.
+    With ?async=true the body is spooled and imported by a background job
+    instead; the 202 response links to the job.
+    """
+    batch_id = request.args.get('batch_id', type=int)
+    try:
+        if batch_id:
+            importer = importer_class.resume(batch_id)
+        else:
+            content_type = (request.mimetype or '').lower()
+            import_format = request.args.get('format') or IMPORT_CONTENT_TYPES.get(content_type)
+            importer = importer_class.start(import_format, get_jwt_identity(), source=request.args.get('source'), options=options)
+    except ImportBatchError as err:
+        error_code, message, status = _IMPORT_BATCH_ERRORS[err.code]
+        return error_response(error_code=error_code, message=message, details=str(err), status=status)
+
+    if request.args.get('async', 'false').lower() == 'true':
+        try:
+            return queue_import(importer)
+        except Exception as e:
+            return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["import"], details=str(e), status=500)
+
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    try:
+        batch = importer.run(lines)
+    except ImportFailed as err:
+        return error_response(
+            error_code='server_error',
+            message=ERROR_MESSAGES["server_error"]["import"],
+            details={'batch': err.batch.to_dict() if err.batch else None, 'error': str(err)},
+            status=500
+        )
+    except Exception as e:
+        return error_response(error_code='server_error', message=ERROR_MESSAGES["server_error"]["import"], details=str(e), status=500)
+    return import_report(batch)
+
+
+def handle_import_status(importer_class, batch_id):
+    """Responds with the progress and error report of one of `importer_class`'s batches."""
+    try:
+        batch = ImportBatch.find_by_id(batch_id)
+        if not batch or batch.kind != importer_class.kind:
+            return error_response(error_code='not_found', message=ERROR_MESSAGES["not_found"]["import_batch"], status=404)
+        return import_report(batch)
+    except Exception as e:
+        return error_response(error_code='server_error', message='An unexpected error occurred while fetching the import.', details=str(e), status=500)
@@ -0,0 +1,130 @@
+import hashlib
+from datetime import datetime, timezone
+
+from flask import current_app, request
+
+from app.database.db_manager import DBManager
+from app.utils.error_messages import ERROR_MESSAGES
+from app.utils.response import error_response, wants_ndjson, NDJSON_MIMETYPE
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def latest_timestamp(*values):
+    """Returns the most recent of the given datetimes / ISO strings, ignoring empty values."""
+    timestamps = [ts for ts in (_to_datetime(v) for v in values) if ts is not None]
+    return max(timestamps) if timestamps else None
+
+
+def table_versions(*tables):
+    """
+    Cheap version probe for whole tables, used by list endpoints.
+
+    Returns one (table, max_id, max_updated_at, last_created_at) tuple per table.
+    Inserts change the max id and updates (including soft deletes) bump updated_at
+    via ON UPDATE CURRENT_TIMESTAMP. Every value is read from one end of an index
+    (the primary key, or the updated_at index), so the probe costs the same at any
+    table size. Hard deletes aren't seen; the only ones the app makes, of invoice
+    items, always come with an update of their invoice.
+    """
+    query = " UNION ALL ".join(
+        f"SELECT '{table}' AS tbl, MAX(id) AS max_id, MAX(updated_at) AS max_updated_at, "
+        f"(SELECT created_at FROM {table} ORDER BY id DESC LIMIT 1) AS last_created_at FROM {table}"
+        for table in tables
+    )
+    rows = DBManager.execute_query(query, fetch='all', cache=False)
+    return [
+        (row['tbl'], row['max_id'], row['max_updated_at'], row['last_created_at'])
+        for row in rows
+    ]
+
+
+def make_etag(version, full_path=None):
+    """
+    Builds an ETag from a version probe, the request's path and query string and
+    the negotiated mimetype, so different pages, filters and fieldsets of the same
+    data, and its JSON and NDJSON forms, get distinct tags.
+    """
+    full_path = request.full_path if full_path is None else full_path
+    mimetype = NDJSON_MIMETYPE if wants_ndjson() else "application/json"
+    digest = hashlib.sha1(repr((full_path, mimetype, version)).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def evaluate_conditional(version, last_modified=None):
+    """
+    Compares the request's If-None-Match / If-Modified-Since headers against the
+    current version of the resource.
+
+    Returns (headers, not_modified). `headers` should be attached to the full
+    response; when `not_modified` is True the caller should return
+    not_modified_response(headers) without running its expensive queries.
+    """
+    etag = make_etag(version)
+    # The body depends on Accept (JSON or NDJSON), so caches must key on it too.
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept"}
+
+    last_modified = _to_datetime(last_modified)
+    if last_modified is not None:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        last_modified = last_modified.replace(microsecond=0)
+        headers["Last-Modified"] = last_modified.strftime("%a, %d %b %Y %H:%M:%S GMT")
+
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2).
+    if request.if_none_match:
+        return headers, request.if_none_match.contains_weak(etag.strip('"'))
+    if last_modified is not None and request.if_modified_since is not None:
+        return headers, last_modified <= request.if_modified_since
+    return headers, False
+
+
+def evaluate_table_conditional(*tables):
+    """evaluate_conditional for list endpoints, versioned by the tables the list reads."""
+    versions = table_versions(*tables)
+    last_modified = latest_timestamp(*(v[2] for v in versions), *(v[3] for v in versions))
+    return evaluate_conditional(versions, last_modified)
+
+
+def resource_etag(version):
+    """The ETag a plain GET of the request's URL (no query string) carries for `version`."""
+    return make_etag(version, f"{request.path}?")
+
+
+def has_if_match():
+    return "If-Match" in request.headers
+
+
+def check_if_match(version):
+    """
+    Evaluates If-Match for an update against the resource's current ETag.
+    Returns None when the precondition holds, else the 412 response to send.
+    """
+    etag = resource_etag(version)
+    if request.if_match.star_tag or request.if_match.contains(etag.strip('"')):
+        return None
+    return precondition_failed_response(version)
+
+
+def precondition_failed_response(version):
+    """412 carrying the current ETag, so the client can refetch and retry."""
+    return error_response(
+        error_code="precondition_failed",
+        message=ERROR_MESSAGES["conflict"]["version_mismatch"],
+        status=412,
+        headers={"ETag": resource_etag(version)},
+    )
+
+
+def not_modified_response(headers):
+    """An empty 304 response carrying the validators."""
+    return current_app.response_class(status=304, headers=headers), 304
@@ -0,0 +1,92 @@
+from marshmallow import EXCLUDE
+
+from app.database.db_manager import DBManager
+from app.database.models.customer import Customer
+from app.schemas.customer_schema import CustomerSchema
+from app.utils.bulk_import import BulkImporter, ImportBatchError
+
+# What to do with a record whose email belongs to an existing customer.
+EXISTING_POLICIES = ('skip', 'update', 'reject')
+# ... and with one whose email belongs to a soft-deleted customer.
+DELETED_POLICIES = ('skip', 'restore', 'reject')
+
+
+class CustomerImporter(BulkImporter):
+    """
+    Bulk customer import (see BulkImporter), de-duplicated by email. Each chunk:
+
+      1. validates every record (CustomerSchema) and rejects emails already
+         seen earlier in the same input,
+      2. looks all of the chunk's emails up with one IN (...) query, soft-deleted
+         customers included,
+      3. applies the conflict policies: `on_existing` (skip, update or reject)
+         for live customers, `on_deleted` (skip, restore or reject) for deleted
+         ones, where restore also applies the record's values,
+      4. inserts new customers and updates/restores existing ones with one
+         multi-row statement each, re-indexes their name tokens and writes the
+         checkpoint, in a single transaction.
+
+    Counts are kept per outcome: created, updated, restored, skipped, rejected.
+    """
+
+    kind = 'customers'
+    schema = CustomerSchema(unknown=EXCLUDE)
+    reference_field = 'email'
+    chunk_size_setting = 'customer_chunk_size'
+
+    def __init__(self, batch, chunk_size=None):
+        super().__init__(batch, chunk_size)
+        # First record number of each email in this run. Emails of chunks committed
+        # before a resume are found in the database instead.
+        self._seen = {}
+
+    @classmethod
+    def validate_options(cls, options):
+        on_existing = options.get('on_existing') or 'skip'
+        on_deleted = options.get('on_deleted') or 'skip'
+        if on_existing not in EXISTING_POLICIES:
+            raise ImportBatchError('invalid_option', f"on_existing must be one of: {', '.join(EXISTING_POLICIES)}")
+        if on_deleted not in DELETED_POLICIES:
+            raise ImportBatchError('invalid_option', f"on_deleted must be one of: {', '.join(DELETED_POLICIES)}")
+        return {'on_existing': on_existing, 'on_deleted': on_deleted}
+
+    def _import_chunk(self, chunk):
+        valid, errors = self._validate(chunk)
+
+        fresh = []
+        for number, reference, data in valid:
+            email = data['email'].lower()
+            if email in self._seen:
+                errors.append((number, reference, {'email': [f"Duplicate of record {self._seen[email]} in this file."]}))
+                continue
+            self._seen[email] = number
+            fresh.append((number, reference, email, data))
+
+        existing = Customer.find_by_emails([email for _, _, email, _ in fresh], include_deleted=True)
+        creates, updates, restores, skipped = [], [], [], 0
+        for number, reference, email, data in fresh:
+            customer = existing.get(email)
+            if customer is None:
+                creates.append(data)
+                continue
+            deleted = customer.deleted_at is not None
+            policy = self.options['on_deleted'] if deleted else self.options['on_existing']
+            if policy == 'skip':
+                skipped += 1
+            elif policy == 'reject':
+                message = "A deleted customer has this email." if deleted else "A customer with this email already exists."
+                errors.append((number, reference, {'email': [message]}))
+            else:
+                (restores if deleted else updates).append({**data, 'id': customer.id})
+
+        with DBManager.transaction():
+            created_ids = Customer.bulk_create(creates)
+            Customer.bulk_update(updates)
+            Customer.bulk_update(restores, restore=True)
+            names = {created_ids[row['email'].lower()]: row['name'] for row in creates}
+            names.update((row['id'], row['name']) for row in updates + restores)
+            Customer.index_name_tokens_bulk(names)
+            self._checkpoint(
+                chunk, len(creates) + len(updates) + len(restores), errors,
+                created=len(creates), updated=len(updates), restored=len(restores), skipped=skipped
+            )
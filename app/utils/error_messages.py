@@ -7,17 +7,35 @@ ERROR_MESSAGES = {
         "missing_credentials": "Username or email and password are required.",
         "missing_fields": "Missing required fields.",
         "invalid_input": "Invalid input provided. Please check the data types and formats.",
+        "invalid_fields": "One or more requested fields are not available on this resource.",
+        "invalid_include": "One or more requested includes are not available on this resource.",
+        "invalid_filter": "One or more filters have an invalid value.",
+        "invalid_import_format": "Unsupported import format. Use 'csv' or 'ndjson'.",
+        "invalid_import_option": "One or more import options are invalid.",
+        "invalid_export": "One or more export parameters are invalid.",
+        "invalid_sync": "One or more sync parameters are invalid.",
+        "invalid_report": "One or more report parameters are invalid.",
+        "invalid_batch": "The batch request is invalid.",
+        "invalid_idempotency_key": "The Idempotency-Key header must be 1 to 255 characters long.",
     },
     "not_found": {
         "customer": "Customer not found.",
         "product": "Product not found.",
         "invoice": "Invoice not found.",
         "payment": "Payment not found.",
+        "import_batch": "Import batch not found.",
+        "job": "Job not found.",
         "user": "The requested user could not be found."
     },
     "server_error": {
         "create_customer": "An unexpected error occurred while creating the customer.",
         "fetch_customer": "An unexpected error occurred while fetching customer(s).",
+        "export": "An unexpected error occurred while starting the export.",
+        "sync": "An unexpected error occurred while fetching changes.",
+        "report": "An unexpected error occurred while building the report.",
+        "statement": "An unexpected error occurred while building the statement.",
+        "batch": "An unexpected error occurred while running the batch.",
+        "fetch_job": "An unexpected error occurred while fetching the job.",
         "update_customer": "An unexpected error occurred while updating the customer.",
         "delete_customer": "An unexpected error occurred while deleting the customer.",
         
@@ -34,6 +52,8 @@ ERROR_MESSAGES = {
         "create_payment": "An unexpected error occurred while creating the payment.",
         "fetch_payment": "An unexpected error occurred while fetching payment(s).",
 
+        "import": "The import stopped on an unexpected error. Re-send the same input with this batch_id to resume.",
+
         "create_user": "Could not create user.",
         "fetch_user": "An unexpected error occurred while fetching user(s).",
         "update_user": "An unexpected error occurred while updating the user.",
@@ -47,6 +67,15 @@ ERROR_MESSAGES = {
         "invalid_credentials": "Invalid credentials. Please check your username or email and password."
     },
     "conflict": {
-        "user_exists": "A user with this email address already exists."
+        "user_exists": "A user with this email address already exists.",
+        "import_finished": "This import batch has already completed.",
+        "import_mismatch": "This import batch belongs to a different import.",
+        "idempotency_in_progress": "A request with this Idempotency-Key is still being processed. Retry shortly.",
+        "idempotency_mismatch": "This Idempotency-Key was already used for a different request.",
+        "version_mismatch": "The resource was modified since it was fetched. Reload it and retry with the new ETag.",
+        "job_failed": "The job failed and will not be retried. See details for the last error."
+    },
+    "service_unavailable": {
+        "password_hasher_busy": "The server is busy processing other sign-ins. Please retry shortly."
     }
 }
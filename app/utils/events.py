@@ -0,0 +1,156 @@
+import itertools
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+from app.database.config import Config
+from app.database.db_manager import DBManager
+from app.database.models.outbox_event import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+def _make_event(event_id, event_type, data=None):
+    return {
+        'id': event_id,
+        'type': event_type,
+        'data': data or {},
+        'at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+class Subscription:
+    """
+    One subscriber's queue of pending events. A subscriber that falls more than
+    `max_pending` events behind gets its queue replaced by a single 'resync'
+    event, telling the client to refetch instead of replaying a long backlog.
+    """
+
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self._events = deque()
+        self._condition = threading.Condition()
+
+    def put(self, event):
+        with self._condition:
+            if len(self._events) >= self.max_pending:
+                self._events.clear()
+                event = _make_event(event['id'], 'resync')
+            self._events.append(event)
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """Next event, waiting up to `timeout` seconds for one; None if none arrived."""
+        with self._condition:
+            if not self._events:
+                self._condition.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+
+class EventBus:
+    """
+    In-process publish/subscribe bus for change events. publish() fans each event
+    out to every subscription's queue and to the registered listeners; nothing
+    blocks on slow subscribers. The last `history` events are kept, so a client
+    reconnecting with Last-Event-ID can catch up on what it missed.
+
+    Events only reach subscribers of the same worker process.
+    """
+
+    def __init__(self, max_pending=100, history=256):
+        self.max_pending = max_pending
+        self._subscriptions = set()
+        self._listeners = []
+        self._history = deque(maxlen=history)
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(max_pending=config["max_pending"], history=config["history"])
+
+    def publish(self, event_type, data=None):
+        with self._lock:
+            event = _make_event(next(self._ids), event_type, data)
+            self._last_id = event['id']
+            self._history.append(event)
+            subscriptions = list(self._subscriptions)
+            listeners = list(self._listeners)
+        for subscription in subscriptions:
+            subscription.put(event)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("Event listener failed for %s", event_type)
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """
+        Returns a new Subscription. With `last_event_id`, the events published after
+        it are queued first, or a 'resync' event when they are no longer in history.
+        """
+        subscription = Subscription(self.max_pending)
+        with self._lock:
+            if last_event_id is not None and last_event_id != self._last_id:
+                history = self._history
+                if history and history[0]['id'] <= last_event_id + 1 and last_event_id < self._last_id:
+                    for event in history:
+                        if event['id'] > last_event_id:
+                            subscription.put(event)
+                else:
+                    # Too far behind, or an id from another process (or before a restart).
+                    subscription.put(_make_event(self._last_id, 'resync'))
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    def add_listener(self, listener):
+        """Calls `listener(event)` for every event published, in the publisher's thread."""
+        with self._lock:
+            self._listeners.append(listener)
+
+
+event_bus = EventBus.from_config(Config.EVENTS)
+
+
+def publish(event_type, **data):
+    """
+    Publishes a change event from a model write path. Inside DBManager.transaction()
+    the event waits for the commit and is dropped on rollback, so subscribers never
+    hear about writes that didn't happen.
+    """
+    DBManager.after_commit(lambda: event_bus.publish(event_type, data))
+
+
+def record_events(aggregate_type, event_type, events, publish_each=True):
+    """
+    Records domain events of one type for many aggregates, given as
+    (aggregate_id, data) pairs: appended to the outbox inside the current
+    transaction (when OUTBOX_ENABLED), and published on the event bus after
+    commit. Call it right after the write it describes, within the same
+    DBManager.transaction(). Bulk paths pass publish_each=False and publish one
+    summary event instead, so stream subscribers aren't flooded.
+    """
+    events = list(events)
+    if not events:
+        return
+    if Config.OUTBOX["enabled"]:
+        OutboxEvent.append_many([(aggregate_type, aggregate_id, event_type, data) for aggregate_id, data in events])
+    if publish_each:
+        for aggregate_id, data in events:
+            publish(event_type, id=aggregate_id, **data)
+
+
+def record_event(aggregate_type, aggregate_id, event_type, **data):
+    """record_events() for a single aggregate."""
+    record_events(aggregate_type, event_type, [(aggregate_id, data)])
@@ -0,0 +1,134 @@
+import csv
+import io
+import zlib
+from datetime import date, datetime, time, timezone
+
+from flask import current_app, request, stream_with_context
+
+from app.database.config import Config
+from app.utils import serializer
+from app.utils.response import NDJSON_MIMETYPE, STREAM_CHUNK_ROWS, _as_bytes
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': NDJSON_MIMETYPE,
+}
+
+
+class InvalidExportError(ValueError):
+    """Raised for an unknown ?format= or an unparsable ?updated_since=."""
+
+    def __init__(self, errors):
+        super().__init__("Invalid export parameters")
+        self.errors = errors
+
+    def to_details(self):
+        return self.errors
+
+
+def get_export_params():
+    """
+    Parses ?format=csv|ndjson (default csv) and ?updated_since=<ISO date or datetime>.
+    Returns (format, updated_since); raises InvalidExportError.
+    """
+    errors = {}
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        errors['format'] = f"Expected one of: {', '.join(EXPORT_FORMATS)}."
+
+    updated_since = None
+    value = request.args.get('updated_since')
+    if value:
+        try:
+            updated_since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            errors['updated_since'] = 'Expected an ISO 8601 date or datetime.'
+        else:
+            # Stored timestamps are naive; aware input is normalized to UTC.
+            if updated_since.tzinfo is not None:
+                updated_since = updated_since.astimezone(timezone.utc).replace(tzinfo=None)
+
+    if errors:
+        raise InvalidExportError(errors)
+    return export_format, updated_since
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return value
+
+
+def _encode_csv(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        # Hand over what the writer produced and reuse the buffer.
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(fields)
+    yield flush()
+    for row in rows:
+        writer.writerow([_csv_value(getattr(row, field, None)) for field in fields])
+        yield flush()
+
+
+def _encode_ndjson(rows, fields):
+    for row in rows:
+        yield _as_bytes(serializer.dumps({field: getattr(row, field, None) for field in fields})) + b"\n"
+
+
+def _accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+
+def export_response(rows, fields, export_format, name):
+    """
+    Streams model instances as a CSV or NDJSON download with the given columns.
+
+    Rows are encoded one at a time and written in chunks of STREAM_CHUNK_ROWS;
+    when the client accepts gzip, each chunk goes through one streaming
+    zlib.compressobj, so memory stays constant however large the export is.
+    """
+    encode = _encode_csv if export_format == 'csv' else _encode_ndjson
+    gzip = _accepts_gzip()
+
+    def generate():
+        compressor = zlib.compressobj(Config.EXPORT['gzip_level'], zlib.DEFLATED, 31) if gzip else None
+        buffer = []
+        for piece in encode(rows, fields):
+            buffer.append(piece)
+            if len(buffer) >= STREAM_CHUNK_ROWS:
+                chunk = b"".join(buffer)
+                buffer = []
+                chunk = compressor.compress(chunk) if compressor else chunk
+                if chunk:
+                    yield chunk
+        chunk = b"".join(buffer)
+        if compressor:
+            chunk = compressor.compress(chunk) + compressor.flush()
+        if chunk:
+            yield chunk
+
+    filename = f"{name}-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.{export_format}"
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Vary': 'Accept-Encoding',
+    }
+    if gzip:
+        headers['Content-Encoding'] = 'gzip'
+    return (
+        current_app.response_class(
+            stream_with_context(generate()),
+            status=200,
+            mimetype=EXPORT_FORMATS[export_format],
+            headers=headers,
+        ),
+        200,
+    )
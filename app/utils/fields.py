@@ -0,0 +1,33 @@
+from flask import request
+
+
+class InvalidFieldsError(ValueError):
+    """Raised when ?fields= names a field that isn't in the resource's whitelist."""
+
+    def __init__(self, invalid, allowed):
+        super().__init__(f"Unknown fields: {', '.join(invalid)}")
+        self.invalid = invalid
+        self.allowed = list(allowed)
+
+    def to_details(self):
+        return {'fields': self.invalid, 'allowed': self.allowed}
+
+
+def get_fields(allowed):
+    """
+    Parses the sparse fieldset from the ?fields= query parameter.
+
+    Returns None when the parameter is absent (meaning "all fields"), otherwise
+    the requested field names in order, without duplicates, always starting
+    with 'id'. Raises InvalidFieldsError for names not in `allowed`.
+    """
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+
+    requested = [name.strip() for name in raw.split(',') if name.strip()]
+    invalid = [name for name in requested if name not in allowed]
+    if invalid:
+        raise InvalidFieldsError(invalid, allowed)
+
+    return list(dict.fromkeys(['id'] + requested))
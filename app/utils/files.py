@@ -0,0 +1,25 @@
+import os
+import stat
+
+
+class InsecureDirectoryError(RuntimeError):
+    """Raised when a directory meant for private app data is shared or not ours."""
+
+
+def ensure_private_dir(path):
+    """
+    Creates `path` (and missing parents) with mode 0700, or checks that an existing
+    directory is private: a real directory (not a symlink), owned by this process's
+    user and closed to group and others. Files kept there (cache entries, spooled
+    uploads) can then neither be read nor planted by other local users. Returns
+    the path; raises InsecureDirectoryError instead of using an unsafe directory.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise InsecureDirectoryError(f"{path} is not a directory.")
+    if info.st_uid != os.getuid():
+        raise InsecureDirectoryError(f"{path} is owned by another user.")
+    if info.st_mode & 0o077:
+        raise InsecureDirectoryError(f"{path} is accessible to other users; chmod 700 it.")
+    return path
@@ -0,0 +1,93 @@
+import hashlib
+from functools import wraps
+
+from flask import current_app, request
+from flask_jwt_extended import get_jwt_identity
+
+from app.database.config import Config
+from app.database.db_manager import DBManager
+from app.database.models.idempotency_key import IdempotencyKey, IdempotencyKeyBusy
+from app.utils.error_messages import ERROR_MESSAGES
+from app.utils.response import error_response
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class _Discard(Exception):
+    """Rolls the request's transaction back while still returning its response."""
+
+    def __init__(self, response):
+        super().__init__(response.status)
+        self.response = response
+
+
+def request_fingerprint():
+    digest = hashlib.sha256()
+    for part in (request.method, request.path, request.query_string.decode('latin-1')):
+        digest.update(part.encode('utf-8') + b'\0')
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _replay(stored):
+    return current_app.response_class(
+        stored.response_body,
+        status=stored.response_status,
+        mimetype=stored.response_mimetype,
+        headers={'Idempotent-Replayed': 'true'},
+    )
+
+
+def idempotent(view):
+    """
+    Makes a POST endpoint safe to retry with an Idempotency-Key header (place it
+    after @jwt_required()). Without the header the view runs as usual.
+
+    With it, the view runs inside one DBManager.transaction() that also records
+    the key, the request fingerprint and, on success, the response. Retries of a
+    completed request get the stored response back (with Idempotent-Replayed:
+    true) without running the view; a concurrent retry waits for the first
+    request to finish, or gets 409 after IDEMPOTENCY_LOCK_WAIT seconds. Reusing a
+    key for a different request is a 422. Non-2xx responses roll back every
+    write, the key included, so the request can be retried as is.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return error_response(error_code='validation_error', message=ERROR_MESSAGES["validation"]["invalid_idempotency_key"], status=400)
+
+        user_id = get_jwt_identity()
+        fingerprint = request_fingerprint()
+        try:
+            with DBManager.transaction():
+                key_id = IdempotencyKey.claim(
+                    user_id, key, request.method, request.path, fingerprint,
+                    lock_wait_seconds=Config.IDEMPOTENCY['lock_wait']
+                )
+                if key_id is not None:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if not 200 <= response.status_code < 300:
+                        raise _Discard(response)
+                    IdempotencyKey.complete(key_id, response.status_code, response.get_data(as_text=True), response.mimetype)
+                    return response
+        except _Discard as discarded:
+            return discarded.response
+        except IdempotencyKeyBusy:
+            return error_response(error_code='conflict', message=ERROR_MESSAGES["conflict"]["idempotency_in_progress"],
+                                  status=409, headers={'Retry-After': '1'})
+
+        # A committed request already used this key.
+        stored = IdempotencyKey.find(user_id, key)
+        if stored is None:
+            # Purged between the claim and the lookup; let the client retry.
+            return error_response(error_code='conflict', message=ERROR_MESSAGES["conflict"]["idempotency_in_progress"],
+                                  status=409, headers={'Retry-After': '1'})
+        if stored.fingerprint != fingerprint:
+            return error_response(error_code='idempotency_mismatch', message=ERROR_MESSAGES["conflict"]["idempotency_mismatch"], status=422)
+        return _replay(stored)
+    return wrapper
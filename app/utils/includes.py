@@ -0,0 +1,96 @@
+from itertools import islice
+
+from flask import request
+
+# Parent rows handled per round of batched relation queries. Non-streamed pages
+# are at most MAX_PER_PAGE rows, so they always load in a single round.
+INCLUDE_BATCH_SIZE = 200
+
+# Most rows a to-many relation embeds per parent (the newest ones), so a page of
+# parents can't pull in an unbounded number of related rows.
+MAX_INCLUDED_PER_PARENT = 20
+
+
+class InvalidIncludeError(ValueError):
+    """Raised when ?include= names a relation the resource doesn't offer."""
+
+    def __init__(self, invalid, allowed):
+        super().__init__(f"Unknown includes: {', '.join(invalid)}")
+        self.invalid = invalid
+        self.allowed = list(allowed)
+
+    def to_details(self):
+        return {'include': self.invalid, 'allowed': self.allowed}
+
+
+class Relation:
+    """
+    A related entity that can be embedded in list results.
+
+    `key` picks the id to look up from a parent model, `load` takes a list of those
+    ids and returns {id: related} with a single query, and `many` says whether the
+    related value is a list of models or one model. `field` is the parent field
+    (in ?fields= terms) that `key` reads, so it can be added to sparse fieldsets.
+    """
+
+    def __init__(self, key, load, many=False, field='id'):
+        self.key = key
+        self.load = load
+        self.many = many
+        self.field = field
+
+    def serialize(self, value):
+        if self.many:
+            return [item.to_dict() for item in value or ()]
+        return value.to_dict() if value is not None else None
+
+
+def get_includes(relations):
+    """
+    Parses ?include=a,b into a list of relation names, in order and without
+    duplicates. Returns [] when absent; raises InvalidIncludeError for unknown names.
+    """
+    raw = request.args.get('include')
+    if not raw:
+        return []
+    requested = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    invalid = [name for name in requested if name not in relations]
+    if invalid:
+        raise InvalidIncludeError(invalid, relations)
+    return requested
+
+
+def include_fields(fields, includes, relations):
+    """Adds the parent fields the requested relations are keyed on to a sparse fieldset."""
+    if not fields:
+        return fields
+    return list(dict.fromkeys(fields + [relations[name].field for name in includes]))
+
+
+def expand_includes(items, serialize, includes, relations, batch_size=INCLUDE_BATCH_SIZE):
+    """
+    Serializes parent models and embeds the requested relations, DataLoader style:
+    parents are taken `batch_size` at a time, and each relation is loaded for the
+    whole batch with one IN (...) query rather than one query per parent.
+
+    Works lazily on generators, so it can sit between a streamed list query and
+    stream_response.
+    """
+    items = iter(items)
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            return
+        loaded = {}
+        for name in includes:
+            relation = relations[name]
+            ids = list(dict.fromkeys(
+                key for key in (relation.key(item) for item in batch) if key is not None
+            ))
+            loaded[name] = relation.load(ids) if ids else {}
+        for item in batch:
+            data = serialize(item)
+            for name in includes:
+                relation = relations[name]
+                data[name] = relation.serialize(loaded[name].get(relation.key(item)))
+            yield data
@@ -0,0 +1,183 @@
+from collections import defaultdict, namedtuple
+from datetime import datetime, time
+from decimal import Decimal
+
+from app.database.db_manager import DBManager
+from app.database.models.customer import Customer
+from app.database.models.invoice import Invoice
+from app.database.models.invoice_item_model import InvoiceItem
+from app.database.models.payment import Payment
+from app.database.models.product import Product
+from app.schemas.invoice_schema import invoice_import_schema
+from app.utils.bulk_import import BulkImporter, csv_rows, pick, read_ndjson
+from app.utils.utils import allocate_invoice_sequences, format_invoice_number
+
+# CSV input is one row per line item. Consecutive rows with the same external_id
+# form one invoice, and the invoice and payment columns are read from its first row.
+CSV_INVOICE_COLUMNS = ('external_id', 'customer_id', 'customer_email', 'invoice_date', 'due_date',
+                       'status', 'discount_amount', 'tax_percent')
+CSV_ITEM_COLUMNS = ('product_id', 'product_code', 'quantity', 'price')
+CSV_PAYMENT_COLUMNS = {'payment_amount': 'amount', 'payment_method': 'method',
+                       'payment_reference': 'reference_no', 'payment_date': 'payment_date'}
+
+
+# A validated record with everything resolved, ready to be written.
+_PreparedInvoice = namedtuple('_PreparedInvoice', ['number', 'invoice', 'items', 'payment', 'issued_at'])
+
+
+def read_invoice_csv(lines):
+    """Yields (record_number, record) for each invoice of CSV input, in the NDJSON record shape."""
+    number, record, key = 0, None, None
+    for row in csv_rows(lines):
+        reference = row.get('external_id')
+        if record is not None and reference and reference == key:
+            record['items'].append(pick(row, CSV_ITEM_COLUMNS))
+            continue
+        if record is not None:
+            yield number, record
+        number += 1
+        record = pick(row, CSV_INVOICE_COLUMNS)
+        record['items'] = [pick(row, CSV_ITEM_COLUMNS)]
+        payment = {field: row[column] for column, field in CSV_PAYMENT_COLUMNS.items() if column in row}
+        if payment:
+            record['payment'] = payment
+        key = reference
+    if record is not None:
+        yield number, record
+
+
+def _status_for_payment(payment, total_amount):
+    # Same rules as POST /invoices.
+    if payment and payment['amount'] >= total_amount:
+        return 'Paid'
+    if payment and payment['amount'] > 0:
+        return 'Partially Paid'
+    return 'Pending'
+
+
+class InvoiceImporter(BulkImporter):
+    """
+    Bulk invoice import (see BulkImporter). Each chunk:
+
+      1. validates every record (InvoiceImportSchema),
+      2. resolves its customers and products with one IN (...) query each,
+      3. reserves one block of invoice sequence numbers for the whole chunk,
+      4. writes invoices, items, payments and stock changes with multi-row
+         statements, plus the checkpoint, in a single transaction.
+
+    The `skip_stock` option leaves product stock untouched (historical data).
+    """
+
+    kind = 'invoices'
+    readers = {'csv': read_invoice_csv, 'ndjson': read_ndjson}
+    schema = invoice_import_schema
+    reference_field = 'external_id'
+
+    @classmethod
+    def validate_options(cls, options):
+        return {'skip_stock': bool(options.get('skip_stock'))}
+
+    def _import_chunk(self, chunk):
+        valid, errors = self._validate(chunk)
+        prepared = self._prepare(valid, errors)
+        if prepared:
+            first_seq = allocate_invoice_sequences(len(prepared))
+            for offset, entry in enumerate(prepared):
+                entry.invoice['invoice_number'] = format_invoice_number(
+                    entry.invoice['customer_id'], first_seq + offset, entry.issued_at
+                )
+
+        with DBManager.transaction():
+            invoice_ids = Invoice.bulk_create([entry.invoice for entry in prepared])
+            items, payments, stock_changes = [], [], defaultdict(int)
+            for entry in prepared:
+                invoice_id = invoice_ids[entry.invoice['invoice_number']]
+                for item in entry.items:
+                    items.append({**item, 'invoice_id': invoice_id})
+                    stock_changes[item['product_id']] -= item['quantity']
+                if entry.payment:
+                    payments.append({**entry.payment, 'invoice_id': invoice_id})
+            InvoiceItem.bulk_create(items)
+            Payment.bulk_record(payments)
+            if not self.options.get('skip_stock'):
+                Product.apply_stock_changes(stock_changes)
+            self._checkpoint(chunk, len(prepared), errors, created=len(prepared))
+
+    def _prepare(self, valid, errors):
+        """Resolves customers and products for the chunk and computes the invoice totals."""
+        customer_ids = {data['customer_id'] for _, _, data in valid if data.get('customer_id')}
+        emails = {data['customer_email'] for _, _, data in valid
+                  if not data.get('customer_id') and data.get('customer_email')}
+        product_ids, product_codes = set(), set()
+        for _, _, data in valid:
+            for item in data['items']:
+                if item.get('product_id'):
+                    product_ids.add(item['product_id'])
+                else:
+                    product_codes.add(item['product_code'])
+
+        customers = Customer.find_by_ids(list(customer_ids))
+        customers_by_email = Customer.find_by_emails(list(emails))
+        products = Product.find_by_ids(list(product_ids))
+        products_by_code = Product.find_by_codes(list(product_codes))
+
+        prepared = []
+        for number, reference, data in valid:
+            record_errors = {}
+            if data.get('customer_id'):
+                customer = customers.get(data['customer_id'])
+            else:
+                customer = customers_by_email.get(data['customer_email'].lower())
+            if customer is None:
+                record_errors['customer_id'] = ["Customer not found."]
+
+            items = []
+            for index, item in enumerate(data['items']):
+                if item.get('product_id'):
+                    product = products.get(item['product_id'])
+                else:
+                    product = products_by_code.get(item['product_code'])
+                if product is None:
+                    record_errors.setdefault('items', {})[index] = {'product_id': ["Product not found."]}
+                    continue
+                price = item.get('price')
+                items.append({
+                    'product_id': product.id,
+                    'quantity': item['quantity'],
+                    'price': product.price if price is None else price,
+                })
+            if record_errors:
+                errors.append((number, reference, record_errors))
+                continue
+
+            subtotal_amount = sum((item['price'] * item['quantity'] for item in items), Decimal('0.00'))
+            discount_amount = data.get('discount_amount') or Decimal('0.00')
+            tax_percent = data.get('tax_percent') or Decimal('0.00')
+            tax_amount = (subtotal_amount - discount_amount) * (tax_percent / Decimal('100.00'))
+            total_amount = subtotal_amount - discount_amount + tax_amount
+
+            invoice_date = data.get('invoice_date')
+            issued_at = datetime.combine(invoice_date, time()) if invoice_date else None
+            payment = data.get('payment')
+            if payment:
+                payment = {**payment, 'payment_date': payment.get('payment_date') or invoice_date}
+
+            prepared.append(_PreparedInvoice(
+                number,
+                {
+                    'customer_id': customer.id,
+                    'user_id': self.batch.user_id,
+                    'due_date': data.get('due_date'),
+                    'subtotal_amount': subtotal_amount,
+                    'discount_amount': discount_amount,
+                    'tax_percent': tax_percent,
+                    'tax_amount': tax_amount,
+                    'total_amount': total_amount,
+                    'status': data.get('status') or _status_for_payment(payment, total_amount),
+                    'created_at': issued_at,
+                },
+                items,
+                payment,
+                issued_at,
+            ))
+        return prepared
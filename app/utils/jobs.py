@@ -0,0 +1,81 @@
+import logging
+
+from app.database.config import Config
+from app.database.db_manager import DBManager
+from app.database.models.job import Job
+from app.database.overdue_sweeper import overdue_sweeper
+
+logger = logging.getLogger(__name__)
+
+# kind -> handler(context), filled by @job_handler.
+JOB_HANDLERS = {}
+
+# Called after a job is enqueued (and committed), so a local pool can claim it
+# without waiting for its next poll.
+_enqueue_listeners = []
+
+
+class FatalJobError(Exception):
+    """Raised by a handler for failures a retry can't fix; the job fails without further attempts."""
+
+
+def job_handler(kind):
+    """
+    Registers `fn(context)` as the handler of `kind` jobs. The handler gets a
+    JobContext, and its return value (anything JSON-serializable) is stored as
+    the job's result. Any exception fails the attempt, which is retried with
+    backoff until the job's max_attempts; raise FatalJobError to fail it at once.
+    Handlers may run more than once per job, so they must be safe to repeat.
+    """
+    def decorator(fn):
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+def add_enqueue_listener(callback):
+    _enqueue_listeners.append(callback)
+
+
+class JobContext:
+    """What a running handler sees: its job's payload, the attempt, and progress reporting."""
+
+    def __init__(self, job):
+        self.job = job
+        self.payload = job.payload
+
+    @property
+    def last_attempt(self):
+        return self.job.attempts >= self.job.max_attempts
+
+    def progress(self, done, total=None, message=None):
+        """Records how far the job got; also counts as a heartbeat."""
+        Job.report_progress(self.job.id, self.job.attempts, done, total, message)
+
+
+def enqueue(kind, payload=None, user_id=None, max_attempts=None):
+    """
+    Queues a `kind` job and returns it. Inside DBManager.transaction() the job is
+    only claimable once the transaction commits, together with the writes it
+    belongs to.
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"No handler registered for job kind '{kind}'.")
+    job = Job.enqueue(kind, payload, user_id=user_id, max_attempts=max_attempts or Config.JOBS['max_attempts'])
+    for listener in _enqueue_listeners:
+        DBManager.after_commit(listener)
+    return job
+
+
+def retry_delay(attempt, backoff, backoff_max):
+    """Seconds to wait before retrying after failed attempt number `attempt`: exponential, capped."""
+    return min(backoff_max, backoff * 2 ** (attempt - 1))
+
+
+@job_handler('overdue_sweep')
+def run_overdue_sweep(context):
+    """Runs the overdue sweep now. Retried later if another worker is already sweeping."""
+    flipped = overdue_sweeper.run_once()
+    if flipped is None:
+        raise RuntimeError("Another overdue sweep is running.")
+    return {'updated': flipped}
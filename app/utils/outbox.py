@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import threading
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+# In-process subscribers, called by LocalSink.
+_subscribers = []
+_subscribers_lock = threading.Lock()
+
+
+class SinkError(Exception):
+    """Raised by a sink that didn't accept a batch; the batch is retried later."""
+
+
+def subscribe(callback, event_types=None):
+    """
+    Calls `callback(message)` for every outbox event delivered by this process's
+    dispatcher (optionally only the given event types). Delivery is at least
+    once: a callback that raises fails the batch, and every event of it, already
+    seen or not, is delivered again. De-duplicate on message['id'].
+    """
+    with _subscribers_lock:
+        _subscribers.append((callback, frozenset(event_types) if event_types else None))
+
+
+def _encode(message):
+    return json.dumps(message, default=str, separators=(",", ":"))
+
+
+class FileSink:
+    """Appends each event as one NDJSON line to `path`, synced to disk before the batch counts as delivered."""
+    name = 'file'
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+
+    def deliver(self, messages):
+        with open(self.path, 'a', encoding='utf-8') as out:
+            out.write("".join(_encode(message) + "\n" for message in messages))
+            out.flush()
+            os.fsync(out.fileno())
+
+
+class HttpSink:
+    """POSTs each batch as {"events": [...]} to `url`; any 2xx response accepts it."""
+    name = 'http'
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, messages):
+        body = ('{"events":[' + ",".join(_encode(message) for message in messages) + ']}').encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status = response.status
+        except OSError as e:
+            # URLError and HTTPError (non-2xx) included.
+            raise SinkError(f"POST {self.url} failed: {e}") from e
+        if not 200 <= status < 300:
+            raise SinkError(f"POST {self.url} answered {status}")
+
+
+class LocalSink:
+    """Hands each event, in order, to the in-process subscribers."""
+    name = 'local'
+
+    def deliver(self, messages):
+        with _subscribers_lock:
+            subscribers = list(_subscribers)
+        for message in messages:
+            for callback, event_types in subscribers:
+                if event_types is None or message['type'] in event_types:
+                    callback(message)
+
+
+def build_sinks(config):
+    """The sinks named in config["sinks"] (comma-separated: file, http, local)."""
+    sinks = []
+    for name in filter(None, (part.strip().lower() for part in (config["sinks"] or "").split(","))):
+        if name == 'file':
+            sinks.append(FileSink(config["file_path"]))
+        elif name == 'http':
+            if not config["http_url"]:
+                raise ValueError("The http outbox sink needs OUTBOX_HTTP_URL.")
+            sinks.append(HttpSink(config["http_url"], config["http_timeout"]))
+        elif name == 'local':
+            sinks.append(LocalSink())
+        else:
+            raise ValueError(f"Unknown outbox sink: {name}")
+    return sinks
@@ -1,11 +1,15 @@
 from flask import request
 
-def get_pagination():
+MAX_PER_PAGE = 100
+# Streamed list responses never hold a whole page in memory, so they may ask for more.
+MAX_STREAM_PER_PAGE = 10000
+
+def get_pagination(max_per_page=MAX_PER_PAGE):
     try:
         page = int(request.args.get("page", 1))
         per_page = int(request.args.get("per_page", 10))
     except ValueError:
         page, per_page = 1, 10
     page = max(page, 1)
-    per_page = max(min(per_page, 100), 1)
+    per_page = max(min(per_page, max_per_page), 1)
     return page, per_page
@@ -0,0 +1,158 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool is saturated and cannot accept more work."""
+
+
+def _hash_password(password, method):
+    """Worker entry point: hash a password with the given werkzeug method."""
+    return generate_password_hash(password, method=method)
+
+
+def _verify_password(password_hash, password):
+    """Worker entry point: verify a password against a stored hash."""
+    return check_password_hash(password_hash, password)
+
+
+def _noop():
+    """Worker entry point used to fork the pool up front."""
+
+
+class PasswordHasher:
+    """
+    Runs scrypt hashing and verification in a dedicated, bounded process pool.
+
+    scrypt is deliberately CPU and memory heavy. Running it inline ties up the
+    request thread for the whole computation, so a burst of sign-ins starves
+    every other endpoint. This class moves the work into worker processes and
+    caps the number of in-flight jobs; once the cap is reached new requests fail
+    fast with PasswordHasherBusy instead of queueing behind each other.
+
+    Workers are forked by start(), which create_app() calls before any other
+    thread exists: forking a multi-threaded process can leave a child stuck on
+    a lock some other thread held. If a worker dies (e.g. OOM-killed) the pool
+    is broken for good, so it is discarded and the call retried once on a
+    fresh one.
+
+    A worker count of 0 disables the pool and hashes inline (useful for
+    scripts and local development).
+    """
+
+    def __init__(self, n=2**15, r=8, p=1, workers=1, max_pending=4, timeout=10.0):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(max_pending, 1))
+
+    @classmethod
+    def from_env(cls):
+        """Builds a hasher from the PASSWORD_HASH_* and SCRYPT_* environment variables."""
+        workers = int(os.getenv("PASSWORD_HASH_WORKERS", max((os.cpu_count() or 2) // 2, 1)))
+        return cls(
+            n=int(os.getenv("SCRYPT_N", 2**15)),
+            r=int(os.getenv("SCRYPT_R", 8)),
+            p=int(os.getenv("SCRYPT_P", 1)),
+            workers=workers,
+            max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", max(workers, 1) * 4)),
+            timeout=float(os.getenv("PASSWORD_HASH_TIMEOUT", 10)),
+        )
+
+    @property
+    def method(self):
+        """The werkzeug method string for the configured scrypt cost, e.g. 'scrypt:32768:8:1'."""
+        return f"scrypt:{self.n}:{self.r}:{self.p}"
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    # Prefer fork so workers don't re-import the application entry point.
+                    context = None
+                    if "fork" in multiprocessing.get_all_start_methods():
+                        context = multiprocessing.get_context("fork")
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._executor
+
+    def start(self):
+        """Forks the worker processes now rather than on the first sign-in."""
+        if self.workers > 0:
+            # With the fork context, the first submit forks every worker before the
+            # pool starts its own management thread.
+            self._get_executor().submit(_noop)
+
+    def _discard_executor(self, executor):
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        try:
+            return self._submit(fn, *args)
+        except BrokenProcessPool:
+            # _submit dropped the broken pool; hashing is pure, so retry once on a new one.
+            return self._submit(fn, *args)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy("Password hashing queue is full.")
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._discard_executor(executor)
+            raise
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PasswordHasherBusy("Password hashing timed out.")
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise
+
+    def hash(self, password):
+        """Hashes a password with the configured scrypt parameters."""
+        return self._run(_hash_password, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Returns True if the password matches the stored hash."""
+        if not password_hash:
+            return False
+        return self._run(_verify_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the stored hash was produced with different parameters than the current ones."""
+        if not password_hash:
+            return False
+        return password_hash.split("$", 1)[0] != self.method
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Shared instance used by the models and routes.
+password_hasher = PasswordHasher.from_env()
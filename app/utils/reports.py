@@ -0,0 +1,159 @@
+import heapq
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import request
+
+from app.database.config import Config
+from app.database.models.invoice import Invoice
+from app.utils.conditional import table_versions
+
+# Customer statement output formats; json also streams NDJSON on Accept: application/x-ndjson.
+STATEMENT_FORMATS = ('json', 'csv', 'ndjson')
+
+# One statement line: an invoice (debit), a payment (credit), or the opening and
+# closing balance lines around them. `balance` is the running balance after it.
+StatementEntry = namedtuple('StatementEntry', [
+    'date', 'type', 'id', 'invoice_number', 'method', 'reference_no', 'debit', 'credit', 'balance',
+])
+
+# Aging buckets by days past due_date, in report order.
+AGING_BUCKETS = ('current', 'days_1_30', 'days_31_60', 'days_61_90', 'days_over_90')
+
+# Tables the aging report reads; their versions key its cached results.
+_AGING_TABLES = ('invoices', 'payments', 'customers')
+
+# Recent aging results: (as_of, customer_id, table versions) -> (rows, totals).
+_aging_cache = OrderedDict()
+_aging_cache_lock = threading.Lock()
+
+
+class InvalidReportError(ValueError):
+    """Raised for malformed report parameters (dates, ids, format)."""
+
+    def __init__(self, errors):
+        super().__init__("Invalid report parameters")
+        self.errors = errors
+
+    def to_details(self):
+        return self.errors
+
+
+def _parse_date(name, errors):
+    raw = request.args.get(name)
+    if not raw:
+        return None
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        errors[name] = ['Expected a date as YYYY-MM-DD.']
+        return None
+
+
+def get_aging_params():
+    """Reads ?as_of= (YYYY-MM-DD, default today) and ?customer_id=. Returns (as_of, customer_id)."""
+    errors = {}
+    as_of = _parse_date('as_of', errors) or date.today()
+
+    customer_id = None
+    raw_customer_id = request.args.get('customer_id')
+    if raw_customer_id:
+        try:
+            customer_id = int(raw_customer_id)
+            if customer_id < 1:
+                raise ValueError
+        except ValueError:
+            errors['customer_id'] = ['Expected a positive integer.']
+
+    if errors:
+        raise InvalidReportError(errors)
+    return as_of, customer_id
+
+
+def aging_totals(rows):
+    """Sums the per-customer aging rows into the report totals."""
+    totals = dict.fromkeys(AGING_BUCKETS + ('total_due',), Decimal('0.00'))
+    open_invoices = 0
+    for row in rows:
+        for key in totals:
+            totals[key] += row[key]
+        open_invoices += row['open_invoices']
+    totals['open_invoices'] = open_invoices
+    totals['customers'] = len(rows)
+    return totals
+
+
+def get_aging_report(as_of, customer_id=None):
+    """
+    The aging rows and their totals, computed once per version of the tables it
+    reads. The versions come from table_versions(), read from the database on
+    every call, so a write by any process (another worker, a job worker, a CLI
+    import) yields a new key, while paging through an unchanged report reuses
+    one grouped query.
+    """
+    key = (as_of, customer_id, tuple(table_versions(*_AGING_TABLES)))
+    with _aging_cache_lock:
+        cached = _aging_cache.get(key)
+        if cached is not None:
+            _aging_cache.move_to_end(key)
+            return cached
+    rows = Invoice.aging_by_customer(as_of, customer_id=customer_id)
+    result = (rows, aging_totals(rows))
+    with _aging_cache_lock:
+        _aging_cache[key] = result
+        while len(_aging_cache) > Config.REPORTS['aging_cache_entries']:
+            _aging_cache.popitem(last=False)
+    return result
+
+
+def get_statement_params():
+    """
+    Reads ?from= and ?to= (YYYY-MM-DD, inclusive, both optional) and
+    ?format=json|csv|ndjson (default json). Returns (start, end, format).
+    """
+    errors = {}
+    start = _parse_date('from', errors)
+    end = _parse_date('to', errors)
+    if start and end and start > end:
+        errors['to'] = ['Must not be before from.']
+    statement_format = request.args.get('format', 'json').lower()
+    if statement_format not in STATEMENT_FORMATS:
+        errors['format'] = [f"Expected one of: {', '.join(STATEMENT_FORMATS)}."]
+    if errors:
+        raise InvalidReportError(errors)
+    return start, end, statement_format
+
+
+def _debit_entry(row):
+    created_at = row['created_at']
+    return StatementEntry(
+        created_at.date() if isinstance(created_at, datetime) else created_at, 'invoice', row['id'],
+        row['invoice_number'], None, None, row['total_amount'], None, None,
+    )
+
+
+def _credit_entry(row):
+    return StatementEntry(
+        row['payment_date'], 'payment', row['id'], row['invoice_number'],
+        row['method'], row['reference_no'], None, row['amount'], None,
+    )
+
+
+def statement_entries(opening_balance, debits, credits, start=None, end=None):
+    """
+    Yields a customer statement: an opening balance line, then invoices and
+    payments merged in date order with the running balance, then a closing
+    balance line. `debits` and `credits` are date-ordered row iterators (two
+    server-side cursors); heapq.merge holds one row of each at a time, so memory
+    doesn't grow with the customer's history. Merge is stable, so on the same
+    day invoices come before the payments against them.
+    """
+    balance = opening_balance
+    yield StatementEntry(start, 'opening_balance', None, None, None, None, None, None, balance)
+    merged = heapq.merge(map(_debit_entry, debits), map(_credit_entry, credits), key=lambda entry: entry.date)
+    for entry in merged:
+        balance = balance + (entry.debit or 0) - (entry.credit or 0)
+        yield entry._replace(balance=balance)
+    yield StatementEntry(end or date.today(), 'closing_balance', None, None, None, None, None, None, balance)
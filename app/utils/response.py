@@ -1,51 +1,38 @@
-from flask import current_app
-import json
-from decimal import Decimal
-from datetime import datetime
+from flask import current_app, request, stream_with_context
+from app.utils import serializer
 
-class CustomJSONEncoder(json.JSONEncoder):
-    """
-    Custom JSON encoder to handle special data types like Decimal and datetime.
-    """
-    def default(self, o):
-        if isinstance(o, Decimal):
-            # If the number is a whole number, convert to int, otherwise convert to float
-            if o == o.to_integral_value():
-                return int(o)
-            else:
-                return float(o)
-        if isinstance(o, datetime):
-            # Convert datetime to ISO 8601 string format
-            return o.isoformat()
-        return super().default(o)
-
-def success_response(result=None, message="Success", meta=None, status=200):
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Number of serialized rows buffered before a chunk is written to the client.
+STREAM_CHUNK_ROWS = 200
+
+def success_response(result=None, message="Success", meta=None, status=200, headers=None):
     """
-    Creates a standardized success JSON response using the custom encoder.
+    Creates a standardized success JSON response using the configured serializer.
     """
     return (
         current_app.response_class(
-            response=json.dumps(
+            response=serializer.dumps(
                 {
                     "success": True,
                     "message": message,
                     "data": {"results": result or [], "meta": meta or {}},
-                },
-                cls=CustomJSONEncoder  # Use the custom encoder
+                }
             ),
             status=status,
             mimetype="application/json",
+            headers=headers,
         ),
         status,
     )
 
-def error_response(error_code="bad_request", message="An error occurred.", details=None, status=400):
+def error_response(error_code="bad_request", message="An error occurred.", details=None, status=400, headers=None):
     """
     Creates a standardized error JSON response.
     """
     return (
         current_app.response_class(
-            response=json.dumps(
+            response=serializer.dumps(
                 {
                     "success": False,
                     "error": {
@@ -57,6 +44,86 @@ def error_response(error_code="bad_request", message="An error occurred.", detai
             ),
             status=status,
             mimetype="application/json",
+            headers=headers,
+        ),
+        status,
+    )
+
+def _as_bytes(value):
+    return value if isinstance(value, bytes) else value.encode("utf-8")
+
+def wants_ndjson():
+    """True if the client asked for newline-delimited JSON via the Accept header."""
+    return NDJSON_MIMETYPE in request.headers.get("Accept", "")
+
+def wants_stream():
+    """True if the client asked for a streamed list response (?stream=true or NDJSON)."""
+    return request.args.get("stream", "false").lower() == "true" or wants_ndjson()
+
+def stream_response(rows, serialize=None, message="Success", meta=None, status=200, headers=None, results_key=None):
+    """
+    Creates a streamed list response from an iterable of rows.
+
+    Rows are serialized one at a time as they are pulled from `rows` (typically
+    a DB generator), so peak memory stays flat regardless of result size.
+
+    The default body mirrors success_response:
+        {"success": true, "message": ..., "data": {"results": [...], "meta": {...}}}
+    With `results_key`, for endpoints whose plain response nests the list, the
+    body matches that shape instead:
+        {"success": true, "message": ..., "data": {"results": {<results_key>: [...], **meta}, "meta": {}}}
+    If the client sends `Accept: application/x-ndjson`, one JSON document is
+    written per line instead and `meta` is exposed through X-* headers.
+    """
+    serialize = serialize or (lambda row: row)
+    headers = dict(headers or {})
+    meta = meta or {}
+
+    def chunked(pieces):
+        buffer = []
+        for piece in pieces:
+            buffer.append(piece)
+            if len(buffer) >= STREAM_CHUNK_ROWS:
+                yield b"".join(buffer)
+                buffer = []
+        if buffer:
+            yield b"".join(buffer)
+
+    if wants_ndjson():
+        for key, value in meta.items():
+            headers["X-" + key.replace("_", "-").title()] = str(value)
+
+        def generate():
+            for row in rows:
+                yield _as_bytes(serializer.dumps(serialize(row))) + b"\n"
+
+        mimetype = NDJSON_MIMETYPE
+    else:
+        if results_key:
+            head = b'{"results":{' + _as_bytes(serializer.dumps(results_key)) + b':['
+            # The meta object, unwrapped, continues the results object after the list.
+            tail = b"]" + (b"," + _as_bytes(serializer.dumps(meta))[1:] if meta else b"}") + b',"meta":{}}}'
+        else:
+            head = b'{"results":['
+            tail = b'],"meta":' + _as_bytes(serializer.dumps(meta)) + b"}}"
+
+        def generate():
+            yield b'{"success":true,"message":' + _as_bytes(serializer.dumps(message)) + b',"data":' + head
+            first = True
+            for row in rows:
+                body = _as_bytes(serializer.dumps(serialize(row)))
+                yield body if first else b"," + body
+                first = False
+            yield tail
+
+        mimetype = "application/json"
+
+    return (
+        current_app.response_class(
+            stream_with_context(chunked(generate())),
+            status=status,
+            mimetype=mimetype,
+            headers=headers,
         ),
         status,
     )
@@ -0,0 +1,56 @@
+import re
+
+# Invoice numbers look like INV-YYYYMM-CUSTCODE-SEQ (see generate_invoice_number).
+_INVOICE_PREFIX_RE = re.compile(r"^INV(-[0-9A-Z-]*)?$", re.IGNORECASE)
+_MONTH_CODE_RE = re.compile(r"^\d{6}(-[0-9A-Z-]*)?$", re.IGNORECASE)
+_SEQUENCE_RE = re.compile(r"^\d{1,9}$")
+_TOKEN_SPLIT_RE = re.compile(r"[^0-9a-z]+")
+
+# Longest name token stored in customer_name_tokens.
+MAX_TOKEN_LENGTH = 64
+
+
+def tokenize_name(name):
+    """Lower-cased alphanumeric words of a customer name, without duplicates."""
+    if not name:
+        return []
+    words = _TOKEN_SPLIT_RE.split(name.lower())
+    return list(dict.fromkeys(word[:MAX_TOKEN_LENGTH] for word in words if word))
+
+
+def escape_like(value):
+    """Escapes LIKE wildcards so user input only ever matches literally."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class InvoiceSearch:
+    """
+    A parsed invoice search string.
+
+    Number-shaped input is turned into index-friendly lookups on invoices:
+      - "INV-2024..."  -> invoice_number prefix (range scan on the UNIQUE index)
+      - "202401..."    -> month code, searched as the prefix "INV-202401..."
+      - "42"           -> sequence number, an equality lookup on invoice_seq
+    Any words containing letters are matched as prefixes of customer name tokens.
+    """
+
+    def __init__(self, q):
+        self.q = q.strip()
+        upper = self.q.upper()
+        self.number_prefix = None
+        self.sequence = None
+
+        if _INVOICE_PREFIX_RE.match(upper):
+            self.number_prefix = upper
+        elif _MONTH_CODE_RE.match(upper):
+            self.number_prefix = f"INV-{upper}"
+        if _SEQUENCE_RE.match(upper):
+            self.sequence = int(upper)
+
+        self.name_words = [] if self.number_prefix else [
+            word for word in tokenize_name(self.q) if not word.isdigit()
+        ]
+
+    @property
+    def is_empty(self):
+        return not (self.number_prefix or self.sequence is not None or self.name_words)
@@ -0,0 +1,86 @@
+import json
+import os
+from datetime import date, datetime, time
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+
+def to_json_value(o):
+    """
+    The single conversion point for values the JSON backends can't encode natively.
+
+    Models and schemas hand Decimal and date/datetime values through untouched;
+    they are converted exactly once, here, when the response body is written.
+    """
+    if isinstance(o, Decimal):
+        # Whole numbers become ints, everything else a float
+        if o == o.to_integral_value():
+            return int(o)
+        return float(o)
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    if isinstance(o, (set, frozenset, tuple)):
+        return list(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class StdlibSerializer:
+    """Serializer backed by the standard library json module."""
+    name = "json"
+
+    def dumps(self, obj):
+        return json.dumps(obj, default=to_json_value, separators=(",", ":"))
+
+
+class OrjsonSerializer:
+    """
+    Serializer backed by orjson. datetime and date are encoded natively in C;
+    only Decimal goes through to_json_value.
+    """
+    name = "orjson"
+
+    def dumps(self, obj):
+        return orjson.dumps(obj, default=to_json_value, option=orjson.OPT_NON_STR_KEYS)
+
+
+_BACKENDS = {
+    "json": StdlibSerializer,
+    "orjson": OrjsonSerializer,
+}
+
+
+def create_serializer(name="auto"):
+    """
+    Returns a serializer for the given backend name. 'auto' picks orjson when it is
+    installed and the stdlib otherwise.
+    """
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown JSON serializer backend: {name}")
+    if name == "orjson" and orjson is None:
+        raise ValueError("The orjson backend was requested but orjson is not installed.")
+    return _BACKENDS[name]()
+
+
+_serializer = create_serializer(os.getenv("JSON_SERIALIZER", "auto"))
+
+
+def get_serializer():
+    return _serializer
+
+
+def set_serializer(name):
+    """Switches the process-wide serializer backend (e.g. for benchmarks)."""
+    global _serializer
+    _serializer = create_serializer(name)
+    return _serializer
+
+
+def dumps(obj):
+    """Serializes obj with the active backend. Returns str or bytes."""
+    return _serializer.dumps(obj)
@@ -0,0 +1,113 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import request
+
+from app.database.config import Config
+from app.database.models.customer import Customer
+from app.database.models.invoice import Invoice
+from app.database.models.payment import Payment
+from app.database.models.product import Product
+
+SYNC_ENTITIES = {
+    'customers': Customer,
+    'invoices': Invoice,
+    'products': Product,
+    'payments': Payment,
+}
+
+
+class InvalidSyncError(ValueError):
+    """Raised for an unknown entity, a malformed ?since= token or a bad ?limit=."""
+
+    def __init__(self, errors):
+        super().__init__("Invalid sync parameters")
+        self.errors = errors
+
+    def to_details(self):
+        return self.errors
+
+
+def encode_token(cursors):
+    """
+    Packs the per-entity (updated_at, id) cursors into an opaque URL-safe token.
+    Entities without a cursor yet are left out.
+    """
+    payload = {
+        entity: [updated_at.isoformat(), row_id]
+        for entity, (updated_at, row_id) in cursors.items()
+        if updated_at is not None
+    }
+    data = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_token(token):
+    """Unpacks a token from encode_token(). Raises ValueError when it isn't one."""
+    data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    payload = json.loads(data)
+    if not isinstance(payload, dict):
+        raise ValueError("Expected an object.")
+    return {
+        entity: (datetime.fromisoformat(updated_at), int(row_id))
+        for entity, (updated_at, row_id) in payload.items()
+        if entity in SYNC_ENTITIES
+    }
+
+
+def get_sync_params():
+    """
+    Parses ?since=<token>, ?entities=<comma separated names> (default all) and
+    ?limit=<rows per entity>. Returns (cursors, entities, limit); raises InvalidSyncError.
+    """
+    errors = {}
+
+    cursors = {}
+    token = request.args.get('since')
+    if token:
+        try:
+            cursors = decode_token(token)
+        except (ValueError, TypeError):
+            errors['since'] = 'Not a token returned by an earlier sync.'
+
+    entities = list(SYNC_ENTITIES)
+    value = request.args.get('entities')
+    if value:
+        entities = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in entities if name not in SYNC_ENTITIES]
+        if unknown or not entities:
+            errors['entities'] = f"Expected a comma separated list of: {', '.join(SYNC_ENTITIES)}."
+
+    limit = request.args.get('limit', Config.SYNC['page_size'], type=int)
+    if not 1 <= limit <= Config.SYNC['max_page_size']:
+        errors['limit'] = f"Expected a number between 1 and {Config.SYNC['max_page_size']}."
+
+    if errors:
+        raise InvalidSyncError(errors)
+    return cursors, entities, limit
+
+
+def fetch_changes(cursors, entities, limit):
+    """
+    Reads one page of changes per entity after its cursor. Returns (changes,
+    cursors, has_more): changes maps each entity to its changed live rows and the
+    ids of rows deleted since, and `cursors` is advanced past everything returned
+    (entities not requested keep their cursor, so one token can serve them all).
+    """
+    changes, cursors, has_more = {}, dict(cursors), False
+    for entity in entities:
+        rows = SYNC_ENTITIES[entity].sync_page(
+            after=cursors.get(entity), limit=limit, settle_seconds=Config.SYNC['settle_seconds']
+        )
+        changed, deleted = [], []
+        for row in rows:
+            if row['deleted_at'] is None:
+                changed.append(row)
+            else:
+                deleted.append(row['id'])
+        changes[entity] = {'changed': changed, 'deleted': deleted}
+        if rows:
+            cursors[entity] = (rows[-1]['updated_at'], rows[-1]['id'])
+        has_more = has_more or len(rows) == limit
+    return changes, cursors, has_more
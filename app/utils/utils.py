@@ -5,7 +5,6 @@ import re
 import string
 
 from app.database.base import get_db_connection
-from app.database.db_manager import DBManager
 
 def short_customer_code(customer_id: str, length: int = 4) -> str:
     """Generate a short customer code from UUID or integer ID"""
@@ -13,35 +12,50 @@ def short_customer_code(customer_id: str, length: int = 4) -> str:
     hash_val = hashlib.md5(customer_id_str.encode()).hexdigest()
     return hash_val[:length].upper()
 
-def generate_invoice_number(customer_id: str) -> str:
-    """
-    Generate sequential invoice number with format:
-    INV-YYYYMM-CODE-SEQ
-    Works with DBManager directly (no raw connection needed)
+def allocate_invoice_sequences(count: int = 1) -> int:
     """
-    ym = datetime.now().strftime("%Y%m")
-    cust_code = short_customer_code(customer_id)
+    Reserves `count` consecutive invoice sequence numbers and returns the first.
 
-    # Get the maximum global sequence number
-    query = """
-        SELECT MAX(CAST(SUBSTRING_INDEX(invoice_number, '-', -1) AS UNSIGNED)) AS max_seq
-        FROM invoices
-        WHERE invoice_number REGEXP 'INV-[0-9]{6}-[A-Z0-9]+-[0-9]{3}'
+    The counter lives in the `sequences` table and is bumped with a single
+    UPDATE ... LAST_INSERT_ID(expr), so concurrent callers never receive the same
+    numbers and nobody scans invoices for MAX(). It always commits on its own
+    connection, even when called inside DBManager.transaction(), so the counter
+    row is never locked for a whole transaction; numbers of a rolled-back
+    transaction are simply skipped.
     """
-    result = DBManager.execute_query(query, fetch="one")
-    max_seq = 0
-    if (
-        result
-        and isinstance(result, dict)
-        and "max_seq" in result
-        and result["max_seq"] is not None
-    ):
-        max_seq = int(result["max_seq"])
+    query = (
+        "UPDATE sequences SET next_value = LAST_INSERT_ID(next_value + %s) "
+        "WHERE name = 'invoice_number'"
+    )
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (int(count),))
+            if cursor.rowcount == 0:
+                # Without the row LAST_INSERT_ID isn't set, and every call would get the same numbers.
+                raise RuntimeError("The 'invoice_number' row is missing from the sequences table.")
+            # LAST_INSERT_ID(expr) is reported as the statement's insert id: the last
+            # number reserved, so this call owns last - count + 1 ... last.
+            first = cursor.lastrowid - int(count) + 1
+        conn.commit()
+    finally:
+        conn.close()
+    return first
 
-    seq = max_seq + 1
+def format_invoice_number(customer_id: str, seq: int, issued_at: datetime = None) -> str:
+    """Formats INV-YYYYMM-CODE-SEQ, with the month taken from `issued_at` (default: now)."""
+    ym = (issued_at or datetime.now()).strftime("%Y%m")
+    cust_code = short_customer_code(customer_id)
     seq_str = str(seq).zfill(3)
     return f"INV-{ym}-{cust_code}-{seq_str}"
 
+def generate_invoice_number(customer_id: str) -> str:
+    """
+    Generate sequential invoice number with format:
+    INV-YYYYMM-CODE-SEQ
+    """
+    return format_invoice_number(customer_id, allocate_invoice_sequences(1))
+
 def generate_unique_product_code(product_name):
     """
     Generates a unique, human-readable product code from a product name.
@@ -0,0 +1,117 @@
+"""
+Micro-benchmark for building model instances from database rows.
+
+Compares the previous dynamic model (setattr into a per-instance __dict__, with
+normalize_row's ISO strings parsed back into datetimes) against the slotted
+Invoice model, which converts native cursor values once per column. Reports the
+construction time and the memory held by the instances of one list page.
+
+Run from the project root:
+    python -m benchmarks.model_rows [--rows 10000] [--repeat 10]
+"""
+import argparse
+import timeit
+import tracemalloc
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from app.database.models.invoice import Invoice
+
+
+class LegacyInvoice:
+    """Copy of the Invoice constructor before the slotted models."""
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            if key in ('created_at', 'updated_at') and value and isinstance(value, str):
+                try:
+                    value = datetime.fromisoformat(value.replace(' ', 'T'))
+                except ValueError:
+                    pass
+            elif key == 'due_date' and value and isinstance(value, str):
+                try:
+                    value = date.fromisoformat(value)
+                except ValueError:
+                    pass
+            setattr(self, key, value)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(**row) if row else None
+
+
+def build_rows(rows):
+    created = datetime(2024, 1, 1, 9, 30)
+    results = []
+    for i in range(rows):
+        results.append({
+            "id": i,
+            "invoice_number": f"INV-202401-AB12-{i:03d}",
+            "customer_id": i % 500,
+            "user_id": 1,
+            "due_date": date(2024, 2, 1) + timedelta(days=i % 30),
+            "subtotal_amount": Decimal("1250.50"),
+            "discount_amount": Decimal("50.00"),
+            "tax_percent": Decimal("18.00"),
+            "tax_amount": Decimal("216.09"),
+            "total_amount": Decimal("1416.59"),
+            "status": "Partially Paid",
+            "created_at": created + timedelta(minutes=i),
+            "updated_at": None,
+            "deleted_at": None,
+            "amount_paid": Decimal("1000.00"),
+            "due_amount": Decimal("416.59"),
+            "customer_name": f"Customer {i % 500}",
+            "customer_phone": "9876543210",
+        })
+    return results
+
+
+def legacy_rows(rows):
+    """The same rows as normalize_row used to return them: money and dates as strings."""
+    converted = []
+    for row in rows:
+        row = dict(row)
+        for key, value in row.items():
+            if isinstance(value, Decimal):
+                row[key] = f"{value:.2f}"
+            elif isinstance(value, (datetime, date)):
+                row[key] = value.isoformat()
+        converted.append(row)
+    return converted
+
+
+def measure_memory(model, rows):
+    tracemalloc.start()
+    instances = [model.from_row(row) for row in rows]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del instances
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    native = build_rows(args.rows)
+    candidates = [
+        ("legacy setattr model", LegacyInvoice, legacy_rows(native)),
+        ("slotted Invoice model", Invoice, native),
+    ]
+
+    print(f"Building {args.rows} invoice instances, best of {args.repeat} runs")
+    baseline = None
+    for label, model, rows in candidates:
+        best = min(timeit.repeat(lambda: [model.from_row(row) for row in rows], number=1, repeat=args.repeat))
+        memory = measure_memory(model, rows)
+        baseline = baseline or (best, memory)
+        print(
+            f"  {label:<22} {best * 1000:8.2f} ms   x{baseline[0] / best:5.2f}"
+            f"   {memory / 1024 / 1024:7.2f} MiB   x{baseline[1] / memory:5.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Micro-benchmark for the JSON response serializers.
+
+Compares the previous json.dumps + CustomJSONEncoder path against the stdlib and
+orjson backends in app.utils.serializer, using invoice-shaped rows like the
+ones returned by GET /api/invoices.
+
+Run from the project root:
+    python -m benchmarks.serialization [--rows 10000] [--repeat 20]
+"""
+import argparse
+import json
+import timeit
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from app.utils.serializer import create_serializer, orjson
+
+
+class LegacyJSONEncoder(json.JSONEncoder):
+    """Copy of the encoder success_response used before the serializer backends."""
+    def default(self, o):
+        if isinstance(o, Decimal):
+            if o == o.to_integral_value():
+                return int(o)
+            return float(o)
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def build_payload(rows):
+    created = datetime(2024, 1, 1, 9, 30)
+    results = []
+    for i in range(rows):
+        results.append({
+            "id": i,
+            "invoice_number": f"INV-202401-AB12-{i:03d}",
+            "created_at": created + timedelta(minutes=i),
+            "due_date": date(2024, 2, 1) + timedelta(days=i % 30),
+            "subtotal_amount": Decimal("1250.50"),
+            "discount_amount": Decimal("50.00"),
+            "tax_percent": Decimal("18.00"),
+            "tax_amount": Decimal("216.09"),
+            "total_amount": Decimal("1416.59"),
+            "due_amount": Decimal("416.59"),
+            "amount_paid": Decimal("1000.00"),
+            "status": "Partially Paid",
+            "updated_at": None,
+            "customer": {"id": i % 500, "name": f"Customer {i % 500}", "phone": "9876543210"},
+        })
+    return {"success": True, "message": "Success", "data": {"results": results, "meta": {"total": rows}}}
+
+
+def legacy_dumps(payload):
+    # The legacy encoder couldn't handle date, so mirror what to_dict used to do.
+    for row in payload["data"]["results"]:
+        row["due_date"] = row["due_date"].isoformat() if isinstance(row["due_date"], date) else row["due_date"]
+    return json.dumps(payload, cls=LegacyJSONEncoder)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    candidates = [("legacy json+encoder", lambda p: legacy_dumps(p))]
+    candidates.append(("stdlib backend", create_serializer("json").dumps))
+    if orjson is not None:
+        candidates.append(("orjson backend", create_serializer("orjson").dumps))
+    else:
+        print("orjson is not installed; skipping the orjson backend.")
+
+    print(f"Serializing {args.rows} invoice rows, best of {args.repeat} runs")
+    baseline = None
+    for label, dumps in candidates:
+        payload = build_payload(args.rows)
+        best = min(timeit.repeat(lambda: dumps(payload), number=1, repeat=args.repeat))
+        baseline = baseline or best
+        print(f"  {label:<22} {best * 1000:8.2f} ms   x{baseline / best:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
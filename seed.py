@@ -2,6 +2,7 @@
 import os
 from app.database.base import get_db_connection
 from werkzeug.security import generate_password_hash
+from app.utils.password_hasher import password_hasher
 
 # --- Default Admin User Details ---
 ADMIN_EMAIL = "admin@example.com"
@@ -48,7 +49,7 @@ def _seed_initial_admin(conn):
                 return
 
             print(f"No admin user found. Creating initial admin: {ADMIN_EMAIL}")
-            password_hash = generate_password_hash(ADMIN_PASSWORD, method='scrypt')
+            password_hash = generate_password_hash(ADMIN_PASSWORD, method=password_hasher.method)
             
             sql = """
             INSERT INTO users (username, email, password_hash, name, role)